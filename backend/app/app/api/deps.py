@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 """
 This python module provides a set of utility functions which can be used to create and
-handle connections and sessions to various services such as Redis, PostgreSQL (via
-SQLModel's AsyncSession), and Minio, as well as for handling OAuth2 authentication using
-FastAPI's OAuth2PasswordBearer.
+handle connections and sessions to various services such as PostgreSQL (via
+SQLModel's AsyncSession) and Minio, as well as for handling OAuth2 authentication using
+FastAPI's OAuth2PasswordBearer. The shared Redis clients are in `app.utils.redis_client`.
 
 Example usage:
 from fastapi import Depends
-from .db_utils import get_db, get_redis_client, reusable_oauth2
+from .db_utils import get_db, reusable_oauth2
+from app.utils.redis_client import get_redis_client
 
 @app.get("/users/")
 async def read_users(
@@ -19,12 +20,8 @@ async def read_users(
 """
 from collections.abc import AsyncGenerator
 
-import redis.asyncio as aioredis
 from fastapi.security import OAuth2PasswordBearer
 from fastapi_nextauth_jwt import NextAuthJWT
-from langchain_community.storage import RedisStore
-from redis import Redis as RedisSync
-from redis.asyncio import Redis
 from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.requests import Request
 
@@ -35,36 +32,6 @@ from app.utils.minio_client import MinioClient
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/login/access-token")
 
 
-def get_redis_store() -> RedisStore:
-    store = RedisStore(
-        redis_url=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
-        client_kwargs={"db": 2},
-        namespace="embedding_caches",
-    )
-    return store
-
-
-def get_redis_client_sync() -> RedisSync:
-    """Returns a synchronous Redis client."""
-    return RedisSync(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        db=0,
-        decode_responses=True,
-    )
-
-
-async def get_redis_client() -> Redis:
-    """Returns an asynchronous Redis client as a coroutine function which should be
-    awaited."""
-    return await aioredis.from_url(
-        f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
-        max_connections=10,
-        encoding="utf8",
-        decode_responses=True,
-    )
-
-
 async def get_db() -> AsyncGenerator[
     AsyncSession,
     None,
@@ -12,10 +12,11 @@ from app.api.deps import get_jwt
 from app.core.config import settings
 from app.deps import agent_deps
 from app.schemas.message_schema import IChatQuery
-from app.services.chat_agent.helpers.run_helper import is_running, stop_run
-from app.services.chat_agent.meta_agent import get_conv_token_buffer_memory
+from app.services.chat_agent.helpers.run_helper import is_running, run_until_cancelled, stop_run
+from app.services.chat_agent.meta_agent import aget_conv_token_buffer_memory
+from app.utils.fastapi_globals import g
 from app.utils.streaming.callbacks.stream import AsyncIteratorCallbackHandler
-from app.utils.streaming.helpers import event_generator, handle_exceptions
+from app.utils.streaming.helpers import event_batch_generator, handle_exceptions
 from app.utils.streaming.StreamingJsonListResponse import StreamingJsonListResponse
 
 router = APIRouter()
@@ -80,33 +81,42 @@ async def agent_chat(
         api_key = settings.OPENAI_API_KEY
 
     chat_messages = [m.to_langchain() for m in chat.messages]
-    memory = get_conv_token_buffer_memory(
+    memory = await aget_conv_token_buffer_memory(
         chat_messages[:-1],  # type: ignore
         api_key,
+        str(chat.conversation_id),
     )
     stream_handler = AsyncIteratorCallbackHandler()
     chat_content = chat_messages[-1].content if chat_messages[-1] is not None else ""
     asyncio.create_task(
         handle_exceptions(
-            meta_agent.arun(
-                input=chat_content,
-                chat_history=memory.load_memory_variables({})["chat_history"],
-                callbacks=[stream_handler],
-                user_settings=chat.settings,
-                tags=[
-                    "agent_chat",
-                    f"user_email={chat.user_email}",
-                    f"conversation_id={chat.conversation_id}",
-                    f"message_id={chat.new_message_id}",
-                    f"timestamp={datetime.now()}",
-                    f"version={chat.settings.version if chat.settings is not None else 'N/A'}",
-                ],
+            run_until_cancelled(
+                meta_agent.arun(
+                    input=chat_content,
+                    chat_history=memory.load_memory_variables({})["chat_history"],
+                    callbacks=[stream_handler],
+                    user_settings=chat.settings,
+                    tags=[
+                        "agent_chat",
+                        f"user_email={chat.user_email}",
+                        f"conversation_id={chat.conversation_id}",
+                        f"message_id={chat.new_message_id}",
+                        f"timestamp={datetime.now()}",
+                        f"version={chat.settings.version if chat.settings is not None else 'N/A'}",
+                    ],
+                ),
+                (g.query_context or {}).get("run_id"),
             ),
             stream_handler,
         )
     )
 
     return StreamingJsonListResponse(
-        event_generator(stream_handler),
+        event_batch_generator(
+            stream_handler,
+            coalesce_interval=settings.STREAMING_COALESCE_INTERVAL,
+        ),
         media_type="text/plain",
+        json_backend=settings.STREAMING_JSON_BACKEND,
+        max_chunk_size=settings.STREAMING_MAX_CHUNK_SIZE,
     )
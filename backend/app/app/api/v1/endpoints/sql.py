@@ -1,22 +1,119 @@
 # -*- coding: utf-8 -*-
 # mypy: disable-error-code="attr-defined"
-from fastapi import APIRouter
-from fastapi_cache.decorator import cache
+import base64
+import binascii
+import hashlib
+import json
+from enum import Enum
+from typing import Any, AsyncIterator, List, Optional, Sequence
 
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import Response
+
+from app.core.config import settings
 from app.db.session import sql_tool_db
+from app.db.sql_result_cache import canonicalize_sql
 from app.schemas.response_schema import IGetResponseBase, create_response
-from app.schemas.tool_schemas.sql_tool_schema import ExecutionResult
+from app.schemas.tool_schemas.sql_tool_schema import ColumnarExecutionResult, ExecutionResult
 from app.utils.sql import is_sql_query_safe
+from app.utils.streaming.StreamingJsonListResponse import StreamingJsonListResponse
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 10_000
+
+# Pages are offsets into the result, every page runs the statement again and skips the rows of the previous pages
+MAX_PAGE_OFFSET = 100_000
+
+
+class SqlResultFormat(str, Enum):
+    rows = "rows"  # list of {column: value} objects
+    columnar = "columnar"  # column names once and one array of values per column
+    ndjson = "ndjson"  # streamed, a {"columns": [...]} line followed by one array of values per row
+
+
+def _get_statement_hash(statement: str) -> str:
+    return hashlib.sha256(canonicalize_sql(statement).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(
+    statement: str,
+    offset: int,
+) -> str:
+    """Opaque cursor of the next page of a statement."""
+    payload = json.dumps({"offset": offset, "statement": _get_statement_hash(statement)})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(
+    statement: str,
+    cursor: str,
+) -> int:
+    """
+    Get the offset of a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed, belongs to another statement or is beyond `MAX_PAGE_OFFSET`.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(payload["offset"])
+        statement_hash = payload["statement"]
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if statement_hash != _get_statement_hash(statement) or not 0 <= offset <= MAX_PAGE_OFFSET:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def _to_columnar(
+    columns: List[str],
+    rows: Sequence[Any],
+) -> List[List[Any]]:
+    if len(rows) == 0:
+        return [[] for _ in columns]
+    return [list(values) for values in zip(*rows)]
+
 
-@router.get("/execute")
-@cache(expire=600)  # -> Bug on POST requests https://github.com/long2ice/fastapi-cache/issues/113
+async def _ndjson_lines(
+    columns: List[str],
+    batches: AsyncIterator[List[tuple]],
+) -> AsyncIterator[Any]:
+    yield {"columns": columns}
+    async for batch in batches:
+        yield batch
+
+
+@router.get(
+    "/execute",
+    response_model=IGetResponseBase[ExecutionResult | ColumnarExecutionResult],
+)
 async def execute_sql(
     statement: str,
-) -> IGetResponseBase[ExecutionResult]:
-    """Executes an SQL query on the database and returns the result."""
+    result_format: SqlResultFormat = Query(SqlResultFormat.rows, alias="format"),
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+) -> IGetResponseBase[ExecutionResult | ColumnarExecutionResult] | Response:
+    """
+    Executes an SQL query on the database and returns the result.
+
+    Results are cached in the SQL result cache, shared with the SQL tool.
+
+    The result is returned as list of rows by default, as arrays of values per column with `format=columnar`, or
+    streamed as newline-delimited JSON with `format=ndjson`. With `page_size`, only one page of rows is returned
+    (`rows` and `columnar` formats, `ndjson` is rejected), the cursor of the next page is returned in
+    `meta.next_cursor`.
+
+    Pagination is offset based: unless the full result is cached, every page runs the statement again and skips the
+    rows of the previous pages. Only the first `MAX_PAGE_OFFSET` rows can be paged through, `meta.truncated` is set
+    on the last page if there are more rows. Filter on an ordered key in the statement (keyset pagination) to read
+    further, or stream the result with `format=ndjson`.
+    """
+    if result_format == SqlResultFormat.ndjson and (page_size is not None or cursor is not None):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="page_size and cursor are not supported with format=ndjson, the result is streamed",
+        )
     if not is_sql_query_safe(statement):
         return create_response(
             message="SQL query contains forbidden keywords (DML, DDL statements)",
@@ -30,24 +127,58 @@ async def execute_sql(
             meta={},
         )
 
+    meta: dict[str, Any] = {}
+    rows: Sequence[Any]
     try:
-        (
-            columns,
-            rows,
-        ) = sql_tool_db.execute(statement)
-        execution_result = ExecutionResult(
-            raw_result=[
-                dict(
-                    zip(
-                        columns,
-                        row,
+        if result_format == SqlResultFormat.ndjson:
+            columns, batches = await sql_tool_db.astream(statement)
+            return StreamingJsonListResponse(
+                _ndjson_lines(columns, batches),
+                media_type="application/x-ndjson",
+                json_backend=settings.STREAMING_JSON_BACKEND,
+            )
+
+        if page_size is not None or cursor is not None:
+            offset = decode_cursor(statement, cursor) if cursor is not None else 0
+            page = await sql_tool_db.afetch_page(
+                statement,
+                offset=offset,
+                limit=page_size or MAX_PAGE_SIZE,
+            )
+            columns, rows = page.columns, page.rows
+            next_offset = offset + len(rows)
+            meta["next_cursor"] = (
+                encode_cursor(statement, next_offset) if page.has_more and next_offset <= MAX_PAGE_OFFSET else None
+            )
+            if page.has_more and next_offset > MAX_PAGE_OFFSET:
+                meta["truncated"] = True
+        else:
+            (
+                columns,
+                rows,
+            ) = await sql_tool_db.aexecute(statement)
+
+        execution_result: ExecutionResult | ColumnarExecutionResult
+        if result_format == SqlResultFormat.columnar:
+            execution_result = ColumnarExecutionResult(
+                columns=columns,
+                values=_to_columnar(columns, rows),
+                error=None,
+            )
+        else:
+            execution_result = ExecutionResult(
+                raw_result=[
+                    dict(
+                        zip(
+                            columns,
+                            row,
+                        )
                     )
-                )
-                for row in rows
-            ],
-            affected_rows=None,
-            error=None,
-        )
+                    for row in rows
+                ],
+                affected_rows=None,
+                error=None,
+            )
     except Exception as e:
         return create_response(
             message=repr(e),
@@ -57,4 +188,5 @@ async def execute_sql(
     return create_response(
         message="Successfully executed SQL query",
         data=execution_result,
+        meta=meta,
     )
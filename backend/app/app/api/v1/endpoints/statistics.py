@@ -1,12 +1,18 @@
 # -*- coding: utf-8 -*-
 from os import getenv
-from typing import List
+from typing import Any, List
 
 from fastapi import APIRouter
 from langsmith import Client
 from langsmith.schemas import Run
 
+from app.db.sql_result_cache import sql_result_cache
 from app.schemas.message_schema import FeedbackLangchain, FeedbackSourceBaseLangchain, IFeedback
+from app.services.chat_agent.helpers.llm import llm_client_cache
+from app.services.chat_agent.router_agent.embedding_router import embedding_routers
+from app.services.chat_agent.router_agent.router_cache import router_cache
+from app.services.chat_agent.tools.library.sql_tool.query_cache import sql_query_cache
+from app.utils.redis_client import get_redis_pool_stats
 
 router = APIRouter()
 
@@ -49,3 +55,39 @@ async def send_feedback(
         ),
     )
     return feedback_pydanticv2
+
+
+@router.get("/llm-clients")
+async def llm_client_stats() -> dict[str, Any]:
+    """Hit/miss counters of the LLM client cache."""
+    return llm_client_cache.stats()
+
+
+@router.get("/redis-pools")
+async def redis_pool_stats() -> dict[str, Any]:
+    """Saturation metrics of the shared Redis connection pools."""
+    return get_redis_pool_stats()
+
+
+@router.get("/router-cache")
+async def router_cache_stats() -> dict[str, Any]:
+    """Hit rate and saved latency of the router cache per action plan."""
+    return router_cache.stats()
+
+
+@router.get("/router-classifier")
+async def router_classifier_stats() -> dict[str, Any]:
+    """Dispatch and LLM fallback counts of the embedding router per action plans version."""
+    return {version: embedding_router.stats() for version, embedding_router in embedding_routers.items()}
+
+
+@router.get("/sql-result-cache")
+async def sql_result_cache_stats() -> dict[str, Any]:
+    """Size and hit rate of the SQL result cache."""
+    return sql_result_cache.stats()
+
+
+@router.get("/sql-query-cache")
+async def sql_query_cache_stats() -> dict[str, Any]:
+    """Hit rate and schema invalidations of the cache of validated SQL queries by question."""
+    return sql_query_cache.stats()
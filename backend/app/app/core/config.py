@@ -36,6 +36,12 @@ class Settings(BaseModel):
 
     # Google AI Configuration
     GOOGLE_API_KEY: str = "test-key"
+
+    # LLM client pooling
+    LLM_CLIENT_CACHE_SIZE: int = 128  # max. cached clients for user-supplied API keys
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP2_ENABLED: bool = False
     DATABASE_USER: str = "postgres"
     DATABASE_PASSWORD: str = "postgres"
     DATABASE_HOST: str = "database"
@@ -44,6 +50,10 @@ class Settings(BaseModel):
     DATABASE_CELERY_NAME: str = "celery_schedule_jobs"
     REDIS_HOST: str = "redis_server"
     REDIS_PORT: int = 6379
+    REDIS_MAX_CONNECTIONS: int = 50  # per pool and process
+    REDIS_POOL_TIMEOUT: int = 20  # seconds to wait for a free connection
+    RUN_KEY_TTL: int = 3600  # seconds until the run key of an abandoned run expires
+    CONVERSATION_TOKEN_CACHE_TTL: int = 86400  # seconds to keep per-message token counts of a conversation
     DB_POOL_SIZE: int = 83
     WEB_CONCURRENCY: int = 9
     POOL_SIZE: int = max(
@@ -166,6 +176,39 @@ class Settings(BaseModel):
             return v
         raise ValueError(v)
 
+    ################################
+    # Embedding configuration
+    ################################
+    EMBEDDING_BATCH_SIZE: int = 1000  # max. texts per OpenAI embedding request
+    AZURE_EMBEDDING_BATCH_SIZE: int = 16  # max. texts per Azure embedding request, Azure deployments accept up to 16
+    EMBEDDING_MAX_BATCH_CHARS: int = 100000  # max. characters per embedding request
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # concurrent embedding requests per call
+
+    ################################
+    # Router cache configuration
+    ################################
+    ROUTER_CACHE_ENABLED: bool = False
+    ROUTER_CACHE_MAX_SIZE: int = 1024
+    ROUTER_CACHE_TTL: int = 3600  # seconds
+    ROUTER_CACHE_SIMILARITY_THRESHOLD: Optional[float] = None  # cosine similarity, None disables the embedding tier
+    ROUTER_CACHE_EMBEDDING_MODEL: Optional[str] = None
+
+    ################################
+    # Embedding router configuration
+    ################################
+    ROUTER_CLASSIFIER_ENABLED: bool = False  # classify with embeddings first, the router LLM is the fallback
+    ROUTER_CLASSIFIER_EMBEDDING_MODEL: Optional[str] = None
+    ROUTER_CLASSIFIER_CONFIDENCE_THRESHOLD: float = 0.85  # minimum cosine similarity of the best action plan
+    ROUTER_CLASSIFIER_MIN_MARGIN: float = 0.03  # minimum similarity gap to the second best action plan
+    ROUTER_CLASSIFIER_WITH_CHAT_HISTORY: bool = False  # follow-up questions depend on the chat history
+
+    ################################
+    # Streaming configuration
+    ################################
+    STREAMING_COALESCE_INTERVAL: float = 0.0  # seconds to batch events into one write, 0 disables the window
+    STREAMING_MAX_CHUNK_SIZE: int = 65536  # max. characters per coalesced write
+    STREAMING_JSON_BACKEND: str = "pydantic"  # "pydantic", "orjson" (requires orjson) or "json"
+
     PDF_TOOL_EXTRACTION_CONFIG_PATH: str = "test"
     AGENT_CONFIG_PATH: str = "tests/config/agent-test.yml"
 
@@ -177,6 +220,23 @@ class Settings(BaseModel):
     SQL_TOOL_DB_INFO_PATH: str = "test"
     SQL_TOOL_DB_URI: str = ""
     SQL_TOOL_DB_OVERWRITE_ON_START: bool = True
+    SQL_TOOL_DB_REFLECTION_MAX_WORKERS: int = 8  # concurrent table reflections
+    SQL_TOOL_DB_BACKGROUND_REFRESH: bool = False  # refresh the schema info after startup, serve the last saved one
+    SQL_TOOL_DB_MAX_CONCURRENCY: int = 8  # max. concurrent queries per worker, with streams below the engine pool size
+    SQL_TOOL_DB_QUERY_TIMEOUT: Optional[float] = 60.0  # seconds
+    SQL_TOOL_DB_MAX_STREAMS: int = 2  # max. concurrent streamed (ndjson) queries per worker, besides MAX_CONCURRENCY
+    SQL_TOOL_DB_STREAM_TIMEOUT: Optional[float] = 300.0  # seconds for a whole stream, including slow clients
+    SQL_TOOL_DB_MAX_QUERY_COST: Optional[float] = None  # planner cost (Postgres) or rows visited (SQLite) from EXPLAIN
+    SQL_TOOL_DB_MAX_QUERY_ROWS: Optional[float] = None  # estimated result rows from EXPLAIN
+    SQL_RESULT_CACHE_ENABLED: bool = True
+    SQL_RESULT_CACHE_TTL: int = 600  # seconds
+    SQL_RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # in-process tier, JSON-encoded size
+    SQL_RESULT_CACHE_MAX_ENTRY_BYTES: int = 8 * 1024 * 1024  # larger results are not cached
+    SQL_QUERY_CACHE_ENABLED: bool = False  # reuse validated SQL queries of previous (similar) questions
+    SQL_QUERY_CACHE_MAX_SIZE: int = 1024
+    SQL_QUERY_CACHE_TTL: int = 86400  # seconds
+    SQL_QUERY_CACHE_SIMILARITY_THRESHOLD: Optional[float] = None  # cosine similarity, None disables the embedding tier
+    SQL_QUERY_CACHE_EMBEDDING_MODEL: Optional[str] = None
 
     @field_validator("SQL_TOOL_DB_URI", mode="before")
     def assemble_sql_tool_db_connection(
@@ -195,6 +255,8 @@ class Settings(BaseModel):
     PDF_TOOL_LOG_QUERY_PATH: str = "app/tool_constants/query_log"
     PDF_TOOL_DATA_PATH: str = "test"
     PDF_TOOL_DATABASE: str = "test"
+    PDF_TOOL_DB_POOL_MIN_SIZE: int = 1  # asyncpg connections for retrieval, per worker
+    PDF_TOOL_DB_POOL_MAX_SIZE: int = 10
 
     ################################
     # BigQuery Tool Configuration
@@ -1,28 +1,157 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
-from typing import Any, List, Optional, Sequence, Tuple
+import re
+import threading
+import time
+import weakref
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Sequence, Tuple, TypeVar
 
 from langchain.utilities.sql_database import SQLDatabase
 from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.engine.result import Row
 
-from app.schemas.tool_schemas.sql_tool_schema import DatabaseInfo
+from app.db.sql_result_cache import SQLResultCache, canonicalize_sql
+from app.schemas.tool_schemas.sql_tool_schema import DatabaseInfo, QueryCostEstimate, QueryPage, QuerySample
+from app.utils.sql import get_sql_query_violation
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Rows fetched per round trip when counting rows with a server-side cursor
+SAMPLE_FETCH_BATCH_SIZE = 1000
+
+# Batches of a streamed query fetched ahead of the consumer
+STREAM_BUFFERED_BATCHES = 2
+
+# Seconds between two checks for a closed or expired stream while the producer waits for the consumer
+STREAM_PUT_POLL_INTERVAL = 0.1
+
+# SQLite virtual machine instructions between two checks of the statement timeout
+SQLITE_PROGRESS_STEPS = 1000
+
+# Rows assumed per index lookup (SEARCH) in a SQLite query plan, which has no row estimates
+SQLITE_SEARCH_ROWS = 10
+
+_SQLITE_PLAN_LOOP_PATTERN = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\S+)")
+_SQLITE_COMPOUND_PARTS = ("LEFT-MOST SUBQUERY", "UNION", "INTERSECT", "EXCEPT")
+
+
+def _get_value_size(value: Any) -> int:
+    return len(value) if isinstance(value, (str, bytes)) else len(str(value))
+
+
+def cap_sample_bytes(
+    rows: Sequence[Sequence[Any]],
+    max_bytes: int,
+) -> Tuple[List[tuple], int]:
+    """
+    Keep sampled rows within `max_bytes`, values are counted by their length as text.
+
+    Text and binary values past the budget are cut, rows starting after the budget is spent are dropped.
+
+    Returns:
+        Tuple[List[tuple], int]: (capped rows, size of the rows before capping)
+    """
+    capped: List[tuple] = []
+    nb_bytes = 0
+    for row in rows:
+        if nb_bytes >= max_bytes:
+            nb_bytes += sum(_get_value_size(value) for value in row)
+            continue
+        values = []
+        for value in row:
+            size = _get_value_size(value)
+            if isinstance(value, (str, bytes)) and nb_bytes + size > max_bytes:
+                value = value[: max(0, max_bytes - nb_bytes)]
+            values.append(value)
+            nb_bytes += size
+        capped.append(tuple(values))
+    return capped, nb_bytes
+
+
+class QueryCostExceededError(ValueError):
+    """Raised when the planner estimate of a query is above the configured limits."""
+
+    def __init__(
+        self,
+        message: str,
+        estimate: QueryCostEstimate,
+    ) -> None:
+        super().__init__(message)
+        self.estimate = estimate
+
+
+def get_postgres_cost_estimate(explain_output: Any) -> QueryCostEstimate:
+    """Read the total cost, rows and sequential scans from the output of Postgres `EXPLAIN (FORMAT JSON)`."""
+    if isinstance(explain_output, str):
+        explain_output = json.loads(explain_output)
+    plan = explain_output[0]["Plan"]
+    full_scans = []
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan" and "Relation Name" in node:
+            full_scans.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return QueryCostEstimate(
+        cost=plan.get("Total Cost"),
+        rows=plan.get("Plan Rows"),
+        full_scans=full_scans,
+        plan=json.dumps(explain_output),
+    )
+
 
 class SQLDatabaseExtended(SQLDatabase):
-    """SQL database wrapper."""
+    """
+    SQL database wrapper.
+
+    The async methods run the blocking SQLAlchemy calls on a bounded thread pool, so a slow query does not block the
+    event loop. At most `max_concurrency` queries run at once, further queries wait for a free worker (see
+    `free_workers`). A query abandoned by its caller (timeout, cancelled task) keeps its worker until the database
+    returns. Streamed queries
+    (see `astream`) run on a separate pool of `max_streams` workers, a slow consumer does not block other queries.
+    Every statement runs with a timeout (default `query_timeout`), enforced by the database for Postgres and SQLite.
+    If a `result_cache` is set, the results of the async methods are cached per database and schema.
+    If `max_query_cost` or `max_query_rows` is set, the async methods check the planner estimate of a query (see
+    `explain`) before running it and reject expensive queries.
+    """
 
     db_info: Optional[DatabaseInfo]
+    max_concurrency: int = 8
+    max_streams: int = 2
+    query_timeout: Optional[float] = None
+    stream_timeout: Optional[float] = None
+    result_cache: Optional[SQLResultCache] = None
+    max_query_cost: Optional[float] = None
+    max_query_rows: Optional[float] = None
+    _executor: Optional[ThreadPoolExecutor] = None
+    _stream_executor: Optional[ThreadPoolExecutor] = None
+    _nb_pending_queries: int = 0
+    _pending_queries_lock = threading.Lock()
+    _table_rows: Optional[dict[str, float]] = None
 
     def __init__(
         self,
         engine: Engine,
         db_info: Optional[DatabaseInfo] = None,
+        max_concurrency: int = 8,
+        max_streams: int = 2,
+        query_timeout: Optional[float] = None,
+        stream_timeout: Optional[float] = None,
+        result_cache: Optional[SQLResultCache] = None,
+        max_query_cost: Optional[float] = None,
+        max_query_rows: Optional[float] = None,
         **kwargs: Any,
     ):
         """Initialize the SQL database."""
@@ -31,17 +160,277 @@ class SQLDatabaseExtended(SQLDatabase):
             **kwargs,
         )
         self.db_info = db_info
+        self.max_concurrency = max_concurrency
+        self.max_streams = max_streams
+        self.query_timeout = query_timeout
+        self.stream_timeout = stream_timeout
+        self.result_cache = result_cache
+        self.max_query_cost = max_query_cost
+        self.max_query_rows = max_query_rows
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="sql_db",
+            )
+        return self._executor
+
+    @property
+    def free_workers(self) -> int:
+        """Workers of the query thread pool that are neither running nor bound to run a query."""
+        return max(0, self.max_concurrency - self._nb_pending_queries)
+
+    def _release_worker(
+        self,
+        _: Future,
+    ) -> None:
+        with self._pending_queries_lock:
+            self._nb_pending_queries -= 1
+
+    @property
+    def stream_executor(self) -> ThreadPoolExecutor:
+        if self._stream_executor is None:
+            self._stream_executor = ThreadPoolExecutor(
+                max_workers=self.max_streams,
+                thread_name_prefix="sql_db_stream",
+            )
+        return self._stream_executor
+
+    @property
+    def cache_namespace(self) -> str:
+        """Database and schema (search_path) of the cached results."""
+        return f"{self._engine.url.render_as_string(hide_password=True)}:{self._schema}"
+
+    async def ainvalidate_tables(
+        self,
+        tables: List[str],
+    ) -> None:
+        """Invalidate the cached results of all statements reading from the tables."""
+        if self.result_cache is not None:
+            await self.result_cache.ainvalidate_tables(tables)
+
+    def close(self) -> None:
+        """Shut down the query thread pools."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._stream_executor is not None:
+            self._stream_executor.shutdown(wait=False, cancel_futures=True)
+            self._stream_executor = None
+
+    def _prepare_connection(
+        self,
+        connection: Connection,
+        timeout: Optional[float] = None,
+    ) -> None:
+        if self._schema is not None:
+            if self.dialect == "snowflake":
+                connection.exec_driver_sql(f"ALTER SESSION SET search_path='{self._schema}'")
+            else:
+                connection.exec_driver_sql(f"SET search_path TO {self._schema}")
+        # Abort the query in the database as well, the worker thread cannot be interrupted
+        if timeout is not None and self.dialect == "postgresql":
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+        elif timeout is not None and self.dialect == "sqlite":
+            deadline = time.monotonic() + timeout
+            connection.connection.driver_connection.set_progress_handler(  # type: ignore
+                lambda: int(time.monotonic() > deadline),
+                SQLITE_PROGRESS_STEPS,
+            )
+
+    @contextmanager
+    def _begin(
+        self,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Connection]:
+        """Open a transaction with the schema and statement timeout (default `query_timeout`) set."""
+        with self._engine.begin() as connection:
+            self._prepare_connection(connection, timeout if timeout is not None else self.query_timeout)
+            try:
+                yield connection
+            finally:
+                if self.dialect == "sqlite":
+                    # The connection goes back to the pool, later statements must not hit the deadline
+                    connection.connection.driver_connection.set_progress_handler(None, 0)  # type: ignore
+
+    async def _arun_in_executor(
+        self,
+        func: Callable[..., T],
+        timeout: Optional[float],
+    ) -> T:
+        with self._pending_queries_lock:
+            self._nb_pending_queries += 1
+        try:
+            future = self.executor.submit(func)
+        except RuntimeError:
+            with self._pending_queries_lock:
+                self._nb_pending_queries -= 1
+            raise
+        # the worker is released when the query returns, not when the caller stops waiting for it
+        future.add_done_callback(self._release_worker)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError as e:
+            raise TimeoutError(f"SQL query timed out after {timeout} seconds") from e
+
+    def explain(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+    ) -> QueryCostEstimate:
+        """
+        Get the planner estimate of a SQL command without running it.
+
+        Postgres estimates are read from `EXPLAIN (FORMAT JSON)`. The `EXPLAIN QUERY PLAN` of SQLite has no estimates,
+        its nested loops are estimated from the table sizes. Other dialects return an empty estimate.
+        """
+        if self.dialect not in ("postgresql", "sqlite"):
+            return QueryCostEstimate()
+        with self._begin(timeout) as connection:
+            if self.dialect == "postgresql":
+                return get_postgres_cost_estimate(connection.execute(text(f"EXPLAIN (FORMAT JSON) {command}")).scalar())
+            plan = connection.execute(text(f"EXPLAIN QUERY PLAN {command}")).all()
+            return self._get_sqlite_cost_estimate(connection, command, plan)
+
+    def _get_sqlite_table_rows(
+        self,
+        connection: Connection,
+        command: str,
+        name: str,
+    ) -> Optional[Tuple[str, float]]:
+        """Table and approximate row count of a table name or alias in a SQLite query plan."""
+        tables = {
+            table.lower(): table
+            for (table,) in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+        table = tables.get(name.lower())
+        if table is None:
+            for match in re.finditer(rf"([\w\"`\[\]]+)\s+(?:as\s+)?{re.escape(name)}\b", command, flags=re.IGNORECASE):
+                table = tables.get(match.group(1).strip('"`[]').lower())
+                if table is not None:
+                    break
+            else:
+                return None
+
+        if self._table_rows is None:
+            self._table_rows = {}
+        if table not in self._table_rows:
+            try:
+                # The largest rowid is found with an index lookup, counting scans the whole table
+                rows = connection.exec_driver_sql(f'SELECT MAX(rowid) FROM "{table}"').scalar()
+            except Exception:
+                rows = connection.exec_driver_sql(f'SELECT COUNT(*) FROM "{table}"').scalar()
+            self._table_rows[table] = float(rows or 0)
+        return table, self._table_rows[table]
+
+    def _get_sqlite_cost_estimate(
+        self,
+        connection: Connection,
+        command: str,
+        plan: Sequence[Row],
+    ) -> QueryCostEstimate:
+        """
+        Estimate the rows visited by a SQLite query plan.
+
+        The SCAN and SEARCH steps of a subquery are nested loops: the estimated rows are the product of the table sizes
+        of the scans and `SQLITE_SEARCH_ROWS` per index lookup. The cost is the sum of the rows visited by each loop.
+        """
+        children: dict[int, List[Tuple[int, str]]] = defaultdict(list)
+        for node_id, parent_id, _, detail in plan:
+            children[parent_id].append((node_id, detail))
+        full_scans: List[str] = []
+        subquery_rows: dict[str, float] = {}
+
+        def estimate(parent_id: int) -> Tuple[float, float]:
+            rows, cost, compound_rows, has_loops = 1.0, 0.0, 0.0, False
+            for node_id, detail in children.get(parent_id, []):
+                match = _SQLITE_PLAN_LOOP_PATTERN.match(detail)
+                if match is None:
+                    sub_rows, sub_cost = estimate(node_id)
+                    cost += sub_cost * rows if detail.startswith("CORRELATED") else sub_cost
+                    if detail.startswith(("MATERIALIZE", "CO-ROUTINE")):
+                        subquery_rows[detail.split()[-1]] = sub_rows
+                    elif detail.startswith(_SQLITE_COMPOUND_PARTS):
+                        compound_rows += sub_rows
+                    continue
+
+                kind, name = match.groups()
+                table_rows = self._get_sqlite_table_rows(connection, command, name)
+                if kind == "SEARCH":
+                    factor = 1.0 if "PRIMARY KEY" in detail else float(SQLITE_SEARCH_ROWS)
+                    if table_rows is not None:
+                        factor = min(factor, table_rows[1])
+                elif table_rows is not None:
+                    # A SCAN reads all rows, also through a covering index
+                    factor = table_rows[1]
+                    full_scans.append(table_rows[0])
+                else:
+                    factor = subquery_rows.get(name, 1.0)
+                rows *= max(factor, 1.0)
+                cost += rows
+                has_loops = True
+            return (rows if has_loops else max(compound_rows, 1.0)), cost
+
+        rows, cost = estimate(0)
+        return QueryCostEstimate(
+            cost=cost,
+            rows=rows,
+            full_scans=list(dict.fromkeys(full_scans)),
+            plan="\n".join(detail for _, _, _, detail in plan),
+        )
+
+    def get_cost_violation(
+        self,
+        estimate: QueryCostEstimate,
+    ) -> Optional[str]:
+        """Explain why a query is too expensive for `max_query_cost` and `max_query_rows`, None if it is not."""
+        reasons = []
+        if self.max_query_cost is not None and estimate.cost is not None and estimate.cost > self.max_query_cost:
+            reasons.append(f"its estimated cost of {estimate.cost:.0f} is above the limit of {self.max_query_cost:.0f}")
+        if self.max_query_rows is not None and estimate.rows is not None and estimate.rows > self.max_query_rows:
+            reasons.append(f"its estimated {estimate.rows:.0f} rows are above the limit of {self.max_query_rows:.0f}")
+        if not reasons:
+            return None
+        message = f"The SQL query is too expensive to run, {' and '.join(reasons)}."
+        if estimate.full_scans:
+            message += f" It reads all rows of the tables {', '.join(estimate.full_scans)}."
+        return message + " Filter on indexed columns, add the missing join conditions or aggregate before joining."
+
+    async def acheck_query_cost(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Check the planner estimate of a SQL command against `max_query_cost` and `max_query_rows`.
+
+        Raises:
+            QueryCostExceededError: If the query is estimated to be too expensive.
+            TimeoutError: If EXPLAIN did not finish within `timeout` (default `query_timeout`) seconds.
+        """
+        if self.max_query_cost is None and self.max_query_rows is None:
+            return
+        timeout = timeout or self.query_timeout
+        estimate = await self._arun_in_executor(
+            partial(self.explain, command, timeout=timeout),
+            timeout,
+        )
+        violation = self.get_cost_violation(estimate)
+        if violation is not None:
+            logger.info(f"Rejected SQL query: {violation} Plan: {estimate.plan}")
+            raise QueryCostExceededError(violation, estimate)
 
     def execute(
         self,
         command: str,
+        timeout: Optional[float] = None,
     ) -> Tuple[list[str], list[Row],]:
-        with self._engine.begin() as connection:
-            if self._schema is not None:
-                if self.dialect == "snowflake":
-                    connection.exec_driver_sql(f"ALTER SESSION SET search_path='{self._schema}'")
-                else:
-                    connection.exec_driver_sql(f"SET search_path TO {self._schema}")
+        with self._begin(timeout) as connection:
             cursor = connection.execute(text(command))
             columns: List[str] = list(cursor.keys())
             rows: List[Row] = cursor.all()  # type: ignore
@@ -50,10 +439,376 @@ class SQLDatabaseExtended(SQLDatabase):
                 rows,
             )
 
+    def _fetch_all(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+    ) -> Optional[Tuple[List[str], List[Row]]]:
+        """Execute a SQL command and return the columns and rows, None if the statement returns no rows."""
+        with self._begin(timeout) as connection:
+            cursor = connection.execute(text(command))
+            if not cursor.returns_rows:
+                return None
+            return list(cursor.keys()), list(cursor.all())
+
+    def _is_cacheable(
+        self,
+        command: str,
+    ) -> bool:
+        """Only the results of read-only statements (see `app.utils.sql`) are cached."""
+        return self.result_cache is not None and get_sql_query_violation(canonicalize_sql(command)) is None
+
+    async def _afetch_all(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+        use_cache: bool = True,
+    ) -> Optional[Tuple[List[str], Sequence[Row | tuple]]]:
+        use_cache = use_cache and self._is_cacheable(command)
+        if use_cache:
+            cached = await self.result_cache.aget(self.cache_namespace, command)  # type: ignore
+            if cached is not None:
+                return cached
+
+        timeout = timeout or self.query_timeout
+        await self.acheck_query_cost(command, timeout)
+        result = await self._arun_in_executor(
+            partial(self._fetch_all, command, timeout=timeout),
+            timeout,
+        )
+        if use_cache and result is not None:
+            columns, rows = result
+            await self.result_cache.aset(  # type: ignore
+                self.cache_namespace,
+                command,
+                (columns, [tuple(row) for row in rows]),
+            )
+        return result
+
+    async def aexecute(
+        self,
+        command: str,
+        timeout: Optional[float] = None,
+        use_cache: bool = True,
+    ) -> Tuple[list[str], Sequence[Row | tuple],]:
+        """
+        Execute a SQL command on the query thread pool and return the columns and rows.
+
+        Statements that return no rows return no columns and no rows. Only results of read-only statements are cached,
+        cached results are returned as tuples instead of rows.
+
+        Raises:
+            QueryCostExceededError: If the query is estimated to be too expensive, see `acheck_query_cost`.
+            TimeoutError: If the query did not finish within `timeout` (default `query_timeout`) seconds.
+        """
+        result = await self._afetch_all(command, timeout, use_cache)
+        if result is None:
+            return [], []
+        return result
+
+    def sample(
+        self,
+        command: str,
+        nb_rows: int,
+        max_rows: int,
+        max_bytes: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> QuerySample:
+        """
+        Execute a SQL command and return its first `nb_rows` rows and its row count.
+
+        The rows are streamed with a server-side cursor (where the driver supports it), the rows after the sample are
+        only counted in batches and discarded, so memory does not grow with the result size. Counting stops at
+        `max_rows`. With `max_bytes`, the sampled rows are capped in size (see `cap_sample_bytes`) and the counted
+        batches are sized from the sampled rows to stay within `max_bytes` as well.
+        """
+        with self._begin(timeout) as connection:
+            cursor = connection.execute(
+                text(command).execution_options(
+                    stream_results=True,
+                    max_row_buffer=SAMPLE_FETCH_BATCH_SIZE,
+                )
+            )
+            if not cursor.returns_rows:
+                return QuerySample(columns=[], rows=[], total_rows=0)
+            columns = list(cursor.keys())
+            rows = [tuple(row) for row in cursor.fetchmany(nb_rows)] if nb_rows > 0 else []
+            total_rows = len(rows)
+            batch_size = SAMPLE_FETCH_BATCH_SIZE
+            if max_bytes is not None:
+                rows, nb_bytes = cap_sample_bytes(rows, max_bytes)
+                if nb_bytes > 0:
+                    batch_size = max(1, min(batch_size, max_bytes * total_rows // nb_bytes))
+            truncated = False
+            if nb_rows in (0, total_rows):
+                while True:
+                    batch = cursor.fetchmany(min(batch_size, max_rows - total_rows + 1))
+                    if not batch:
+                        break
+                    total_rows += len(batch)
+                    if total_rows > max_rows:
+                        total_rows = max_rows
+                        truncated = True
+                        break
+            cursor.close()
+            return QuerySample(
+                columns=columns,
+                rows=rows,
+                total_rows=total_rows,
+                truncated=truncated,
+            )
+
+    async def asample(
+        self,
+        command: str,
+        nb_rows: int,
+        max_rows: int,
+        max_bytes: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> QuerySample:
+        """
+        Return the first `nb_rows` rows (capped to `max_bytes`) and the capped row count of a SQL command, see `sample`.
+
+        A cached full result of the statement is reused, samples are cached as well if a `result_cache` is set.
+
+        Raises:
+            QueryCostExceededError: If the query is estimated to be too expensive, see `acheck_query_cost`.
+            TimeoutError: If the query did not finish within `timeout` (default `query_timeout`) seconds.
+        """
+        use_cache = self._is_cacheable(command)
+        if use_cache:
+            cached = await self.result_cache.aget(self.cache_namespace, command)  # type: ignore
+            if cached is not None:
+                columns, rows = cached
+                return QuerySample(
+                    columns=columns,
+                    rows=list(rows[:nb_rows]) if max_bytes is None else cap_sample_bytes(rows[:nb_rows], max_bytes)[0],
+                    total_rows=min(len(rows), max_rows),
+                    truncated=len(rows) > max_rows,
+                )
+            sample_namespace = f"{self.cache_namespace}:sample:{nb_rows}:{max_rows}:{max_bytes}"
+            cached = await self.result_cache.aget(sample_namespace, command)  # type: ignore
+            if cached is not None:
+                return cached
+
+        timeout = timeout or self.query_timeout
+        await self.acheck_query_cost(command, timeout)
+        sample = await self._arun_in_executor(
+            partial(self.sample, command, nb_rows, max_rows, max_bytes=max_bytes, timeout=timeout),
+            timeout,
+        )
+        if use_cache:
+            await self.result_cache.aset(sample_namespace, command, sample)  # type: ignore
+        return sample
+
+    def fetch_page(
+        self,
+        command: str,
+        offset: int,
+        limit: int,
+        timeout: Optional[float] = None,
+    ) -> QueryPage:
+        """
+        Execute a SQL command and return `limit` rows after the first `offset` rows.
+
+        The rows are streamed with a server-side cursor (where the driver supports it), the skipped rows are discarded
+        in batches. Pages are only stable if the statement has an ORDER BY.
+        """
+        with self._begin(timeout) as connection:
+            cursor = connection.execute(
+                text(command).execution_options(
+                    stream_results=True,
+                    max_row_buffer=SAMPLE_FETCH_BATCH_SIZE,
+                )
+            )
+            if not cursor.returns_rows:
+                return QueryPage(columns=[], rows=[])
+            columns = list(cursor.keys())
+            skipped = 0
+            while skipped < offset:
+                batch = cursor.fetchmany(min(SAMPLE_FETCH_BATCH_SIZE, offset - skipped))
+                if not batch:
+                    break
+                skipped += len(batch)
+            rows = [tuple(row) for row in cursor.fetchmany(limit + 1)]
+            cursor.close()
+            return QueryPage(
+                columns=columns,
+                rows=rows[:limit],
+                has_more=len(rows) > limit,
+            )
+
+    async def afetch_page(
+        self,
+        command: str,
+        offset: int,
+        limit: int,
+        timeout: Optional[float] = None,
+    ) -> QueryPage:
+        """
+        Return `limit` rows of a SQL command after the first `offset` rows, see `fetch_page`.
+
+        A cached full result of the statement is reused, pages are cached as well if a `result_cache` is set.
+
+        Raises:
+            QueryCostExceededError: If the query is estimated to be too expensive, see `acheck_query_cost`.
+            TimeoutError: If the query did not finish within `timeout` (default `query_timeout`) seconds.
+        """
+        use_cache = self._is_cacheable(command)
+        if use_cache:
+            cached = await self.result_cache.aget(self.cache_namespace, command)  # type: ignore
+            if cached is not None:
+                columns, rows = cached
+                return QueryPage(
+                    columns=columns,
+                    rows=list(rows[offset : offset + limit]),
+                    has_more=len(rows) > offset + limit,
+                )
+            page_namespace = f"{self.cache_namespace}:page:{offset}:{limit}"
+            cached = await self.result_cache.aget(page_namespace, command)  # type: ignore
+            if cached is not None:
+                return cached
+
+        timeout = timeout or self.query_timeout
+        await self.acheck_query_cost(command, timeout)
+        page = await self._arun_in_executor(
+            partial(self.fetch_page, command, offset, limit, timeout=timeout),
+            timeout,
+        )
+        if use_cache:
+            await self.result_cache.aset(page_namespace, command, page)  # type: ignore
+        return page
+
+    async def astream(
+        self,
+        command: str,
+        batch_size: int = SAMPLE_FETCH_BATCH_SIZE,
+        timeout: Optional[float] = None,
+        stream_timeout: Optional[float] = None,
+    ) -> Tuple[List[str], AsyncIterator[List[tuple]]]:
+        """
+        Execute a SQL command and stream its rows in batches, as they are fetched.
+
+        The rows are fetched with a server-side cursor on the stream thread pool (`max_streams` workers, streams wait
+        for a free worker), at most `STREAM_BUFFERED_BATCHES` batches are fetched ahead of the consumer. The worker is
+        released when the batches are consumed, or soon after the iterator is closed or garbage collected. The
+        statement timeout applies to the database. The whole stream, including the time the consumer takes, must finish
+        within `stream_timeout` (default `self.stream_timeout`) seconds, after which the worker is released and the
+        iterator raises a TimeoutError. A cached full result of the statement is streamed from the cache.
+
+        Returns:
+            Tuple[List[str], AsyncIterator[List[tuple]]]: The columns and an iterator over the batches of rows.
+
+        Raises:
+            QueryCostExceededError: If the query is estimated to be too expensive, see `acheck_query_cost`.
+            TimeoutError: If the stream did not start within `stream_timeout` seconds.
+        """
+        if self.result_cache is not None:
+            cached = await self.result_cache.aget(self.cache_namespace, command)
+            if cached is not None:
+                columns, rows = cached
+
+                async def cached_batches() -> AsyncIterator[List[tuple]]:
+                    for start in range(0, len(rows), batch_size):
+                        yield list(rows[start : start + batch_size])
+
+                return columns, cached_batches()
+
+        timeout = timeout or self.query_timeout
+        stream_timeout = stream_timeout or self.stream_timeout
+        deadline = time.monotonic() + stream_timeout if stream_timeout is not None else None
+        await self.acheck_query_cost(command, timeout)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFERED_BATCHES)
+        stopped = threading.Event()
+        end = object()
+
+        def is_expired() -> bool:
+            return deadline is not None and time.monotonic() > deadline
+
+        def put(item: Any) -> bool:
+            """Hand an item to the consumer, False if the stream was closed or expired meanwhile."""
+            if stopped.is_set():
+                return False
+            try:
+                future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            except RuntimeError:  # the event loop is closed
+                return False
+            while True:
+                try:
+                    future.result(timeout=STREAM_PUT_POLL_INTERVAL)
+                    return True
+                except FutureTimeoutError:
+                    if stopped.is_set() or is_expired():
+                        future.cancel()
+                        return False
+
+        def produce() -> None:
+            try:
+                if stopped.is_set() or is_expired():
+                    return
+                with self._begin(timeout) as connection:
+                    cursor = connection.execute(
+                        text(command).execution_options(
+                            stream_results=True,
+                            max_row_buffer=batch_size,
+                        )
+                    )
+                    if not put(list(cursor.keys()) if cursor.returns_rows else []):
+                        return
+                    while cursor.returns_rows and not stopped.is_set() and not is_expired():
+                        batch = cursor.fetchmany(batch_size)
+                        if not batch or not put([tuple(row) for row in batch]):
+                            break
+                    cursor.close()
+                if is_expired():
+                    raise TimeoutError(f"SQL stream did not finish within {stream_timeout} seconds")
+                put(end)
+            except Exception as e:
+                put(e)
+
+        loop.run_in_executor(self.stream_executor, produce)
+
+        async def get() -> Any:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                try:
+                    item = await asyncio.wait_for(
+                        queue.get(),
+                        timeout=max(deadline - time.monotonic(), 0) if deadline is not None else None,
+                    )
+                except asyncio.TimeoutError as e:
+                    raise TimeoutError(f"SQL stream did not finish within {stream_timeout} seconds") from e
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+        async def batches() -> AsyncIterator[List[tuple]]:
+            try:
+                while (batch := await get()) is not end:
+                    yield batch
+            finally:
+                # The producer stops after its current batch, a blocked hand-over is released
+                stopped.set()
+                while not queue.empty():
+                    queue.get_nowait()
+
+        try:
+            columns = await get()
+        except Exception:
+            stopped.set()
+            raise
+        iterator = batches()
+        # An iterator dropped without being closed (e.g. the client disconnected) stops the producer as well
+        weakref.finalize(iterator, stopped.set)
+        return columns, iterator
+
     def run_no_str(
         self,
         command: str,
         fetch: str = "all",
+        timeout: Optional[float] = None,
     ) -> Sequence | Row | List[Row] | None:
         """
         Execute a SQL command and return the results.
@@ -61,12 +816,7 @@ class SQLDatabaseExtended(SQLDatabase):
         If the statement returns rows, the results are returned. If the statement
         returns no rows, None is returned.
         """
-        with self._engine.begin() as connection:
-            if self._schema is not None:
-                if self.dialect == "snowflake":
-                    connection.exec_driver_sql(f"ALTER SESSION SET search_path='{self._schema}'")
-                else:
-                    connection.exec_driver_sql(f"SET search_path TO {self._schema}")
+        with self._begin(timeout) as connection:
             cursor = connection.execute(text(command))
             if cursor.returns_rows:
                 if fetch == "all":
@@ -78,6 +828,33 @@ class SQLDatabaseExtended(SQLDatabase):
                 return result
         return None
 
+    async def arun_no_str(
+        self,
+        command: str,
+        fetch: str = "all",
+        timeout: Optional[float] = None,
+    ) -> Sequence | Row | List[Row] | None:
+        """
+        Execute a SQL command on the query thread pool and return the results.
+
+        Results of read-only statements with `fetch="all"` are cached (shared with `aexecute`) if a `result_cache`
+        is set. If the statement returns no rows, None is returned.
+
+        Raises:
+            QueryCostExceededError: If the query is estimated to be too expensive, see `acheck_query_cost`.
+            TimeoutError: If the query did not finish within `timeout` (default `query_timeout`) seconds.
+        """
+        if fetch == "all" and self._is_cacheable(command):
+            result = await self._afetch_all(command, timeout)
+            return result[1] if result is not None else None
+
+        timeout = timeout or self.query_timeout
+        await self.acheck_query_cost(command, timeout)
+        return await self._arun_in_executor(
+            partial(self.run_no_str, command, fetch, timeout=timeout),
+            timeout,
+        )
+
     @classmethod
     def from_uri(
         cls,
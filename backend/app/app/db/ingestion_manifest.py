@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Optional, Sequence
+
+from psycopg2.errors import UndefinedTable
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_TABLE = "ingestion_manifest"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of the file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    path: str
+    content_hash: Optional[str]  # None for files ingested before the manifest existed
+    size: int
+    mtime_ns: int
+    chunk_ids: List[str] = field(default_factory=list)  # `custom_id` of the chunks in langchain_pg_embedding
+
+
+@dataclass
+class IngestionPlan:
+    new: List[ManifestEntry] = field(default_factory=list)
+    changed: List[ManifestEntry] = field(default_factory=list)  # chunk_ids of the previous version
+    renamed: List[tuple[ManifestEntry, ManifestEntry]] = field(default_factory=list)  # (previous, current) entry
+    deleted: List[ManifestEntry] = field(default_factory=list)
+    refreshed: List[ManifestEntry] = field(default_factory=list)  # same content, size or mtime changed
+    unchanged: List[ManifestEntry] = field(default_factory=list)
+
+    @property
+    def to_ingest(self) -> List[ManifestEntry]:
+        return self.new + self.changed
+
+
+def plan_ingestion(
+    file_paths: Sequence[str],
+    root: str,
+    entries: dict[str, ManifestEntry],
+) -> IngestionPlan:
+    """
+    Compare the files of a folder with the manifest entries of the collection.
+
+    Files with the same size and modification time as in the manifest are unchanged without being read, the content
+    of the other files is hashed. A new file with the content of a file that disappeared from the folder is a rename,
+    its chunks are kept. Only manifest entries below `root` can be deleted.
+    """
+    plan = IngestionPlan()
+    for path in file_paths:
+        stat = os.stat(path)
+        entry = entries.get(path)
+        if (
+            entry is not None
+            and entry.content_hash is not None
+            and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns)
+        ):
+            plan.unchanged.append(entry)
+            continue
+        current = ManifestEntry(path=path, content_hash=hash_file(path), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        if entry is None:
+            plan.new.append(current)
+        elif entry.content_hash is None or entry.content_hash == current.content_hash:
+            current.chunk_ids = entry.chunk_ids
+            plan.refreshed.append(current)
+        else:
+            current.chunk_ids = entry.chunk_ids
+            plan.changed.append(current)
+
+    folder = os.path.join(root, "")
+    listed = set(file_paths)
+    missing = {
+        entry.content_hash: entry
+        for path, entry in entries.items()
+        if path.startswith(folder) and path not in listed and entry.content_hash is not None
+    }
+    new = plan.new
+    plan.new = []
+    for current in new:
+        previous = missing.pop(current.content_hash, None)  # type: ignore
+        if previous is None:
+            plan.new.append(current)
+            continue
+        current.chunk_ids = previous.chunk_ids
+        plan.renamed.append((previous, current))
+        listed.add(previous.path)
+    plan.deleted = [entry for path, entry in entries.items() if path.startswith(folder) and path not in listed]
+    return plan
+
+
+class IngestionManifest:
+    """
+    Ingestion manifest of a vectorstore collection: content hash, size, modification time and chunk ids by file path.
+
+    The manifest of a collection is loaded with a single query. If a collection was ingested before the manifest
+    existed, the manifest is bootstrapped from the `source` of its chunks, these files are not re-ingested.
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        collection_name: str,
+    ) -> None:
+        self.connection = connection
+        self.collection_name = collection_name
+
+    def create_table(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                    collection_name TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    content_hash TEXT,
+                    size BIGINT NOT NULL,
+                    mtime_ns BIGINT NOT NULL,
+                    chunk_ids TEXT[] NOT NULL,
+                    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+                    PRIMARY KEY (collection_name, path)
+                );
+                """
+            )
+        self.connection.commit()
+
+    def load(self) -> dict[str, ManifestEntry]:
+        """Load the manifest entries of the collection by path."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT path, content_hash, size, mtime_ns, chunk_ids
+                FROM {MANIFEST_TABLE}
+                WHERE collection_name = %s;
+                """,
+                (self.collection_name,),
+            )
+            entries = {row[0]: ManifestEntry(*row) for row in cursor.fetchall()}
+        if len(entries) == 0:
+            entries = self._bootstrap()
+        return entries
+
+    def _bootstrap(self) -> dict[str, ManifestEntry]:
+        """Entries without content hash of the files already in the collection, grouped by `source`."""
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT e.cmetadata->>'source', array_agg(e.custom_id)
+                    FROM langchain_pg_embedding e
+                    JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                    WHERE c.name = %s AND e.cmetadata->>'source' IS NOT NULL
+                    GROUP BY 1;
+                    """,
+                    (self.collection_name,),
+                )
+                rows = cursor.fetchall()
+        except UndefinedTable:
+            # nothing was ingested in this database yet
+            self.connection.rollback()
+            return {}
+        if len(rows) > 0:
+            logger.info(f"Bootstrapping ingestion manifest of {self.collection_name} from {len(rows)} loaded files")
+        return {
+            path: ManifestEntry(path=path, content_hash=None, size=-1, mtime_ns=-1, chunk_ids=list(chunk_ids))
+            for path, chunk_ids in rows
+        }
+
+    def upsert(
+        self,
+        entries: Iterable[ManifestEntry],
+    ) -> None:
+        with self.connection.cursor() as cursor:
+            self._upsert(cursor, entries)
+        self.connection.commit()
+
+    def _upsert(
+        self,
+        cursor: Any,
+        entries: Iterable[ManifestEntry],
+    ) -> None:
+        rows = [
+            (self.collection_name, entry.path, entry.content_hash, entry.size, entry.mtime_ns, entry.chunk_ids)
+            for entry in entries
+        ]
+        if len(rows) == 0:
+            return
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO {MANIFEST_TABLE} (collection_name, path, content_hash, size, mtime_ns, chunk_ids)
+            VALUES %s
+            ON CONFLICT (collection_name, path) DO UPDATE SET
+                content_hash = EXCLUDED.content_hash,
+                size = EXCLUDED.size,
+                mtime_ns = EXCLUDED.mtime_ns,
+                chunk_ids = EXCLUDED.chunk_ids,
+                updated_at = now();
+            """,
+            rows,
+        )
+
+    def delete(
+        self,
+        paths: Sequence[str],
+    ) -> None:
+        if len(paths) == 0:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {MANIFEST_TABLE} WHERE collection_name = %s AND path = ANY(%s);",
+                (self.collection_name, list(paths)),
+            )
+        self.connection.commit()
+
+    def rename(
+        self,
+        previous: ManifestEntry,
+        current: ManifestEntry,
+    ) -> None:
+        """Move the chunks and the manifest entry of a renamed file to its new path."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE langchain_pg_embedding e
+                SET cmetadata = jsonb_set(e.cmetadata::jsonb, '{source}', to_jsonb(%s::text))
+                FROM langchain_pg_collection c
+                WHERE c.uuid = e.collection_id AND c.name = %s AND e.custom_id = ANY(%s);
+                """,
+                (current.path, self.collection_name, previous.chunk_ids),
+            )
+            cursor.execute(
+                f"DELETE FROM {MANIFEST_TABLE} WHERE collection_name = %s AND path = %s;",
+                (self.collection_name, previous.path),
+            )
+            self._upsert(cursor, [current])
+        self.connection.commit()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from typing import Any, Iterator, List, Optional, Sequence
+
+from langchain.document_loaders.base import BaseLoader
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ParsedFile:
+    path: str
+    documents: List[Document] = field(default_factory=list)
+    error: Optional[str] = None  # the loader failed, the worker process crashed or timed out
+
+
+def parse_file(
+    loader: type[BaseLoader],
+    path: str,
+) -> ParsedFile:
+    """Parse a file with the loader, exceptions are returned as error."""
+    try:
+        return ParsedFile(path=path, documents=loader(path).load())  # type: ignore
+    except Exception as e:
+        return ParsedFile(path=path, error=repr(e))
+
+
+def _parse_files(
+    loader: type[BaseLoader],
+    connection: Connection,
+) -> None:
+    """Worker process: parse the files sent over the connection one by one, until None is received."""
+    while True:
+        path = connection.recv()
+        if path is None:
+            return
+        connection.send(parse_file(loader, path))
+
+
+class _Worker:
+    def __init__(
+        self,
+        context: Any,
+        loader: type[BaseLoader],
+    ) -> None:
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_parse_files, args=(loader, child_connection), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.task: Optional[tuple[int, str]] = None
+        self.started_at = 0.0
+
+    def submit(
+        self,
+        index: int,
+        path: str,
+    ) -> None:
+        self.connection.send(path)
+        self.task = (index, path)
+        self.started_at = time.monotonic()
+
+    def stop(self) -> None:
+        if self.task is None and self.process.is_alive():
+            try:
+                self.connection.send(None)
+                self.process.join(timeout=1)
+            except OSError:
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class PDFParsingPool:
+    """
+    Parse files with a document loader in worker processes.
+
+    Every worker parses one file at a time, so a file that crashes its worker process (e.g. a segfault in a native PDF
+    library) or takes longer than `timeout` seconds only fails itself: the worker is killed and replaced, and the
+    file is returned with an error. Results are returned in the order of the input files as soon as they and all
+    previous files are parsed, at most `max_buffered` files are parsed ahead of the first unfinished one.
+    With `max_workers` 0, files are parsed in the calling process, without timeout.
+    """
+
+    def __init__(
+        self,
+        loader: type[BaseLoader],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_buffered: Optional[int] = None,
+    ) -> None:
+        self.loader = loader
+        self.max_workers = max_workers if max_workers is not None else os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_buffered = max_buffered if max_buffered is not None else 4 * max(self.max_workers, 1)
+        self._context = multiprocessing.get_context()
+
+    def imap(
+        self,
+        paths: Sequence[str],
+    ) -> Iterator[ParsedFile]:
+        """Parse the files, in order."""
+        if self.max_workers == 0:
+            for path in paths:
+                yield parse_file(self.loader, path)
+            return
+
+        pending = deque(enumerate(paths))
+        results: dict[int, ParsedFile] = {}
+        next_index = 0
+        workers = [_Worker(self._context, self.loader) for _ in range(min(self.max_workers, len(paths)))]
+        try:
+            while next_index < len(paths):
+                for worker in workers:
+                    if worker.task is None and len(pending) > 0 and pending[0][0] < next_index + self.max_buffered:
+                        worker.submit(*pending.popleft())
+                busy = [worker for worker in workers if worker.task is not None]
+                wait(
+                    [worker.connection for worker in busy] + [worker.process.sentinel for worker in busy],
+                    timeout=self._get_wait_timeout(busy),
+                )
+
+                for i, worker in enumerate(workers):
+                    if worker.task is None:
+                        continue
+                    index, path = worker.task
+                    error = None
+                    if worker.connection.poll():
+                        try:
+                            results[index] = worker.connection.recv()
+                            worker.task = None
+                            continue
+                        except (EOFError, OSError):
+                            # the worker process exited before sending the result
+                            worker.process.join(timeout=1)
+                    if not worker.process.is_alive():
+                        error = f"Worker process exited with code {worker.process.exitcode}"
+                    elif self.timeout is not None and time.monotonic() - worker.started_at > self.timeout:
+                        error = f"Parsing timed out after {self.timeout}s"
+                    if error is not None:
+                        logger.error(f"Could not parse {path}: {error}")
+                        results[index] = ParsedFile(path=path, error=error)
+                        worker.stop()
+                        workers[i] = _Worker(self._context, self.loader)
+
+                while next_index in results:
+                    yield results.pop(next_index)
+                    next_index += 1
+        finally:
+            for worker in workers:
+                worker.stop()
+
+    def _get_wait_timeout(
+        self,
+        busy: List[_Worker],
+    ) -> Optional[float]:
+        if self.timeout is None or len(busy) == 0:
+            return None
+        return max(0.0, min(worker.started_at for worker in busy) + self.timeout - time.monotonic())
@@ -1,13 +1,21 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import hashlib
 import logging
 import os.path
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
 
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import ReflectedColumn
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.db.sql_result_cache import sql_result_cache
 from app.db.SQLDatabaseExtended import SQLDatabaseExtended
 from app.schemas.tool_schemas.sql_tool_schema import DatabaseInfo, TableInfo
 
@@ -61,54 +69,177 @@ def _get_local_celery_session() -> sessionmaker:
     )
 
 
+def _load_db_info() -> Optional[DatabaseInfo]:
+    if not os.path.isfile(settings.SQL_TOOL_DB_INFO_PATH):
+        return None
+    try:
+        return DatabaseInfo.parse_file(settings.SQL_TOOL_DB_INFO_PATH)
+    except Exception as e:
+        logger.warning(f"Could not load database info from {settings.SQL_TOOL_DB_INFO_PATH}: {repr(e)}")
+        return None
+
+
+def _write_db_info(db_info: DatabaseInfo) -> None:
+    os.makedirs(
+        "app/tool_constants",
+        exist_ok=True,
+    )
+    # Write to a temporary file first, other workers may read the file at the same time
+    tmp_path = f"{settings.SQL_TOOL_DB_INFO_PATH}.{os.getpid()}.tmp"
+    with open(
+        tmp_path,
+        "w",
+        encoding="utf-8",
+    ) as f:
+        f.write(db_info.model_dump_json(indent=4))
+    os.replace(tmp_path, settings.SQL_TOOL_DB_INFO_PATH)
+
+
+def refresh_db_info(previous: Optional[DatabaseInfo] = None) -> DatabaseInfo:
+    """Reflect the new and changed tables of the SQL tool database and save the database info."""
+    db_info = _get_table_infos_multi_db(
+        settings.SQL_TOOL_DB_SCHEMAS,
+        previous=previous,
+        max_workers=settings.SQL_TOOL_DB_REFLECTION_MAX_WORKERS,
+    )
+    _write_db_info(db_info)
+    return db_info
+
+
+def is_db_info_refreshed_in_background() -> bool:
+    return settings.SQL_TOOL_DB_OVERWRITE_ON_START and settings.SQL_TOOL_DB_BACKGROUND_REFRESH
+
+
+async def arefresh_sql_tool_db_info(sql_db: SQLDatabaseExtended) -> None:
+    """Refresh the database info in a worker thread and swap it in when done, e.g. as a background task on startup."""
+    try:
+        sql_db.db_info = await asyncio.to_thread(refresh_db_info, _load_db_info())
+        logger.info("SQL tool database info refreshed")
+    except Exception as e:
+        logger.error(f"Failed to refresh SQL tool database info: {repr(e)}")
+
+
 def get_sql_tool_db() -> SQLDatabaseExtended:
-    """Get the SQL database."""
-    if os.path.isfile(settings.SQL_TOOL_DB_INFO_PATH) and settings.SQL_TOOL_DB_OVERWRITE_ON_START is False:
-        db_info = DatabaseInfo.parse_file(settings.SQL_TOOL_DB_INFO_PATH)
+    """
+    Get the SQL database.
+
+    The database info is loaded from SQL_TOOL_DB_INFO_PATH, or refreshed on start if SQL_TOOL_DB_OVERWRITE_ON_START
+    is set. With SQL_TOOL_DB_BACKGROUND_REFRESH, the last saved database info is used until the refresh (started with
+    `arefresh_sql_tool_db_info`) is done.
+    """
+    previous = _load_db_info()
+    if previous is not None and not settings.SQL_TOOL_DB_OVERWRITE_ON_START:
+        db_info = previous
+    elif is_db_info_refreshed_in_background():
+        db_info = previous or DatabaseInfo(tables=[])
     else:
-        os.makedirs(
-            "app/tool_constants",
-            exist_ok=True,
-        )
-        db_info = _get_table_infos_multi_db(settings.SQL_TOOL_DB_SCHEMAS)
-        with open(
-            settings.SQL_TOOL_DB_INFO_PATH,
-            "w",
-            encoding="utf-8",
-        ) as f:
-            f.write(db_info.model_dump_json(indent=4))
+        db_info = refresh_db_info(previous)
 
     return SQLDatabaseExtended.from_uri(
         settings.SQL_TOOL_DB_URI,
         db_info=db_info,
+        max_concurrency=settings.SQL_TOOL_DB_MAX_CONCURRENCY,
+        max_streams=settings.SQL_TOOL_DB_MAX_STREAMS,
+        query_timeout=settings.SQL_TOOL_DB_QUERY_TIMEOUT,
+        stream_timeout=settings.SQL_TOOL_DB_STREAM_TIMEOUT,
+        result_cache=sql_result_cache if settings.SQL_RESULT_CACHE_ENABLED else None,
+        max_query_cost=settings.SQL_TOOL_DB_MAX_QUERY_COST,
+        max_query_rows=settings.SQL_TOOL_DB_MAX_QUERY_ROWS,
+    )
+
+
+def get_table_fingerprint(columns: List[ReflectedColumn]) -> str:
+    """Fingerprint of a table structure (column names, types and nullability)."""
+    digest = hashlib.sha1()
+    for column in columns:
+        digest.update(f"{column['name']}:{column['type']!r}:{column.get('nullable')}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _get_table_fingerprints(
+    engine: Engine,
+    schema_name: str,
+) -> dict[str, str]:
+    """Fingerprints of all tables of a schema, the columns are read with one query."""
+    columns = inspect(engine).get_multi_columns(schema=schema_name)
+    return {table_name: get_table_fingerprint(table_columns) for (_, table_name), table_columns in columns.items()}
+
+
+def _reflect_table(
+    engine: Engine,
+    schema_name: str,
+    table_name: str,
+    fingerprint: str,
+) -> TableInfo:
+    try:
+        database = SQLDatabaseExtended(
+            engine,
+            schema=schema_name,
+            include_tables=[table_name],
+            lazy_table_reflection=True,
+        )
+        table_info = database.get_table_info_no_throw([table_name])
+        if table_info.startswith("Error:"):
+            raise ValueError(table_info)
+    except Exception as e:
+        logger.error(f"Failed to get table info for {table_name}: {e}")
+        return TableInfo(
+            schema_name=schema_name,
+            table_name=table_name,
+            structure=f"Failed to get table info for {table_name}: {e}",
+        )
+    return TableInfo(
+        schema_name=schema_name,
+        table_name=table_name,
+        structure=table_info,
+        fingerprint=fingerprint,
     )
 
 
 def _get_table_infos_multi_db(
     schema_names: List[str],
+    previous: Optional[DatabaseInfo] = None,
+    max_workers: int = 8,
 ) -> DatabaseInfo:
-    """Get the table information for multiple databases."""
+    """
+    Get the table information for multiple databases.
+
+    All tables are fingerprinted first (one query per schema). Only new and changed tables, and tables that failed
+    before, are reflected (with sample rows), concurrently on a pool of `max_workers` threads. The table info of
+    unchanged tables is taken from `previous`.
+    """
+    engine = create_engine(
+        settings.SQL_TOOL_DB_URI,
+        pool_size=max_workers,
+    )
+    previous_tables = (
+        {(table.schema_name, table.table_name): table for table in previous.tables} if previous is not None else {}
+    )
     tables = []
-    for schema_name in schema_names:
-        database = SQLDatabaseExtended.from_uri(
-            settings.SQL_TOOL_DB_URI,
-            schema=schema_name,
-        )
-        table_names = list(set(database.get_usable_table_names()))
-        for table_name in table_names:
-            try:
-                table_info = database.get_table_info_no_throw([table_name])
-            except Exception as e:
-                logger.error(f"Failed to get table info for {table_name}: {e}")
-                table_info = f"Failed to get table info for {table_name}: {e}"
-            tables.append(
-                TableInfo(
-                    schema_name=schema_name,
-                    table_name=table_name,
-                    structure=table_info,
-                )
+    try:
+        with ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="sql_db_reflection",
+        ) as executor:
+            schema_fingerprints = executor.map(
+                partial(_get_table_fingerprints, engine),
+                schema_names,
             )
-
+            futures = []
+            for schema_name, fingerprints in zip(schema_names, schema_fingerprints):
+                for table_name, fingerprint in sorted(fingerprints.items()):
+                    previous_table = previous_tables.get((schema_name, table_name))
+                    if previous_table is not None and previous_table.fingerprint == fingerprint:
+                        tables.append(previous_table)
+                    else:
+                        futures.append(executor.submit(_reflect_table, engine, schema_name, table_name, fingerprint))
+            logger.info(f"Reflecting {len(futures)} new or changed tables, {len(tables)} tables are unchanged")
+            tables.extend(future.result() for future in futures)
+    finally:
+        engine.dispose()
+
+    schema_order = {schema_name: i for i, schema_name in enumerate(schema_names)}
+    tables.sort(key=lambda table: (schema_order[table.schema_name], table.table_name))
     return DatabaseInfo(tables=tables)
 
 
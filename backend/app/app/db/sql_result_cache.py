@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+import base64
+import datetime
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from decimal import Decimal
+from typing import Any, Callable, Iterable, Optional
+from uuid import UUID
+
+from app.core.config import settings
+from app.schemas.tool_schemas.sql_tool_schema import QueryPage, QuerySample
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "sql_result_cache"
+
+_SQL_TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+|['\"]")
+_TABLE_PATTERN = re.compile(r'\b(?:from|join)\s+((?:"[^"]+"|[\w$]+)(?:\s*\.\s*(?:"[^"]+"|[\w$]+))*)')
+
+
+# Column values that are not JSON types, stored as {"$type": name, "value": encoded}. The order matters, a datetime is
+# a date as well.
+_VALUE_CODECS: dict[str, tuple[Any, Callable[[Any], Any], Callable[[Any], Any]]] = {
+    "datetime": (
+        datetime.datetime,
+        lambda value: value.isoformat(),
+        datetime.datetime.fromisoformat,
+    ),
+    "date": (
+        datetime.date,
+        lambda value: value.isoformat(),
+        datetime.date.fromisoformat,
+    ),
+    "time": (
+        datetime.time,
+        lambda value: value.isoformat(),
+        datetime.time.fromisoformat,
+    ),
+    "timedelta": (
+        datetime.timedelta,
+        lambda value: [value.days, value.seconds, value.microseconds],
+        lambda value: datetime.timedelta(*value),
+    ),
+    "decimal": (Decimal, str, Decimal),
+    "uuid": (UUID, str, UUID),
+    "bytes": (
+        (bytes, bytearray, memoryview),
+        lambda value: base64.b64encode(bytes(value)).decode("ascii"),
+        base64.b64decode,
+    ),
+}
+_RESULT_MODELS: dict[str, Any] = {"sample": QuerySample, "page": QueryPage}
+
+
+def _encode_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {
+            "$type": "dict",
+            "value": {str(key): _encode_value(item) for key, item in value.items()},
+        }
+    for name, (value_type, encode, _) in _VALUE_CODECS.items():
+        if isinstance(value, value_type):
+            return {"$type": name, "value": encode(value)}
+    raise TypeError(f"Cannot cache SQL values of type {type(value).__name__}")
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    if isinstance(value, dict):
+        if value["$type"] == "dict":
+            return {key: _decode_value(item) for key, item in value["value"].items()}
+        return _VALUE_CODECS[value["$type"]][2](value["value"])
+    return value
+
+
+def encode_result(result: Any) -> bytes:
+    """
+    Encode a SQL result as JSON: columns and rows (as a tuple), a `QuerySample` or a `QueryPage`.
+
+    Dates, times, decimals, UUIDs and bytes are encoded explicitly, other values raise a TypeError.
+    """
+    if isinstance(result, tuple):
+        columns, rows = result
+        payload = {"type": "rows", "columns": list(columns)}
+    else:
+        name = next(
+            (name for name, model in _RESULT_MODELS.items() if isinstance(result, model)),
+            None,
+        )
+        if name is None:
+            raise TypeError(f"Cannot cache SQL results of type {type(result).__name__}")
+        payload = {"type": name, **result.model_dump(exclude={"rows"})}
+        rows = result.rows
+    payload["rows"] = [_encode_value(row) for row in rows]
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def decode_result(data: bytes | str) -> Any:
+    """Decode a SQL result encoded by `encode_result`, rows are returned as tuples."""
+    payload = json.loads(data)
+    result_type = payload.pop("type")
+    rows = [tuple(_decode_value(row)) for row in payload.pop("rows")]
+    if result_type == "rows":
+        return payload["columns"], rows
+    return _RESULT_MODELS[result_type](rows=rows, **payload)
+
+
+def canonicalize_sql(command: str) -> str:
+    """
+    Canonical form of a SQL statement for cache keys.
+
+    Whitespace is collapsed and everything outside of string literals and quoted identifiers is lowercased, trailing
+    semicolons are removed.
+    """
+    tokens = []
+    for token in _SQL_TOKEN_PATTERN.findall(command.strip().rstrip(";").strip()):
+        if token[0] in "'\"":
+            tokens.append(token)
+        elif token.isspace():
+            tokens.append(" ")
+        else:
+            tokens.append(token.lower())
+    return "".join(tokens)
+
+
+def get_referenced_tables(command: str) -> set[str]:
+    """Lowercased names (without schema) of the tables a statement reads from, used for invalidation."""
+    # String literals are blanked, `'from x'` does not reference a table
+    tokens = _SQL_TOKEN_PATTERN.findall(canonicalize_sql(command))
+    statement = "".join("''" if token[0] == "'" else token for token in tokens)
+    tables = set()
+    for match in _TABLE_PATTERN.finditer(statement):
+        name = re.split(r"\s*\.\s*", match.group(1))[-1]
+        tables.add(name.strip('"').lower())
+    return tables
+
+
+class SQLResultCache:
+    """
+    Result-set cache for read-only SQL statements.
+
+    Results (columns and rows as tuples, samples or pages, see `encode_result`) are keyed by the canonical SQL text and
+    a namespace (database URL and schema / search_path). The first tier is an in-process LRU bounded by the encoded
+    size of the results, the second tier is shared through Redis with a TTL. Results are stored in Redis as JSON, never
+    as pickles: whoever can write to Redis must not be able to run code in the workers. Results larger than
+    `max_entry_bytes` or with values that cannot be encoded are not cached. Cached results can be invalidated by table
+    name.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: int,
+        max_entry_bytes: int,
+        use_redis: bool = True,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.use_redis = use_redis
+        self._entries: OrderedDict[str, tuple[float, int, Any, frozenset[str]]] = OrderedDict()
+        self._tables: dict[str, set[str]] = defaultdict(set)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def get_key(
+        namespace: str,
+        command: str,
+    ) -> str:
+        return hashlib.sha256(f"{namespace}\n{canonicalize_sql(command)}".encode("utf-8")).hexdigest()
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, result, _ = entry
+            if expires_at < time.monotonic():
+                self._remove_local(key)
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def _remove_local(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+            for table in entry[3]:
+                keys = self._tables.get(table)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tables[table]
+
+    def _set_local(
+        self,
+        key: str,
+        result: Any,
+        size: int,
+        tables: Iterable[str],
+        expires_at: float,
+    ) -> None:
+        tables = frozenset(tables)
+        with self._lock:
+            self._remove_local(key)
+            self._entries[key] = (expires_at, size, result, tables)
+            self._bytes += size
+            for table in tables:
+                self._tables[table].add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove_local(next(iter(self._entries)))
+                self.evictions += 1
+
+    async def aget(
+        self,
+        namespace: str,
+        command: str,
+    ) -> Optional[Any]:
+        """Get the cached result of a statement, from process memory or Redis."""
+        key = self.get_key(namespace, command)
+        result = self._get_local(key)
+        if result is not None:
+            self.local_hits += 1
+            return result
+
+        if self.use_redis:
+            try:
+                redis_client = await get_redis_client()
+                payload = await redis_client.get(f"{REDIS_KEY_PREFIX}:{key}")
+                if payload is not None:
+                    result = decode_result(payload)
+                    self._set_local(
+                        key,
+                        result,
+                        len(payload),
+                        get_referenced_tables(command),
+                        time.monotonic() + self.ttl,
+                    )
+                    self.redis_hits += 1
+                    return result
+            except Exception as e:
+                logger.warning(f"Could not read SQL result cache: {repr(e)}")
+
+        self.misses += 1
+        return None
+
+    async def aset(
+        self,
+        namespace: str,
+        command: str,
+        result: Any,
+    ) -> None:
+        """Cache the result of a statement in both tiers."""
+        try:
+            data = encode_result(result)
+        except TypeError as e:
+            logger.debug(f"SQL result is not cached: {repr(e)}")
+            return
+        if len(data) > self.max_entry_bytes:
+            logger.debug(f"SQL result of {len(data)} bytes is too large to cache")
+            return
+
+        key = self.get_key(namespace, command)
+        tables = get_referenced_tables(command)
+        self._set_local(key, result, len(data), tables, time.monotonic() + self.ttl)
+
+        if self.use_redis:
+            try:
+                redis_client = await get_redis_client()
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    pipe.set(f"{REDIS_KEY_PREFIX}:{key}", data, ex=self.ttl)
+                    for table in tables:
+                        pipe.sadd(f"{REDIS_KEY_PREFIX}:table:{table}", key)
+                        pipe.expire(f"{REDIS_KEY_PREFIX}:table:{table}", self.ttl)
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Could not write SQL result cache: {repr(e)}")
+
+    async def ainvalidate_tables(
+        self,
+        tables: Iterable[str],
+    ) -> None:
+        """Remove all cached results that read from any of the tables (names without schema)."""
+        tables = [table.lower() for table in tables]
+        with self._lock:
+            for table in tables:
+                for key in list(self._tables.get(table, ())):
+                    self._remove_local(key)
+
+        if self.use_redis:
+            try:
+                redis_client = await get_redis_client()
+                for table in tables:
+                    table_key = f"{REDIS_KEY_PREFIX}:table:{table}"
+                    keys = await redis_client.smembers(table_key)
+                    await redis_client.delete(table_key, *[f"{REDIS_KEY_PREFIX}:{key}" for key in keys])
+            except Exception as e:
+                logger.warning(f"Could not invalidate SQL result cache: {repr(e)}")
+
+    def stats(self) -> dict[str, Any]:
+        requests = self.local_hits + self.redis_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.local_hits + self.redis_hits) / requests if requests > 0 else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tables.clear()
+            self._bytes = 0
+
+
+sql_result_cache = SQLResultCache(
+    max_bytes=settings.SQL_RESULT_CACHE_MAX_BYTES,
+    ttl=settings.SQL_RESULT_CACHE_TTL,
+    max_entry_bytes=settings.SQL_RESULT_CACHE_MAX_ENTRY_BYTES,
+)
@@ -2,7 +2,9 @@
 import csv
 import logging
 import os
-from typing import Any, List
+import uuid
+from typing import Iterator, List, Tuple
+from urllib.parse import quote
 
 import psycopg2
 from dotenv import load_dotenv
@@ -13,12 +15,20 @@ from langchain.text_splitter import TokenTextSplitter
 from langchain.vectorstores.pgvector import PGVector
 
 from app.core.config import settings
+from app.db.ingestion_manifest import IngestionManifest, ManifestEntry, plan_ingestion
+from app.db.pdf_parsing import PDFParsingPool
+from app.db.vector_index import VectorIndexManager
+from app.db.vector_search import AsyncPGVectorSearch
 from app.schemas.ingestion_schema import LOADER_DICT, IndexingConfig
 from app.services.chat_agent.helpers.embedding_models import get_embedding_model
 from app.utils.config_loader import get_ingestion_configs
 
 logger = logging.getLogger(__name__)
 
+PDF_COLLECTION_NAME = "pdf_indexing_1"
+SUPPORTED_EXTENSIONS = (".pdf", ".md", ".txt", ".csv")
+INGESTION_BATCH_SIZE = 256  # documents split and embedded at once
+
 
 class PDFExtractionPipeline:
     """Pipeline for extracting text from PDFs and load them into a vectorstore."""
@@ -49,12 +59,11 @@ class PDFExtractionPipeline:
             host=settings.DATABASE_HOST,
             port=settings.DATABASE_PORT,
         )
-        self.db_cursor = self.db_connection.cursor()
 
     def run(
         self,
         folder_path: str | None = None,
-        collection_name: str = "pdf_indexing_1",
+        collection_name: str = PDF_COLLECTION_NAME,
         load_index: bool = True,
     ) -> PGVector:
         """Run the PDF extraction pipeline."""
@@ -70,146 +79,206 @@ class PDFExtractionPipeline:
             return self._load_documents(folder_path=folder_path, collection_name=collection_name)
         raise ValueError("folder_path must be provided if load_index is False")
 
-    def _file_already_loaded(self, file_path: str, collection_name: str) -> bool:
-        """Check if file is already loaded based on its path using direct SQL query."""
-        try:
-            query = """
-            SELECT EXISTS(
-                SELECT 1
-                FROM langchain_pg_embedding e
-                JOIN langchain_pg_collection c on c.uuid = e.collection_id
-                WHERE c.name = %s AND e.cmetadata->>'source' = %s
-            );
-            """
-            self.db_cursor.execute(query, (collection_name, file_path))
-            return self.db_cursor.fetchone()[0]
-        except Exception as e:
-            logger.error("Error checking if file is already loaded.")
-            logger.error(repr(e))
-            return False
-
-    def _load_docs(
-        self,
+    @staticmethod
+    def _list_files(
         dir_path: str,
-        collection_name: str,
-    ) -> List[Document]:
-        """
-        Using specified PDF miner to convert PDF documents into raw text chunks.
-        Also supports loading .txt (plain text) files and loads files from subfolders.
-        Only loads files not already in the database.
-
-        Fallback: PyPDF
-        """
-        documents = []
+    ) -> List[str]:
+        """List the supported files of the folder and its subfolders."""
+        file_paths = []
         for root, _, files in os.walk(dir_path):
             for file_name in files:
-                file_extension = os.path.splitext(file_name)[1].lower()
-                file_path = os.path.join(root, file_name)
-
-                if not self._file_already_loaded(file_path, collection_name):
-                    # Load PDF files
-                    if file_extension == ".pdf":
-                        logger.info(f"Loading {file_name} into vectorstore")
-                        try:
-                            loader: Any = self.pdf_loader(file_path)  # type: ignore
-                            file_docs = loader.load()
-                            documents.extend(file_docs)
-                            logger.info(f"{file_name} loaded successfully")
-                        except Exception as e:
-                            logger.error(
-                                f"Could not extract text from PDF {file_name} with {self.pipeline_config.pdf_parser}: {repr(e)}"  # noqa: E501
-                            )
+                if os.path.splitext(file_name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    file_paths.append(os.path.join(root, file_name))
+        return file_paths
 
-                    # Load Markdown or Plain Text files
-                    elif file_extension in (".md", ".txt"):
-                        file_type = "markdown" if file_extension == ".md" else "plain text"
-                        logger.info(f"Loading data from {file_name} as Document ({file_type})...")
-                        try:
-                            with open(file_path, "r", encoding="utf-8") as f:
-                                file_content = f.read()
+    def _iter_docs(
+        self,
+        file_paths: List[str],
+    ) -> Iterator[Tuple[str, List[Document]]]:
+        """
+        Using specified PDF miner to convert PDF documents into raw text chunks, yielded file by file in order.
+        Also supports loading .txt (plain text) files and CSV files. Files that could not be loaded are skipped.
+
+        PDFs are parsed in `parsing_workers` worker processes, text and CSV files in the calling process.
+        """
+        parsing_pool = PDFParsingPool(
+            self.pdf_loader,
+            max_workers=self.pipeline_config.parsing_workers,
+            timeout=self.pipeline_config.parsing_timeout,
+        )
+        parsed_pdfs = parsing_pool.imap([path for path in file_paths if path.lower().endswith(".pdf")])
+        for file_path in file_paths:
+            file_name = os.path.basename(file_path)
+            file_extension = os.path.splitext(file_name)[1].lower()
+
+            # Load PDF files
+            if file_extension == ".pdf":
+                parsed_pdf = next(parsed_pdfs, None)
+                if parsed_pdf is None:
+                    # not expected, the pool yields one result per PDF path
+                    logger.error(f"No parsing result for PDF {file_name}")
+                    continue
+                if parsed_pdf.error is not None:
+                    logger.error(
+                        f"Could not extract text from PDF {file_name} with {self.pipeline_config.pdf_parser}: {parsed_pdf.error}"  # noqa: E501
+                    )
+                    continue
+                logger.info(f"{file_name} loaded successfully")
+                yield file_path, parsed_pdf.documents
+
+            # Load Markdown or Plain Text files
+            elif file_extension in (".md", ".txt"):
+                file_type = "markdown" if file_extension == ".md" else "plain text"
+                logger.info(f"Loading data from {file_name} as Document ({file_type})...")
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        file_content = f.read()
+
+                    file_doc = Document(
+                        page_content=file_content,
+                        metadata={"source": file_path, "type": file_type},
+                    )
+
+                    text_splitter = TokenTextSplitter(
+                        chunk_size=self.pipeline_config.tokenizer_chunk_size,
+                        chunk_overlap=self.pipeline_config.tokenizer_chunk_overlap,
+                    )
+                    file_docs = text_splitter.split_documents([file_doc])
+
+                    if len(file_docs) > 1:
+                        logger.info(
+                            f"Split {file_name} into {len(file_docs)} documents due to chunk size: ({self.pipeline_config.tokenizer_chunk_size})"  # noqa: E501
+                        )
+                    yield file_path, file_docs
+                except Exception as e:
+                    logger.error(f"Could not load {file_type} file {file_name}: {repr(e)}")
+
+            # Load CSV files
+            elif file_extension == ".csv":
+                logger.info(f"Loading data from {file_name} as CSV Document...")
+                try:
+                    file_docs = []
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        csv_reader = csv.DictReader(f)
+                        for row in csv_reader:
+                            text = row["text"]
+                            metadata = {key: value for key, value in row.items() if key != "text"}
+                            metadata["source"] = file_path
+                            metadata["type"] = "csv"
 
                             file_doc = Document(
-                                page_content=file_content,
-                                metadata={"source": file_path, "type": file_type},
+                                page_content=text,
+                                metadata=metadata,
                             )
 
                             text_splitter = TokenTextSplitter(
                                 chunk_size=self.pipeline_config.tokenizer_chunk_size,
                                 chunk_overlap=self.pipeline_config.tokenizer_chunk_overlap,
                             )
-                            file_docs = text_splitter.split_documents([file_doc])
+                            row_docs = text_splitter.split_documents([file_doc])
 
-                            documents.extend(file_docs)
-                            if len(file_docs) > 1:
+                            file_docs.extend(row_docs)
+                            if len(row_docs) > 1:
                                 logger.info(
-                                    f"Split {file_name} into {len(file_docs)} documents due to chunk size: ({self.pipeline_config.tokenizer_chunk_size})"  # noqa: E501
+                                    f"Split {file_name} into {len(row_docs)} documents due to chunk size: ({self.pipeline_config.tokenizer_chunk_size})"  # noqa: E501
                                 )
-                        except Exception as e:
-                            logger.error(f"Could not load {file_type} file {file_name}: {repr(e)}")
-
-                    # Load CSV files
-                    elif file_extension == ".csv":
-                        logger.info(f"Loading data from {file_name} as CSV Document...")
-                        try:
-                            with open(file_path, "r", encoding="utf-8") as f:
-                                csv_reader = csv.DictReader(f)
-                                for row in csv_reader:
-                                    text = row["text"]
-                                    metadata = {key: value for key, value in row.items() if key != "text"}
-                                    metadata["source"] = file_path
-                                    metadata["type"] = "csv"
-
-                                    file_doc = Document(
-                                        page_content=text,
-                                        metadata=metadata,
-                                    )
-
-                                    text_splitter = TokenTextSplitter(
-                                        chunk_size=self.pipeline_config.tokenizer_chunk_size,
-                                        chunk_overlap=self.pipeline_config.tokenizer_chunk_overlap,
-                                    )
-                                    file_docs = text_splitter.split_documents([file_doc])
-
-                                    documents.extend(file_docs)
-                                    if len(file_docs) > 1:
-                                        logger.info(
-                                            f"Split {file_name} into {len(file_docs)} documents due to chunk size: ({self.pipeline_config.tokenizer_chunk_size})"  # noqa: E501
-                                        )
-                        except Exception as e:
-                            logger.error(f"Could not load CSV file {file_name}: {repr(e)}")
-
-                else:
-                    logger.info(f"File {file_name} already loaded, skipping.")
-
-        return documents
+                    yield file_path, file_docs
+                except Exception as e:
+                    logger.error(f"Could not load CSV file {file_name}: {repr(e)}")
 
     def _load_documents(
         self,
         folder_path: str,
         collection_name: str,
     ) -> PGVector:
-        """Load documents into vectorstore."""
-        text_documents = self._load_docs(folder_path, collection_name)
+        """
+        Load documents into vectorstore.
+
+        The files of the folder are compared with the ingestion manifest of the collection: unchanged files are
+        skipped, the chunks of renamed files are moved to their new path, the chunks of deleted files are removed, and
+        new and changed files are loaded. Documents are split and embedded in batches of about
+        `INGESTION_BATCH_SIZE` documents while the next files are parsed, the chunks of the previous version of changed
+        files are deleted once the new ones are added.
+        """
+        db = PGVector(
+            embedding_function=self.embedding,
+            collection_name=collection_name,
+            connection_string=self.connection_str,
+            pre_delete_collection=False,
+        )
         text_splitter = TokenTextSplitter(
             chunk_size=self.pipeline_config.tokenizer_chunk_size,
             chunk_overlap=self.pipeline_config.tokenizer_chunk_overlap,
         )
-        texts = text_splitter.split_documents(text_documents)
+
+        manifest = IngestionManifest(self.db_connection, collection_name)
+        manifest.create_table()
+        file_paths = self._list_files(folder_path)
+        plan = plan_ingestion(file_paths, folder_path, manifest.load())
+        logger.info(
+            f"Ingestion of {collection_name}: {len(plan.new)} new, {len(plan.changed)} changed, {len(plan.renamed)} "
+            f"renamed, {len(plan.deleted)} deleted and {len(plan.unchanged) + len(plan.refreshed)} unchanged files"
+        )
+        for previous, current in plan.renamed:
+            manifest.rename(previous, current)
+        if len(plan.deleted) > 0:
+            db.delete([chunk_id for entry in plan.deleted for chunk_id in entry.chunk_ids], collection_only=True)
+            manifest.delete([entry.path for entry in plan.deleted])
+        manifest.upsert(plan.refreshed)
+
+        entries = {entry.path: entry for entry in plan.to_ingest}
+        batch: List[Tuple[ManifestEntry, List[Document]]] = []
+        nb_documents = 0
+        nb_texts = 0
+        for file_path, file_docs in self._iter_docs([path for path in file_paths if path in entries]):
+            batch.append((entries[file_path], file_docs))
+            nb_documents += len(file_docs)
+            if nb_documents >= INGESTION_BATCH_SIZE:
+                nb_texts += self._add_files(db, manifest, text_splitter, batch)
+                batch = []
+                nb_documents = 0
+        if len(batch) > 0:
+            nb_texts += self._add_files(db, manifest, text_splitter, batch)
+
+        logger.info(f"Loaded {nb_texts} text-documents into vectorstore")
+        if self.pipeline_config.vector_index is not None:
+            VectorIndexManager(self.db_connection, collection_name, self.pipeline_config.vector_index).ensure_index()
+        return db
+
+    @staticmethod
+    def _add_files(
+        db: PGVector,
+        manifest: IngestionManifest,
+        text_splitter: TokenTextSplitter,
+        batch: List[Tuple[ManifestEntry, List[Document]]],
+    ) -> int:
+        """
+        Split and embed the documents of the files into the vectorstore, replacing the chunks of their previous version.
+
+        Returns:
+            int: The number of text-documents added.
+        """
+        texts: List[Document] = []
+        chunk_ids: List[str] = []
+        previous_chunk_ids: List[str] = []
+        for entry, file_docs in batch:
+            file_texts = text_splitter.split_documents(file_docs)
+            previous_chunk_ids.extend(entry.chunk_ids)
+            entry.chunk_ids = [str(uuid.uuid4()) for _ in file_texts]
+            texts.extend(file_texts)
+            chunk_ids.extend(entry.chunk_ids)
 
         # Add metadata for separate filtering
         for text in texts:
             text.metadata["type"] = "Text"
 
-        docs = [*texts]
-
         logger.info(f"Loading {len(texts)} text-documents into vectorstore")
-        return PGVector.from_documents(
-            embedding=self.embedding,
-            documents=docs,
-            collection_name=collection_name,
-            connection_string=self.connection_str,
-            pre_delete_collection=False,
-        )
+        if len(texts) > 0:
+            db.add_documents(texts, ids=chunk_ids)
+        if len(previous_chunk_ids) > 0:
+            db.delete(previous_chunk_ids, collection_only=True)
+        manifest.upsert([entry for entry, _ in batch])
+        return len(texts)
 
 
 def get_pdf_pipeline() -> PDFExtractionPipeline:
@@ -220,10 +289,40 @@ def get_pdf_pipeline() -> PDFExtractionPipeline:
     return pdf_pipeline
 
 
+pdf_vector_searches: dict[str, AsyncPGVectorSearch] = {}
+
+
+def get_pdf_vector_search(collection_name: str = PDF_COLLECTION_NAME) -> AsyncPGVectorSearch:
+    """Get the long-lived vector search of a PDF collection, created on first use."""
+    vector_search = pdf_vector_searches.get(collection_name)
+    if vector_search is None:
+        indexing_config = get_ingestion_configs().indexing_config
+        vector_search = AsyncPGVectorSearch(
+            get_embedding_model(indexing_config.embedding_model),
+            dsn=(
+                f"postgresql://{quote(settings.DATABASE_USER)}:{quote(settings.DATABASE_PASSWORD)}"
+                f"@{settings.DATABASE_HOST}:{settings.DATABASE_PORT}/{settings.PDF_TOOL_DATABASE}"
+            ),
+            collection_name=collection_name,
+            min_pool_size=settings.PDF_TOOL_DB_POOL_MIN_SIZE,
+            max_pool_size=settings.PDF_TOOL_DB_POOL_MAX_SIZE,
+            index_config=indexing_config.vector_index,
+        )
+        pdf_vector_searches[collection_name] = vector_search
+    return vector_search
+
+
+async def aclose_pdf_vector_searches() -> None:
+    """Close the connection pools of all PDF vector searches."""
+    for vector_search in pdf_vector_searches.values():
+        await vector_search.aclose()
+    pdf_vector_searches.clear()
+
+
 def run_pdf_ingestion_pipeline(load_index: bool = True) -> None:
     get_pdf_pipeline().run(
         settings.PDF_TOOL_DATA_PATH,
-        collection_name="pdf_indexing_1",
+        collection_name=PDF_COLLECTION_NAME,
         load_index=load_index,
     )
 
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import math
+from typing import Any, List, Optional
+from uuid import UUID
+
+from langchain_community.vectorstores.pgvector import DistanceStrategy
+
+from app.schemas.ingestion_schema import VectorIndexConfig, VectorIndexTypeEnum
+
+logger = logging.getLogger(__name__)
+
+DISTANCE_OPERATORS = {
+    DistanceStrategy.COSINE: "<=>",
+    DistanceStrategy.EUCLIDEAN: "<->",
+    DistanceStrategy.MAX_INNER_PRODUCT: "<#>",
+}
+OPERATOR_CLASSES = {
+    DistanceStrategy.COSINE: "vector_cosine_ops",
+    DistanceStrategy.EUCLIDEAN: "vector_l2_ops",
+    DistanceStrategy.MAX_INNER_PRODUCT: "vector_ip_ops",
+}
+
+
+def get_index_name(collection_id: UUID) -> str:
+    return f"ix_pg_embedding_ann_{collection_id.hex}"
+
+
+def get_lists(nb_rows: int) -> int:
+    """Number of IVFFlat clusters recommended by pgvector: rows / 1000 up to 1M rows, sqrt(rows) above."""
+    if nb_rows <= 1_000_000:
+        return max(1, nb_rows // 1000)
+    return int(math.sqrt(nb_rows))
+
+
+def get_index_params(
+    config: VectorIndexConfig,
+    nb_rows: int,
+) -> dict[str, int]:
+    if config.index_type == VectorIndexTypeEnum.HNSW:
+        return {"m": config.m, "ef_construction": config.ef_construction}
+    return {"lists": config.lists if config.lists is not None else get_lists(nb_rows)}
+
+
+def get_distance_expression(
+    dimensions: int,
+    vector_param: str,
+    distance_strategy: DistanceStrategy = DistanceStrategy.COSINE,
+) -> str:
+    """
+    Distance of the embeddings to the query vector parameter, matching the expression of the ANN index.
+
+    The embedding column of PGVector has no dimensions, the index is built on the embeddings cast to the dimensions of
+    the collection.
+    """
+    return (
+        f"(embedding::vector({dimensions})) {DISTANCE_OPERATORS[distance_strategy]} "
+        f"{vector_param}::text::vector({dimensions})"
+    )
+
+
+def get_create_index_sql(
+    index_name: str,
+    collection_id: UUID,
+    dimensions: int,
+    config: VectorIndexConfig,
+    nb_rows: int,
+    distance_strategy: DistanceStrategy = DistanceStrategy.COSINE,
+) -> str:
+    """Partial index on the embeddings of the collection."""
+    params = ", ".join(f"{name} = {value}" for name, value in get_index_params(config, nb_rows).items())
+    return (
+        f"CREATE INDEX CONCURRENTLY {index_name} ON langchain_pg_embedding "
+        f"USING {config.index_type.value} ((embedding::vector({dimensions})) {OPERATOR_CLASSES[distance_strategy]}) "
+        f"WITH ({params}) WHERE collection_id = '{collection_id}';"
+    )
+
+
+def get_search_settings(config: VectorIndexConfig) -> str:
+    """Query-time parameters of the index, to be run in the transaction of the search."""
+    if config.index_type == VectorIndexTypeEnum.HNSW:
+        return f"SET LOCAL hnsw.ef_search = {int(config.ef_search)};"
+    return f"SET LOCAL ivfflat.probes = {int(config.probes)};"
+
+
+def get_index_state(
+    config: VectorIndexConfig,
+    dimensions: int,
+    nb_rows: int,
+    distance_strategy: DistanceStrategy = DistanceStrategy.COSINE,
+) -> dict[str, Any]:
+    """Build parameters of an index, saved as comment of the index."""
+    return {
+        "index_type": config.index_type.value,
+        "m": config.m,
+        "ef_construction": config.ef_construction,
+        "lists": config.lists,
+        "distance_strategy": distance_strategy.value,
+        "dimensions": dimensions,
+        "nb_rows": nb_rows,
+    }
+
+
+def needs_rebuild(
+    state: Optional[dict[str, Any]],
+    config: VectorIndexConfig,
+    dimensions: int,
+    nb_rows: int,
+    distance_strategy: DistanceStrategy = DistanceStrategy.COSINE,
+) -> bool:
+    """
+    Whether the index of a collection has to be (re)built.
+
+    An index is built if there is none, if its parameters changed, or if the number of chunks changed by more than
+    `rebuild_ratio` since it was built: IVFFlat clusters are computed at build time and degrade with large ingests.
+    """
+    if state is None:
+        return True
+    wanted = get_index_state(config, dimensions, nb_rows, distance_strategy)
+    if any(state.get(key) != value for key, value in wanted.items() if key != "nb_rows"):
+        return True
+    return abs(nb_rows - state["nb_rows"]) > config.rebuild_ratio * max(state["nb_rows"], 1)
+
+
+class VectorIndexManager:
+    """
+    Approximate nearest neighbour index of a PGVector collection.
+
+    Every collection has a partial HNSW or IVFFlat index on its embeddings. Indexes are built concurrently under a
+    temporary name and swapped in, searches keep running on the previous index or sequential scans while building.
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        collection_name: str,
+        config: VectorIndexConfig,
+        distance_strategy: DistanceStrategy = DistanceStrategy.COSINE,
+    ) -> None:
+        self.connection = connection
+        self.collection_name = collection_name
+        self.config = config
+        self.distance_strategy = distance_strategy
+
+    def ensure_index(self, force: bool = False) -> bool:
+        """
+        Build the index of the collection if it is missing or outdated.
+
+        Returns:
+            bool: Whether the index was built.
+        """
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT uuid FROM langchain_pg_collection WHERE name = %s;", (self.collection_name,))
+            row = cursor.fetchone()
+            if row is None:
+                self.connection.commit()
+                return False
+            collection_id = UUID(str(row[0]))
+            index_name = get_index_name(collection_id)
+            cursor.execute(
+                """
+                SELECT count(*), max(vector_dims(embedding)), obj_description(to_regclass(%s), 'pg_class')
+                FROM langchain_pg_embedding
+                WHERE collection_id = %s;
+                """,
+                (index_name, str(collection_id)),
+            )
+            nb_rows, dimensions, comment = cursor.fetchone()
+        self.connection.commit()
+
+        if nb_rows < self.config.min_rows or dimensions is None:
+            logger.info(f"{self.collection_name} has {nb_rows} chunks, searched without index")
+            return False
+        state = json.loads(comment) if comment is not None else None
+        if not force and not needs_rebuild(state, self.config, dimensions, nb_rows, self.distance_strategy):
+            return False
+
+        logger.info(f"Building {self.config.index_type.value} index of {self.collection_name} on {nb_rows} chunks")
+        self._build(index_name, collection_id, dimensions, nb_rows)
+        return True
+
+    def _build(
+        self,
+        index_name: str,
+        collection_id: UUID,
+        dimensions: int,
+        nb_rows: int,
+    ) -> None:
+        new_index_name = f"{index_name}_new"
+        state = get_index_state(self.config, dimensions, nb_rows, self.distance_strategy)
+        statements: List[str] = [
+            f"DROP INDEX CONCURRENTLY IF EXISTS {new_index_name};",  # left over by a failed build
+            get_create_index_sql(
+                new_index_name, collection_id, dimensions, self.config, nb_rows, self.distance_strategy
+            ),
+            f"COMMENT ON INDEX {new_index_name} IS '{json.dumps(state)}';",
+            f"DROP INDEX CONCURRENTLY IF EXISTS {index_name};",
+            f"ALTER INDEX {new_index_name} RENAME TO {index_name};",
+        ]
+        # CONCURRENTLY cannot run in a transaction
+        autocommit = self.connection.autocommit
+        self.connection.autocommit = True
+        try:
+            with self.connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+        finally:
+            self.connection.autocommit = autocommit
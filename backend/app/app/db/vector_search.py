@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import logging
+from typing import Any, List, Optional
+from uuid import UUID
+
+import asyncpg
+from langchain.schema import Document
+from langchain_community.vectorstores.pgvector import DistanceStrategy
+from langchain_core.embeddings import Embeddings
+
+from app.db.vector_index import DISTANCE_OPERATORS, get_distance_expression, get_search_settings
+from app.schemas.ingestion_schema import VectorIndexConfig
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPGVectorSearch:
+    """
+    Similarity search in a PGVector collection, on a pool of asyncpg connections.
+
+    The query is embedded and searched without blocking the event loop. The pool is created on first use and the
+    collection id is resolved once, every search is a single query on the embeddings of the collection. A search
+    without results resolves the collection again, in case it was re-created or ingested since.
+    With `index_config`, the search matches the expression of the ANN index of the collection (see `vector_index.py`),
+    with its query-time parameters.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        dsn: str,
+        collection_name: str,
+        distance_strategy: DistanceStrategy = DistanceStrategy.COSINE,
+        min_pool_size: int = 1,
+        max_pool_size: int = 10,
+        index_config: Optional[VectorIndexConfig] = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.dsn = dsn
+        self.collection_name = collection_name
+        self.distance_strategy = distance_strategy
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.index_config = index_config
+        self._pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+        self._collection_id: Optional[UUID] = None
+        self._dimensions: Optional[int] = None
+
+    async def _aget_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        dsn=self.dsn,
+                        min_size=self.min_pool_size,
+                        max_size=self.max_pool_size,
+                    )
+        return self._pool
+
+    async def _aget_collection_id(
+        self,
+        connection: Any,
+    ) -> Optional[UUID]:
+        if self._collection_id is None:
+            self._dimensions = None
+            self._collection_id = await connection.fetchval(
+                "SELECT uuid FROM langchain_pg_collection WHERE name = $1;",
+                self.collection_name,
+            )
+            if self._collection_id is None:
+                logger.warning(f"Collection {self.collection_name} not found")
+            elif self.index_config is not None:
+                self._dimensions = await connection.fetchval(
+                    "SELECT vector_dims(embedding) FROM langchain_pg_embedding WHERE collection_id = $1 LIMIT 1;",
+                    self._collection_id,
+                )
+        return self._collection_id
+
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+    ) -> List[Document]:
+        """Documents most similar to the query."""
+        embedding = await self.embeddings.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k=k)
+
+    async def asimilarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+    ) -> List[Document]:
+        """Documents most similar to the embedding."""
+        pool = await self._aget_pool()
+        async with pool.acquire() as connection:
+            is_resolved = self._collection_id is not None
+            collection_id = await self._aget_collection_id(connection)
+            if collection_id is None:
+                return []
+            rows = await self._afetch_nearest(connection, collection_id, embedding, k)
+            if len(rows) == 0 and is_resolved:
+                # The collection may have been re-created (new id) or ingested (dimensions) since it was resolved
+                resolved = (collection_id, self._dimensions)
+                self._collection_id = None
+                collection_id = await self._aget_collection_id(connection)
+                if collection_id is None:
+                    return []
+                if (collection_id, self._dimensions) != resolved:
+                    rows = await self._afetch_nearest(connection, collection_id, embedding, k)
+        return [
+            Document(
+                page_content=row["document"] or "",
+                metadata=json.loads(row["cmetadata"]) if row["cmetadata"] is not None else {},
+            )
+            for row in rows
+        ]
+
+    async def _afetch_nearest(
+        self,
+        connection: Any,
+        collection_id: UUID,
+        embedding: List[float],
+        k: int,
+    ) -> List[Any]:
+        if self.index_config is not None and self._dimensions is not None:
+            async with connection.transaction():
+                await connection.execute(get_search_settings(self.index_config))
+                # the collection id is inlined to match the predicate of the partial index in generic plans
+                return await connection.fetch(
+                    f"""
+                    SELECT document, cmetadata::text AS cmetadata
+                    FROM langchain_pg_embedding
+                    WHERE collection_id = '{collection_id}'
+                    ORDER BY {get_distance_expression(self._dimensions, "$1", self.distance_strategy)}
+                    LIMIT $2;
+                    """,
+                    json.dumps(embedding),
+                    k,
+                )
+        return await connection.fetch(
+            f"""
+            SELECT document, cmetadata::text AS cmetadata
+            FROM langchain_pg_embedding
+            WHERE collection_id = $1
+            ORDER BY embedding {DISTANCE_OPERATORS[self.distance_strategy]} $2::text::vector
+            LIMIT $3;
+            """,
+            collection_id,
+            json.dumps(embedding),
+            k,
+        )
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        self._collection_id = None
+        self._dimensions = None
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import gc
 import logging
 from contextlib import asynccontextmanager
@@ -18,12 +19,21 @@ from langchain.globals import set_llm_cache
 from pydantic import ValidationError
 from starlette.middleware.cors import CORSMiddleware
 
-from app.api.deps import get_redis_client, get_redis_client_sync
 from app.api.v1.api import api_router as api_router_v1
 from app.core.config import settings, yaml_configs
 from app.core.fastapi import FastAPIWithInternalModels
+from app.db.session import arefresh_sql_tool_db_info, is_db_info_refreshed_in_background, sql_tool_db
+from app.db.sql_result_cache import sql_result_cache
+from app.db.vector_db_pdf_ingestion import aclose_pdf_vector_searches
+from app.services.chat_agent.helpers.llm import http_clients, llm_client_cache
+from app.services.chat_agent.helpers.run_helper import run_cancellation
+from app.services.chat_agent.meta_agent import load_meta_agent_registry, meta_agent_registry
+from app.services.chat_agent.router_agent.embedding_router import embedding_routers
+from app.services.chat_agent.router_agent.router_cache import router_cache
+from app.services.chat_agent.tools.library.sql_tool.query_cache import sql_query_cache
 from app.utils.config_loader import load_agent_config, load_ingestion_configs
 from app.utils.fastapi_globals import GlobalsMiddleware, g
+from app.utils.redis_client import close_redis_clients, get_redis_client, get_redis_client_sync
 
 
 async def user_id_identifier(request: Request) -> str:
@@ -75,6 +85,7 @@ async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
     # startup
     yaml_configs["agent_config"] = load_agent_config()
     yaml_configs["ingestion_config"] = load_ingestion_configs()
+    load_meta_agent_registry()
 
     redis_client = await get_redis_client()
 
@@ -89,16 +100,35 @@ async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
         redis_client,
         identifier=user_id_identifier,
     )
+    await run_cancellation.start()
+
+    db_info_refresh_task = None
+    if sql_tool_db is not None and is_db_info_refreshed_in_background():
+        db_info_refresh_task = asyncio.create_task(arefresh_sql_tool_db_info(sql_tool_db))
 
     logging.info("Start up FastAPI [Full dev mode]")
     yield
 
     # shutdown
+    if db_info_refresh_task is not None:
+        db_info_refresh_task.cancel()
+    await run_cancellation.stop()
     await FastAPICache.clear()
     await FastAPILimiter.close()
+    await close_redis_clients()
     g.cleanup()
     gc.collect()
     yaml_configs.clear()
+    meta_agent_registry.clear()
+    llm_client_cache.clear()
+    router_cache.clear()
+    embedding_routers.clear()
+    if sql_tool_db is not None:
+        sql_tool_db.close()
+    sql_result_cache.clear()
+    sql_query_cache.clear()
+    await aclose_pdf_vector_searches()
+    await http_clients.aclose()
 
 
 logging.basicConfig(level=logging.INFO)
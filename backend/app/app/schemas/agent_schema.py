@@ -10,6 +10,7 @@ class ActionPlan(BaseModel):
     name: str
     description: str
     actions: list[list[str]]
+    examples: list[str] = []  # labelled example questions for the embedding router
 
 
 class ActionPlans(BaseModel):
@@ -37,13 +37,32 @@ LOADER_DICT: dict[str, type[BaseLoader]] = {
 }
 
 
+class VectorIndexTypeEnum(Enum):
+    HNSW = "hnsw"
+    IVFFlat = "ivfflat"
+
+
+class VectorIndexConfig(BaseModel):
+    index_type: VectorIndexTypeEnum = VectorIndexTypeEnum.HNSW
+    m: int = 16  # HNSW: connections per node
+    ef_construction: int = 64  # HNSW: candidate list size while building
+    ef_search: int = 40  # HNSW: candidate list size while searching, higher is more accurate and slower
+    lists: Optional[int] = None  # IVFFlat: number of clusters, None: rows / 1000 (sqrt(rows) above 1M rows)
+    probes: int = 10  # IVFFlat: clusters searched, higher is more accurate and slower
+    min_rows: int = 1000  # smaller collections are searched exactly, without index
+    rebuild_ratio: float = 0.5  # rebuild once the number of chunks changed by this fraction since the last build
+
+
 class IndexingConfig(BaseModel):
     tokenizer_chunk_size: int = 3000
     tokenizer_chunk_overlap: int = 200
     large_file_tokenizer_chunk_size: int = 4000
     large_file_tokenizer_chunk_overlap: int = 200
     pdf_parser: PDFParserEnum = PDFParserEnum.PyMuPDF
+    parsing_workers: Optional[int] = None  # PDF parsing processes, None: number of CPUs, 0: in the main process
+    parsing_timeout: Optional[float] = 300.0  # seconds per PDF, the file is skipped if it takes longer
     embedding_model: Optional[str] = None
+    vector_index: Optional[VectorIndexConfig] = None  # approximate nearest neighbour index, None: exact search
 
 
 class IngestionPipelineConfigs(BaseModel):
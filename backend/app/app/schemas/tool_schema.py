@@ -17,6 +17,9 @@ LLMType = Literal[
     "gemini-2.0-flash-exp"
 ]
 
+# "llm", "retrieval" (embedding similarity) or "hybrid" (retrieval, LLM if unsure)
+TableSelectionType = Literal["llm", "retrieval", "hybrid"]
+
 
 class PromptInput(BaseModel):
     """Schema for prompt input configuration."""
@@ -53,6 +56,15 @@ class SqlToolConfig(ToolConfig):
     validate_empty_results: bool
     validate_with_llm: bool
     always_limit_query: bool
+    max_validation_rows: int = 10000  # row count cap when validating generated queries
+    max_validation_bytes: int = 100000  # size cap of the sampled rows (as text) when validating generated queries
+    table_selection: TableSelectionType = "llm"
+    table_selection_top_k: int = 5
+    table_selection_min_score: float = 0.8  # "hybrid" only, min. cosine similarity of the best table
+    table_selection_embedding_model: Optional[str] = None
+    candidate_fan_out: int = 1  # SQL queries generated and validated concurrently, the first valid one is used
+    candidate_max_temperature: float = 1.0  # temperature of the last candidate, the first one uses the llm default
+    candidate_token_budget: Optional[int] = None  # max. prompt tokens of the concurrent candidates per question
 
 
 class ToolsLibrary(BaseModel):
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from typing import Any, List
+from typing import Any, List, Optional
 
 from pydantic import BaseModel
 
@@ -12,6 +12,7 @@ class TableInfo(BaseModel):
     schema_name: str
     table_name: str
     structure: str
+    fingerprint: Optional[str] = None  # hash of the columns, None if the table info could not be reflected
 
     @property
     def name(
@@ -26,6 +27,32 @@ class DatabaseInfo(BaseModel):
     tables: List[TableInfo]
 
 
+class QuerySample(BaseModel):
+    """First rows and row count of a query, fetched with bounded memory."""
+
+    columns: List[str]
+    rows: List[Any]
+    total_rows: int
+    truncated: bool = False  # the count stopped at the row cap, `total_rows` is a lower bound
+
+
+class QueryPage(BaseModel):
+    """Rows of a query from an offset, fetched with bounded memory."""
+
+    columns: List[str]
+    rows: List[Any]
+    has_more: bool = False  # there are rows after this page
+
+
+class QueryCostEstimate(BaseModel):
+    """Planner estimate of a query, read from EXPLAIN before running it."""
+
+    cost: Optional[float] = None  # planner cost units (Postgres), rows visited (SQLite)
+    rows: Optional[float] = None  # estimated result rows
+    full_scans: List[str] = []  # tables read without an index
+    plan: str = ""
+
+
 class ExecutionResult(QueryBase):
     raw_result: List[
         dict[
@@ -35,3 +62,11 @@ class ExecutionResult(QueryBase):
     ]
     affected_rows: int | None = None
     error: str | None = None
+
+
+class ColumnarExecutionResult(QueryBase):
+    """Query result with the column names once and one array of values per column."""
+
+    columns: List[str]
+    values: List[List[Any]]
+    error: str | None = None
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+from typing import List, Optional, Sequence
+
+from langchain.schema import AIMessage, BaseMessage, HumanMessage
+
+from app.core.config import settings
+from app.services.chat_agent.helpers.token_counter import token_counter
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Approximate per-message overhead of the chat format (role and separators)
+TOKENS_PER_MESSAGE = 4
+
+
+def get_conversation_turns(
+    chat_messages: Sequence[AIMessage | HumanMessage],
+) -> List[BaseMessage]:
+    """
+    Convert the chat messages into (input, output) turns, as `ConversationTokenBufferMemory.save_context` would.
+
+    A human message followed by an AI message is one turn, any other message is saved as input without output.
+    """
+    messages: List[BaseMessage] = []
+    i = 0
+    while i < len(chat_messages):
+        if isinstance(
+            chat_messages[i],
+            HumanMessage,
+        ):
+            if i + 1 < len(chat_messages) and isinstance(
+                chat_messages[i + 1],
+                AIMessage,
+            ):
+                messages.append(HumanMessage(content=chat_messages[i].content))
+                messages.append(AIMessage(content=chat_messages[i + 1].content))
+                i += 1
+        else:
+            messages.append(HumanMessage(content=chat_messages[i].content))
+            messages.append(AIMessage(content=""))
+        i += 1
+    return messages
+
+
+def prune_messages(
+    messages: List[BaseMessage],
+    token_counts: List[int],
+    max_token_limit: int,
+) -> List[BaseMessage]:
+    """Keep the longest suffix of messages that fits into the token limit, using a running total."""
+    total = 0
+    start = len(messages)
+    while start > 0 and total + token_counts[start - 1] <= max_token_limit:
+        start -= 1
+        total += token_counts[start]
+    return messages[start:]
+
+
+def _message_content(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else ""
+
+
+def count_message_tokens(
+    messages: List[BaseMessage],
+    model: str,
+) -> List[int]:
+    """Count the tokens of each message (in-process memoized)."""
+    counts = token_counter.count_batch([_message_content(m) for m in messages], model)
+    return [count + TOKENS_PER_MESSAGE for count in counts]
+
+
+def _message_field(message: BaseMessage) -> str:
+    return hashlib.sha1(f"{message.type}:{_message_content(message)}".encode("utf-8")).hexdigest()
+
+
+async def acount_message_tokens(
+    messages: List[BaseMessage],
+    model: str,
+    conversation_id: Optional[str] = None,
+) -> List[int]:
+    """
+    Count the tokens of each message, with counts cached per conversation in Redis.
+
+    Only messages that were not seen in earlier requests of the conversation are tokenized, the cache is read and
+    written with one round trip each.
+    """
+    if conversation_id is None or len(messages) == 0:
+        return count_message_tokens(messages, model)
+
+    key = f"conversation_token_counts:{model}:{conversation_id}"
+    fields = [_message_field(m) for m in messages]
+    try:
+        redis_client = await get_redis_client()
+        cached = await redis_client.hmget(key, fields)
+    except Exception as e:
+        logger.warning(f"Could not read conversation token counts: {repr(e)}")
+        return count_message_tokens(messages, model)
+
+    missing = [i for i, count in enumerate(cached) if count is None]
+    counts = [int(count) if count is not None else 0 for count in cached]
+    if missing:
+        missing_counts = count_message_tokens([messages[i] for i in missing], model)
+        for i, count in zip(missing, missing_counts):
+            counts[i] = count
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={fields[i]: counts[i] for i in missing})
+                pipe.expire(key, settings.CONVERSATION_TOKEN_CACHE_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not write conversation token counts: {repr(e)}")
+    return counts
@@ -2,19 +2,109 @@
 # mypy: disable-error-code="call-arg"
 # TODO: Change langchain param names to match the new langchain version
 
+import asyncio
 import logging
-from typing import List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
 
 from langchain.embeddings import CacheBackedEmbeddings
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import BaseStore
 from langchain_openai.embeddings import OpenAIEmbeddings
+from pydantic import SecretStr
 
-from app.api.deps import get_redis_store
 from app.core.config import settings
+from app.utils.redis_client import get_redis_store
 
 logger = logging.getLogger(__name__)
 
 
 class CacheBackedEmbeddingsExtended(CacheBackedEmbeddings):
+    """
+    Embeddings cached in a key-value store, embedded in batches.
+
+    Texts are deduplicated and looked up in the cache with a single `mget`. Only the missing texts are sent to the
+    underlying embeddings, in requests of at most `batch_size` texts and `max_batch_chars` characters, of which
+    `max_concurrency` run concurrently. The new embeddings are written back with a single `mset`.
+    """
+
+    def __init__(
+        self,
+        underlying_embeddings: Embeddings,
+        document_embedding_store: BaseStore[str, List[float]],
+        *,
+        batch_size: Optional[int] = None,
+        query_embedding_store: Optional[BaseStore[str, List[float]]] = None,
+        max_batch_chars: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        super().__init__(
+            underlying_embeddings,
+            document_embedding_store,
+            batch_size=batch_size,
+            query_embedding_store=query_embedding_store,
+        )
+        self.max_batch_chars = max_batch_chars if max_batch_chars is not None else settings.EMBEDDING_MAX_BATCH_CHARS
+        self.max_concurrency = max_concurrency if max_concurrency is not None else settings.EMBEDDING_MAX_CONCURRENCY
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of texts.
+
+        Extended to deduplicate the texts and embed the missing ones in concurrent batches.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            The embeddings for the given texts.
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        vectors: dict[str, Optional[List[float]]] = dict(
+            zip(unique_texts, self.document_embedding_store.mget(unique_texts))
+        )
+        batches = self._get_batches([text for text in unique_texts if vectors[text] is None])
+        if len(batches) > 0:
+            if len(batches) == 1 or self.max_concurrency <= 1:
+                results = [self.underlying_embeddings.embed_documents(batch) for batch in batches]
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                    results = list(executor.map(self.underlying_embeddings.embed_documents, batches))
+            new_vectors = self._get_new_vectors(batches, results)
+            self.document_embedding_store.mset(new_vectors)
+            vectors.update(new_vectors)
+        return [vectors[text] for text in texts]  # type: ignore
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of texts asynchronously.
+
+        Extended to deduplicate the texts and embed the missing ones in concurrent batches.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            The embeddings for the given texts.
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        vectors: dict[str, Optional[List[float]]] = dict(
+            zip(unique_texts, await self.document_embedding_store.amget(unique_texts))
+        )
+        batches = self._get_batches([text for text in unique_texts if vectors[text] is None])
+        if len(batches) > 0:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def aembed_batch(batch: List[str]) -> List[List[float]]:
+                async with semaphore:
+                    return await self.underlying_embeddings.aembed_documents(batch)
+
+            results = await asyncio.gather(*(aembed_batch(batch) for batch in batches))
+            new_vectors = self._get_new_vectors(batches, results)
+            await self.document_embedding_store.amset(new_vectors)
+            vectors.update(new_vectors)
+        return [vectors[text] for text in texts]  # type: ignore
+
     def embed_query(self, text: str) -> List[float]:
         """
         Embed query text.
@@ -36,6 +126,56 @@ class CacheBackedEmbeddingsExtended(CacheBackedEmbeddings):
 
         return text_embeddings
 
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Embed query text asynchronously.
+
+        Extended to support caching
+
+        Args:
+            text: The text to embed.
+
+        Returns:
+            The embedding for the given text.
+        """
+        vectors: List[Union[List[float], None]] = await self.document_embedding_store.amget([text])
+        text_embeddings = vectors[0]
+
+        if text_embeddings is None:
+            text_embeddings = await self.underlying_embeddings.aembed_query(text)
+            await self.document_embedding_store.amset(list(zip([text], [text_embeddings])))
+
+        return text_embeddings
+
+    def _get_batches(
+        self,
+        texts: List[str],
+    ) -> List[List[str]]:
+        """Split the texts into requests of at most `batch_size` texts and `max_batch_chars` characters."""
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        nb_chars = 0
+        for text in texts:
+            if len(batch) > 0 and (
+                (self.batch_size is not None and len(batch) >= self.batch_size)
+                or nb_chars + len(text) > self.max_batch_chars
+            ):
+                batches.append(batch)
+                batch = []
+                nb_chars = 0
+            batch.append(text)
+            nb_chars += len(text)
+        if len(batch) > 0:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def _get_new_vectors(
+        batches: List[List[str]],
+        results: List[List[List[float]]],
+    ) -> List[Tuple[str, List[float]]]:
+        return [(text, vector) for batch, vectors in zip(batches, results) for text, vector in zip(batch, vectors)]
+
 
 def get_embedding_model(emb_model: Optional[str]) -> CacheBackedEmbeddings:
     """
@@ -48,25 +188,30 @@ def get_embedding_model(emb_model: Optional[str]) -> CacheBackedEmbeddings:
         emb_model = "text-embedding-ada-002"
 
     underlying_embeddings = None
+    batch_size = settings.EMBEDDING_BATCH_SIZE
     match emb_model:
         case "text-embedding-ada-002":
             if settings.OPENAI_API_BASE is not None:
+                batch_size = settings.AZURE_EMBEDDING_BATCH_SIZE
                 underlying_embeddings = OpenAIEmbeddings(
                     deployment="text-embedding-ada-002-2",
                     model="text-embedding-ada-002",
                     openai_api_base=settings.OPENAI_API_BASE,
                     openai_api_type="azure",
-                    openai_api_key=settings.OPENAI_API_KEY,
-                    chunk_size=1,  # Maximum number of texts to embed in each batch
+                    openai_api_key=SecretStr(settings.OPENAI_API_KEY),
+                    chunk_size=batch_size,  # Maximum number of texts to embed in each batch
                 )
             else:
-                underlying_embeddings = OpenAIEmbeddings()
+                underlying_embeddings = OpenAIEmbeddings(chunk_size=batch_size)
         case _:
             logger.warning(f"embedding model {emb_model} not found, using default emb_model")
-            underlying_embeddings = OpenAIEmbeddings()
+            underlying_embeddings = OpenAIEmbeddings(chunk_size=batch_size)
 
     store = get_redis_store()
     embedder = CacheBackedEmbeddingsExtended.from_bytes_store(
-        underlying_embeddings, store, namespace=underlying_embeddings.model
+        underlying_embeddings,
+        store,
+        namespace=underlying_embeddings.model,
+        batch_size=batch_size,
     )
     return embedder
@@ -3,9 +3,11 @@
 # TODO: Change langchain param names to match the new langchain version
 
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
 
-import tiktoken
+import httpx
 from langchain.base_language import BaseLanguageModel
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
 from langchain_anthropic import ChatAnthropic
@@ -13,6 +15,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 
 from app.core.config import settings
 from app.schemas.tool_schema import LLMType
+from app.services.chat_agent.helpers.token_counter import token_counter
 
 logger = logging.getLogger(__name__)
 
@@ -22,16 +25,148 @@ def get_token_length(
     model: str = "gpt-4",
 ) -> int:
     """Get the token length of a string."""
-    enc = tiktoken.encoding_for_model(model)
-    encoded = enc.encode(string)
-    return len(encoded)
+    return token_counter.count(string, model)
+
+
+class SharedHttpClients:
+    """
+    Keep-alive HTTP clients shared by all OpenAI-compatible LLM clients.
+
+    Every `ChatOpenAI` otherwise creates its own connection pool, so connections (and TLS handshakes) would not be
+    reused across LLM instances.
+    """
+
+    def __init__(self) -> None:
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def _client_kwargs() -> dict[str, Any]:
+        return {
+            "limits": httpx.Limits(
+                max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            "timeout": httpx.Timeout(600.0, connect=5.0),
+            "http2": settings.LLM_HTTP2_ENABLED,  # requires the `h2` package
+        }
+
+    def get_sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(**self._client_kwargs())
+        return self._sync_client
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._client_kwargs())
+        return self._async_client
+
+    async def aclose(self) -> None:
+        """Close the shared clients, e.g. on shutdown."""
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class LLMClientCache:
+    """
+    Cache of LLM clients keyed by (LLMType, api_key, streaming).
+
+    Clients using the configured API keys are kept for the lifetime of the process, clients for user-supplied API
+    keys are evicted least recently used once `max_size` is reached.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._default_clients: dict[tuple[str, bool], BaseLanguageModel] = {}
+        self._user_clients: OrderedDict[tuple[str, str, bool], BaseLanguageModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        llm: LLMType,
+        api_key: Optional[str],
+        streaming: bool,
+        factory: Callable[[], BaseLanguageModel],
+    ) -> BaseLanguageModel:
+        with self._lock:
+            if api_key is None:
+                default_key = (llm, streaming)
+                client = self._default_clients.get(default_key)
+                if client is None:
+                    self.misses += 1
+                    client = factory()
+                    self._default_clients[default_key] = client
+                else:
+                    self.hits += 1
+                return client
+
+            user_key = (llm, api_key, streaming)
+            client = self._user_clients.get(user_key)
+            if client is not None:
+                self.hits += 1
+                self._user_clients.move_to_end(user_key)
+                return client
+
+            self.misses += 1
+            client = factory()
+            self._user_clients[user_key] = client
+            while len(self._user_clients) > self.max_size:
+                self._user_clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss counters to check client reuse."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "default_clients": len(self._default_clients),
+            "user_clients": len(self._user_clients),
+            "max_size": self.max_size,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._default_clients.clear()
+            self._user_clients.clear()
+
+
+http_clients = SharedHttpClients()
+llm_client_cache = LLMClientCache(max_size=settings.LLM_CLIENT_CACHE_SIZE)
 
 
 def get_llm(
     llm: LLMType,
     api_key: Optional[str] = None,
+    streaming: bool = True,
+) -> BaseLanguageModel:
+    """Get the (cached) LLM instance for the given LLM type."""
+    return llm_client_cache.get(
+        llm,
+        api_key,
+        streaming,
+        lambda: _create_llm(
+            llm,
+            api_key=api_key,
+            streaming=streaming,
+        ),
+    )
+
+
+def _create_llm(
+    llm: LLMType,
+    api_key: Optional[str] = None,
+    streaming: bool = True,
 ) -> BaseLanguageModel:
-    """Get the LLM instance for the given LLM type."""
+    """Create a new LLM instance for the given LLM type."""
     # OpenAI Models
     if llm in ["gpt-4o", "gpt-4o-2024-08-06", "gpt-4o-mini", "gpt-4o-mini-2024-07-18"]:
         return ChatOpenAI(
@@ -39,7 +174,9 @@ def get_llm(
             model_name=llm,
             openai_organization=settings.OPENAI_ORGANIZATION,
             openai_api_key=api_key if api_key is not None else settings.OPENAI_API_KEY,
-            streaming=True,
+            streaming=streaming,
+            http_client=http_clients.get_sync_client(),
+            http_async_client=http_clients.get_async_client(),
         )
     
     # Anthropic Models
@@ -49,7 +186,7 @@ def get_llm(
             temperature=0,
             anthropic_api_key=api_key if api_key is not None else settings.ANTHROPIC_API_KEY,
             base_url=settings.ANTHROPIC_BASE_URL,
-            streaming=True,
+            streaming=streaming,
         )
     
     # Google Models
@@ -59,7 +196,7 @@ def get_llm(
             temperature=0,
             google_api_key=api_key if api_key is not None else settings.GOOGLE_API_KEY,
             convert_system_message_to_human=True,  # Required for proper message handling
-            stream=True,  # Gemini uses 'stream' instead of 'streaming'
+            stream=streaming,  # Gemini uses 'stream' instead of 'streaming'
         )
     
     # Azure OpenAI (if needed)
@@ -72,7 +209,9 @@ def get_llm(
             deployment_name="rnd-gpt-35-turbo",
             openai_api_key=api_key if api_key is not None else settings.OPENAI_API_KEY,
             openai_api_type="azure",
-            streaming=True,
+            streaming=streaming,
+            http_client=http_clients.get_sync_client(),
+            http_async_client=http_clients.get_async_client(),
         )
     
     # Default/Fallback
@@ -83,5 +222,7 @@ def get_llm(
             model_name="gpt-4o",
             openai_organization=settings.OPENAI_ORGANIZATION,
             openai_api_key=settings.OPENAI_API_KEY,
-            streaming=True,
+            streaming=streaming,
+            http_client=http_clients.get_sync_client(),
+            http_async_client=http_clients.get_async_client(),
         )
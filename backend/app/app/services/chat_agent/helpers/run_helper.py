@@ -1,17 +1,136 @@
 # -*- coding: utf-8 -*-
-from typing import Optional
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Awaitable, Optional, TypeVar
 
-from app.api.deps import get_redis_client
+from app.core.config import settings
+from app.utils.exceptions.common_exceptions import AgentCancelledException
 from app.utils.fastapi_globals import g
+from app.utils.redis_client import get_redis_client
 
+logger = logging.getLogger(__name__)
 
-async def is_running(run_id: Optional[str] = None) -> bool:
+RUN_CANCEL_CHANNEL = "run_cancel"
+
+T = TypeVar("T")
+
+
+class RunCancellation:
+    """
+    Push-based run cancellation.
+
+    Every run executed in this process registers an asyncio.Event. `stop_run` publishes the run id on a Redis
+    channel, the listener (one subscription per process) sets the event of the run, independent of which worker
+    received the cancel request.
+    """
+
+    def __init__(self) -> None:
+        self._events: dict[str, asyncio.Event] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def register(self, run_id: str) -> asyncio.Event:
+        event = self._events.get(run_id)
+        if event is None:
+            event = asyncio.Event()
+            self._events[run_id] = event
+        return event
+
+    def unregister(self, run_id: str) -> None:
+        self._events.pop(run_id, None)
+
+    def get(self, run_id: str) -> Optional[asyncio.Event]:
+        return self._events.get(run_id)
+
+    def cancel(self, run_id: str) -> None:
+        event = self._events.get(run_id)
+        if event is not None:
+            event.set()
+
+    async def start(self) -> None:
+        """Start listening for cancellations, e.g. on startup."""
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+        self._events.clear()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                redis_client = await get_redis_client()
+                async with redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(RUN_CANCEL_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.cancel(message["data"])
+            except Exception as e:  # CancelledError is a BaseException and stops the listener
+                logger.error(f"Run cancellation listener failed, reconnecting: {repr(e)}")
+                await asyncio.sleep(1)
+
+
+run_cancellation = RunCancellation()
+
+
+async def start_run(run_id: str) -> None:
+    """Mark a run as running, the key expires after RUN_KEY_TTL seconds."""
     redis_client = await get_redis_client()
+    await redis_client.set(run_id, "True", ex=settings.RUN_KEY_TTL)
+
+
+async def is_running(run_id: Optional[str] = None) -> bool:
     run_id = run_id or g.query_context["run_id"]
+    event = run_cancellation.get(run_id)
+    if event is not None:
+        return not event.is_set()
+    redis_client = await get_redis_client()
     is_running_bool = await redis_client.get(run_id)
     return is_running_bool is not None
 
 
 async def stop_run(run_id: str) -> None:
+    run_cancellation.cancel(run_id)
     redis_client = await get_redis_client()
     await redis_client.delete(run_id)
+    await redis_client.publish(RUN_CANCEL_CHANNEL, run_id)
+
+
+async def run_until_cancelled(
+    awaitable: Awaitable[T],
+    run_id: Optional[str],
+) -> T:
+    """
+    Await the run and cancel it as soon as `stop_run` is called for its run id.
+
+    Cancelling the task propagates into the in-flight tool and LLM calls, which releases their provider connections.
+
+    Raises:
+        AgentCancelledException: If the run was cancelled.
+    """
+    if run_id is None:
+        return await awaitable
+
+    cancel_event = run_cancellation.register(run_id)
+    run_task = asyncio.ensure_future(awaitable)
+    cancel_task = asyncio.ensure_future(cancel_event.wait())
+    try:
+        await asyncio.wait(
+            [run_task, cancel_task],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if run_task.done():
+            return run_task.result()
+        run_task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await run_task
+        raise AgentCancelledException("The agent is cancelled.")
+    finally:
+        if not run_task.done():
+            run_task.cancel()
+        cancel_task.cancel()
+        run_cancellation.unregister(run_id)
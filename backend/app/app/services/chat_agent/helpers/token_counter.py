@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Sequence
+
+import tiktoken
+from langchain.base_language import BaseLanguageModel
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Anthropic and Gemini tokenizers are not available locally, their counts are approximated with cl100k_base
+APPROXIMATED_MODEL_PREFIXES = (
+    "claude",
+    "gemini",
+    "models/gemini",
+)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Get the (cached) tokenizer for a model name."""
+    if model.startswith(APPROXIMATED_MODEL_PREFIXES):
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def get_model_name(llm: BaseLanguageModel) -> str:
+    """Get the model name of an LLM instance, used to select the tokenizer."""
+    for attribute in ("model_name", "model"):
+        model = getattr(llm, attribute, None)
+        if isinstance(model, str):
+            return model
+    return "gpt-4"
+
+
+class TokenCounter:
+    """
+    Token counting service.
+
+    Encoders are cached per model and counts are memoized per (encoding, string), so repeated strings such as
+    static system prompts are only tokenized once. Strings longer than `max_cached_string_length` are not memoized.
+    """
+
+    def __init__(
+        self,
+        max_cached_strings: int = 4096,
+        max_cached_string_length: int = 20_000,
+    ) -> None:
+        self.max_cached_strings = max_cached_strings
+        self.max_cached_string_length = max_cached_string_length
+        self._counts: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(
+        self,
+        string: str,
+        model: str = "gpt-4",
+    ) -> int:
+        """Count the tokens of a string."""
+        return self.count_batch([string], model)[0]
+
+    def count_batch(
+        self,
+        strings: Sequence[str],
+        model: str = "gpt-4",
+    ) -> List[int]:
+        """Count the tokens of many strings, encoding all uncached strings in one batch."""
+        encoding = get_encoding(model)
+        counts: dict[str, int] = {}
+        misses: List[str] = []
+        with self._lock:
+            for string in strings:
+                if string in counts:
+                    continue
+                key = (encoding.name, string)
+                if key in self._counts:
+                    self._counts.move_to_end(key)
+                    counts[string] = self._counts[key]
+                else:
+                    counts[string] = -1
+                    misses.append(string)
+
+        if misses:
+            encoded = encoding.encode_batch(misses, disallowed_special=())
+            with self._lock:
+                for string, tokens in zip(misses, encoded):
+                    counts[string] = len(tokens)
+                    if len(string) <= self.max_cached_string_length:
+                        self._counts[(encoding.name, string)] = len(tokens)
+                while len(self._counts) > self.max_cached_strings:
+                    self._counts.popitem(last=False)
+
+        return [counts[string] for string in strings]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+token_counter = TokenCounter()
@@ -1,19 +1,48 @@
 # -*- coding: utf-8 -*-
+import logging
 from typing import Callable, List, Optional
 
 from langchain.agents import AgentExecutor
 from langchain.base_language import BaseLanguageModel
+from langchain.chains.llm import LLMChain
 from langchain.memory import ChatMessageHistory, ConversationTokenBufferMemory
-from langchain.schema import AIMessage, HumanMessage
+from langchain.schema import AIMessage, BaseMessage, HumanMessage
 
 from app.core.config import settings
 from app.schemas.agent_schema import AgentConfig
 from app.schemas.tool_schema import LLMType
+from app.services.chat_agent.helpers.conversation_memory import (
+    acount_message_tokens,
+    count_message_tokens,
+    get_conversation_turns,
+    prune_messages,
+)
 from app.services.chat_agent.helpers.llm import get_llm
+from app.services.chat_agent.router_agent.router_cache import get_action_plans_version
 from app.services.chat_agent.router_agent.SimpleRouterAgent import SimpleRouterAgent
 from app.services.chat_agent.tools.tools import get_tools
 from app.utils.config_loader import get_agent_config
 
+logger = logging.getLogger(__name__)
+
+
+def _create_conv_token_buffer_memory(
+    messages: List[BaseMessage],
+    api_key: str,
+) -> ConversationTokenBufferMemory:
+    agent_config = get_agent_config()
+    llm = get_llm(
+        agent_config.common.llm,
+        api_key=api_key,
+    )
+    return ConversationTokenBufferMemory(
+        memory_key="chat_history",
+        return_messages=True,
+        max_token_limit=agent_config.common.max_token_length,
+        llm=llm,
+        chat_memory=ChatMessageHistory(messages=messages),
+    )
+
 
 def get_conv_token_buffer_memory(
     chat_messages: List[AIMessage | HumanMessage],
@@ -23,8 +52,8 @@ def get_conv_token_buffer_memory(
     Get a ConversationTokenBufferMemory from a list of chat messages.
 
     This function takes a list of chat messages and returns a ConversationTokenBufferMemory object.
-    It first gets the agent configuration and the language model, and then creates a ConversationTokenBufferMemory
-    object. It then iterates over the chat messages, saving the context of the conversation to the memory.
+    It converts the chat messages into conversation turns, counts the tokens of each message once and prunes the
+    oldest messages with a running total until the history fits into `max_token_length`.
 
     Args:
         chat_messages (List[Union[AIMessage, HumanMessage]]): The list of chat messages.
@@ -34,42 +63,132 @@ def get_conv_token_buffer_memory(
         ConversationTokenBufferMemory: The ConversationTokenBufferMemory object.
     """
     agent_config = get_agent_config()
-    llm = get_llm(
-        agent_config.common.llm,
-        api_key=api_key,
+    messages = get_conversation_turns(chat_messages)
+    token_counts = count_message_tokens(messages, agent_config.common.llm)
+    return _create_conv_token_buffer_memory(
+        prune_messages(messages, token_counts, agent_config.common.max_token_length),
+        api_key,
     )
-    chat_history = ChatMessageHistory()
-    memory = ConversationTokenBufferMemory(
-        memory_key="chat_history",
-        return_messages=True,
-        max_token_limit=agent_config.common.max_token_length,
-        llm=llm,
-        chat_memory=chat_history,
+
+
+async def aget_conv_token_buffer_memory(
+    chat_messages: List[AIMessage | HumanMessage],
+    api_key: str,
+    conversation_id: Optional[str] = None,
+) -> ConversationTokenBufferMemory:
+    """
+    Get a ConversationTokenBufferMemory from a list of chat messages asynchronously.
+
+    Same as `get_conv_token_buffer_memory`, but the per-message token counts are cached in Redis per conversation,
+    so only the new turns of a conversation are tokenized on each request.
+
+    Args:
+        chat_messages (List[Union[AIMessage, HumanMessage]]): The list of chat messages.
+        api_key (str): The API key.
+        conversation_id (Optional[str]): The conversation id used as cache key.
+
+    Returns:
+        ConversationTokenBufferMemory: The ConversationTokenBufferMemory object.
+    """
+    agent_config = get_agent_config()
+    messages = get_conversation_turns(chat_messages)
+    token_counts = await acount_message_tokens(messages, agent_config.common.llm, conversation_id)
+    return _create_conv_token_buffer_memory(
+        prune_messages(messages, token_counts, agent_config.common.max_token_length),
+        api_key,
     )
 
-    i = 0
-    while i < len(chat_messages):
-        if isinstance(
-            chat_messages[i],
-            HumanMessage,
-        ):
-            if isinstance(
-                chat_messages[i + 1],
-                AIMessage,
-            ):
-                memory.save_context(
-                    inputs={"input": chat_messages[i].content},
-                    outputs={"output": chat_messages[i + 1].content},  # type: ignore
-                )
-                i += 1
+
+class MetaAgentRegistry:
+    """
+    Process-wide registry holding the tools and router prompt of the meta agent.
+
+    Building the tools is expensive (LLM clients, database connections), so it is done once at startup. Each request
+    then gets a cheap executor via `create_executor`, which only holds the per-run state (selected action plan and
+    the router LLM for the request's API key).
+    """
+
+    def __init__(
+        self,
+        agent_config: AgentConfig,
+        get_llm_hook: Callable[[LLMType, Optional[str]], BaseLanguageModel] = get_llm,
+    ) -> None:
+        self.agent_config = agent_config
+        self.get_llm_hook = get_llm_hook
+        self.tools = get_tools(tools=agent_config.tools)
+        self.prompt = SimpleRouterAgent.create_prompt(
+            prompt_message=agent_config.prompt_message,
+            system_context=agent_config.system_context,
+            action_plans=agent_config.action_plans,
+        )
+        self.action_plans_version = get_action_plans_version(agent_config.action_plans)
+        self.default_llm_chain = LLMChain(
+            llm=get_llm_hook(
+                agent_config.common.llm,
+                settings.OPENAI_API_KEY,
+            ),
+            prompt=self.prompt,
+        )
+
+    def create_executor(
+        self,
+        api_key: Optional[str] = None,
+    ) -> AgentExecutor:
+        """
+        Create an isolated AgentExecutor for a single run.
+
+        The tools and the router prompt are shared, the router agent (holding the selected action plan) is new.
+
+        Args:
+            api_key (Optional[str]): The API key of the request, defaults to the configured OpenAI API key.
+
+        Returns:
+            AgentExecutor: The AgentExecutor object.
+        """
+        if api_key is None or api_key == "" or api_key == settings.OPENAI_API_KEY:
+            llm_chain = self.default_llm_chain
         else:
-            memory.save_context(
-                inputs={"input": chat_messages[i].content},
-                outputs={"output": ""},
+            llm_chain = LLMChain(
+                llm=self.get_llm_hook(
+                    self.agent_config.common.llm,
+                    api_key,
+                ),
+                prompt=self.prompt,
             )
-        i += 1
 
-    return memory
+        simple_router_agent = SimpleRouterAgent(
+            tools=self.tools,
+            llm_chain=llm_chain,
+            action_plans=self.agent_config.action_plans,
+            action_plans_version=self.action_plans_version,
+        )
+        return AgentExecutor.from_agent_and_tools(
+            agent=simple_router_agent,
+            tools=self.tools,
+            verbose=True,
+            max_iterations=15,
+            max_execution_time=300,
+            early_stopping_method="generate",
+            handle_parsing_errors=True,
+        )
+
+
+meta_agent_registry: dict[str, MetaAgentRegistry] = {}
+
+
+def load_meta_agent_registry() -> MetaAgentRegistry:
+    """Build the meta agent registry from the agent config."""
+    logger.info("Building meta agent registry...")
+    registry = MetaAgentRegistry(get_agent_config())
+    meta_agent_registry["meta_agent"] = registry
+    return registry
+
+
+def get_meta_agent_registry() -> MetaAgentRegistry:
+    registry = meta_agent_registry.get("meta_agent", None)
+    if registry is None:
+        registry = load_meta_agent_registry()
+    return registry
 
 
 def create_meta_agent(
@@ -83,35 +202,15 @@ def create_meta_agent(
     It retrieves the language models and the list tools, with which a SimpleRouterAgent is created.
     Then, it returns an AgentExecutor.
 
+    Note: this builds all tools from scratch, use `get_meta_agent_registry().create_executor` on the request path.
+
     Args:
         agent_config (AgentConfig): The AgentConfig object.
 
     Returns:
         AgentExecutor: The AgentExecutor object.
     """
-    api_key = agent_config.api_key
-    if api_key is None or api_key == "":
-        api_key = settings.OPENAI_API_KEY
-
-    llm = get_llm_hook(
-        agent_config.common.llm,
-        api_key,
-    )
-
-    tools = get_tools(tools=agent_config.tools)
-    simple_router_agent = SimpleRouterAgent.from_llm_and_tools(
-        tools=tools,
-        llm=llm,
-        prompt_message=agent_config.prompt_message,
-        system_context=agent_config.system_context,
-        action_plans=agent_config.action_plans,
-    )
-    return AgentExecutor.from_agent_and_tools(
-        agent=simple_router_agent,
-        tools=tools,
-        verbose=True,
-        max_iterations=15,
-        max_execution_time=300,
-        early_stopping_method="generate",
-        handle_parsing_errors=True,
-    )
+    return MetaAgentRegistry(
+        agent_config,
+        get_llm_hook=get_llm_hook,
+    ).create_executor(agent_config.api_key)
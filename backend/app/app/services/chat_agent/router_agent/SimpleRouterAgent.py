@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import logging
+import time
 from typing import Any, List, Optional, Tuple, Union
 
 import openai
@@ -18,10 +19,14 @@ from langchain.prompts.chat import (
 )
 from langchain.schema import AgentAction, AgentFinish, BaseMessage
 from langchain.tools import BaseTool
+from pydantic import InstanceOf
 
+from app.core.config import settings
 from app.schemas.agent_schema import ActionPlan, ActionPlans
 from app.schemas.tool_schema import ToolInputSchema, UserSettings
 from app.services.chat_agent.helpers.run_helper import is_running
+from app.services.chat_agent.router_agent.embedding_router import get_embedding_router
+from app.services.chat_agent.router_agent.router_cache import get_action_plans_version, router_cache
 from app.utils.exceptions.common_exceptions import AgentCancelledException
 
 logger = logging.getLogger(__name__)
@@ -33,8 +38,15 @@ class SimpleRouterAgent(BaseMultiActionAgent):
     tools: List[BaseTool]
     llm_chain: LLMChain
 
-    action_plans: ActionPlans = ActionPlans(action_plans={})
-    action_plan: Optional[ActionPlan] = None
+    # pydantic v1 models of the agent config, only checked for their type
+    action_plans: InstanceOf[ActionPlans] = ActionPlans(action_plans={})
+    action_plans_version: Optional[str] = None  # see `get_action_plans_version`, computed on first use if None
+    action_plan: Optional[InstanceOf[ActionPlan]] = None
+
+    def get_action_plans_version(self) -> str:
+        if self.action_plans_version is None:
+            self.action_plans_version = get_action_plans_version(self.action_plans)
+        return self.action_plans_version
 
     @property
     def input_keys(
@@ -105,7 +117,7 @@ class SimpleRouterAgent(BaseMultiActionAgent):
         retries = 0
         while self.action_plan is None:
             try:
-                full_output = await self.llm_chain.apredict(**kwargs)
+                full_output = await self._aselect_action_plan(**kwargs)
                 action_plan = ActionPlan(**self.action_plans.action_plans[full_output].dict())
                 self.action_plan = action_plan
                 logger.info(f"Action plan selected: {full_output}, {str(action_plan)}")
@@ -153,6 +165,62 @@ class SimpleRouterAgent(BaseMultiActionAgent):
             log="",
         )
 
+    async def _aselect_action_plan(
+        self,
+        **kwargs: Any,
+    ) -> str:
+        """
+        Select the action plan key, using the router cache and the embedding router if enabled.
+
+        The router LLM decides if there is no cached decision and the embedding router is disabled or not
+        confident. Only decisions that map to a configured action plan are cached.
+        """
+        lookup = None
+        if settings.ROUTER_CACHE_ENABLED:
+            lookup = await router_cache.aget(
+                self.get_action_plans_version(),
+                kwargs["input"],
+                kwargs.get("chat_history", []),
+            )
+            if lookup.plan is not None:
+                logger.info(f"Action plan from router cache: {lookup.plan}")
+                return lookup.plan
+
+        start = time.monotonic()
+        full_output = await self._aclassify_action_plan(
+            kwargs["input"],
+            kwargs.get("chat_history", []),
+        )
+        if full_output is None:
+            full_output = await self.llm_chain.apredict(**kwargs)
+        if lookup is not None and full_output in self.action_plans.action_plans:
+            router_cache.set(lookup, full_output, time.monotonic() - start)
+        return full_output
+
+    async def _aclassify_action_plan(
+        self,
+        query: str,
+        chat_history: List[BaseMessage],
+    ) -> Optional[str]:
+        """Classify the question with the embedding router, returns None if the router LLM should decide."""
+        if not settings.ROUTER_CLASSIFIER_ENABLED:
+            return None
+        if len(chat_history) > 0 and not settings.ROUTER_CLASSIFIER_WITH_CHAT_HISTORY:
+            return None
+        try:
+            prediction = await get_embedding_router(self.action_plans, self.get_action_plans_version()).aclassify(query)
+        except Exception as e:
+            logger.warning(f"Embedding router failed, falling back to LLM: {repr(e)}")
+            return None
+        if not prediction.confident:
+            logger.info(
+                f"Embedding router not confident (score {prediction.score:.3f}, margin {prediction.margin:.3f}), "
+                "falling back to LLM"
+            )
+            return None
+        logger.info(f"Action plan from embedding router: {prediction.plan} (score {prediction.score:.3f})")
+        return prediction.plan
+
     @classmethod
     def create_prompt(
         cls,
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.schemas.agent_schema import ActionPlans
+from app.services.chat_agent.helpers.embedding_models import get_embedding_model
+from app.services.chat_agent.router_agent.router_cache import get_action_plans_version, normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouterPrediction:
+    plan: str
+    score: float
+    margin: float
+    confident: bool
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-10)
+
+
+class EmbeddingRouter:
+    """
+    Embedding classifier for action plans.
+
+    The description and the labelled example questions of every action plan are embedded once. A question is scored
+    against all of them with one matrix product, the score of an action plan is its best matching reference. A
+    prediction is confident if the best score is above `confidence_threshold` and ahead of the second best action
+    plan by at least `min_margin`, otherwise the router LLM should decide.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        action_plans: ActionPlans,
+        confidence_threshold: float,
+        min_margin: float = 0.0,
+    ) -> None:
+        self.embeddings = embeddings
+        self.confidence_threshold = confidence_threshold
+        self.min_margin = min_margin
+        self.plans = list(action_plans.action_plans.keys())
+        # References are grouped per action plan, `offsets` marks the first reference of each plan
+        self._texts: List[str] = []
+        offsets = []
+        for action_plan in action_plans.action_plans.values():
+            offsets.append(len(self._texts))
+            self._texts.append(normalize_query(action_plan.description))
+            self._texts.extend(normalize_query(example) for example in action_plan.examples)
+        self._offsets = np.asarray(offsets, dtype=np.intp)
+        self._references: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+        self.confident_predictions = 0
+        self.fallbacks = 0
+
+    async def aload(self) -> None:
+        """Embed the references, only on first use."""
+        if self._references is not None:
+            return
+        async with self._lock:
+            if self._references is None:
+                vectors = await self.embeddings.aembed_documents(self._texts)
+                self._references = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+    def _predict(self, vectors: np.ndarray) -> List[RouterPrediction]:
+        assert self._references is not None
+        similarities = _normalize_rows(vectors) @ self._references.T
+        plan_scores = np.maximum.reduceat(similarities, self._offsets, axis=1)
+        if plan_scores.shape[1] > 1:
+            top_2 = np.sort(plan_scores, axis=1)[:, -2:]
+            margins = top_2[:, 1] - top_2[:, 0]
+        else:
+            margins = np.full(plan_scores.shape[0], np.inf, dtype=np.float32)
+        best = np.argmax(plan_scores, axis=1)
+
+        predictions = []
+        for i, plan_idx in enumerate(best):
+            score = float(plan_scores[i, plan_idx])
+            margin = float(margins[i])
+            predictions.append(
+                RouterPrediction(
+                    plan=self.plans[plan_idx],
+                    score=score,
+                    margin=margin,
+                    confident=score >= self.confidence_threshold and margin >= self.min_margin,
+                )
+            )
+        return predictions
+
+    def _record(self, predictions: List[RouterPrediction]) -> List[RouterPrediction]:
+        for prediction in predictions:
+            if prediction.confident:
+                self.confident_predictions += 1
+            else:
+                self.fallbacks += 1
+        return predictions
+
+    async def aclassify_batch(
+        self,
+        queries: Sequence[str],
+    ) -> List[RouterPrediction]:
+        """Classify many questions at once."""
+        await self.aload()
+        vectors = await self.embeddings.aembed_documents([normalize_query(query) for query in queries])
+        return self._record(self._predict(np.asarray(vectors, dtype=np.float32)))
+
+    async def aclassify(
+        self,
+        query: str,
+    ) -> RouterPrediction:
+        """Classify a question."""
+        await self.aload()
+        vector = await self.embeddings.aembed_query(normalize_query(query))
+        return self._record(self._predict(np.asarray([vector], dtype=np.float32)))[0]
+
+    def stats(self) -> dict[str, Any]:
+        total = self.confident_predictions + self.fallbacks
+        return {
+            "references": len(self._texts),
+            "confident_predictions": self.confident_predictions,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": self.fallbacks / total if total > 0 else 0.0,
+        }
+
+
+embedding_routers: dict[str, EmbeddingRouter] = {}
+
+
+def get_embedding_router(
+    action_plans: ActionPlans,
+    version: Optional[str] = None,
+) -> EmbeddingRouter:
+    """Get the embedding router of the action plans (of the given version), created on first use."""
+    if version is None:
+        version = get_action_plans_version(action_plans)
+    router = embedding_routers.get(version)
+    if router is None:
+        router = EmbeddingRouter(
+            get_embedding_model(settings.ROUTER_CLASSIFIER_EMBEDDING_MODEL),
+            action_plans,
+            confidence_threshold=settings.ROUTER_CLASSIFIER_CONFIDENCE_THRESHOLD,
+            min_margin=settings.ROUTER_CLASSIFIER_MIN_MARGIN,
+        )
+        embedding_routers[version] = router
+    return router
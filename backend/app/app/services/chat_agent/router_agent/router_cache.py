@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import BaseMessage
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.schemas.agent_schema import ActionPlans
+from app.services.chat_agent.helpers.embedding_models import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a user question for exact matching (case and whitespace insensitive)."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+def get_chat_history_fingerprint(chat_history: Sequence[BaseMessage]) -> str:
+    """Fingerprint of the chat history, decisions are only reused within the same conversation context."""
+    digest = hashlib.sha1()
+    for message in chat_history:
+        digest.update(f"{message.type}:{message.content}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_action_plans_version(action_plans: ActionPlans) -> str:
+    """Version of the action plans config, decisions are only reused for the same version."""
+    return hashlib.sha1(action_plans.json().encode("utf-8")).hexdigest()
+
+
+@dataclass
+class RouterCacheLookup:
+    """Result of a router cache lookup, passed back to `set` on a miss to avoid embedding twice."""
+
+    key: str
+    context_key: str
+    plan: Optional[str] = None
+    embedding: Optional[List[float]] = None
+
+
+@dataclass
+class _ContextEmbeddings:
+    keys: List[str] = field(default_factory=list)
+    embeddings: List[List[float]] = field(default_factory=list)
+
+
+class RouterCache:
+    """
+    Action plan decision cache in front of the router LLM.
+
+    The first tier is an exact match on the action plans version, normalized question and chat history fingerprint.
+    The optional second tier embeds the question and reuses the decision of the most similar cached question (same
+    action plans version and chat history), if its cosine similarity is above `similarity_threshold`.
+    Agents with different action plans (e.g. the meta agent and nested agents) share the cache without evicting each
+    other's decisions. Entries expire after `ttl` seconds and are evicted least recently used beyond `max_size`.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: int,
+        similarity_threshold: Optional[float] = None,
+        get_embeddings: Optional[Callable[[], Embeddings]] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._get_embeddings = get_embeddings
+        self._embeddings: Optional[Embeddings] = None
+        self._entries: OrderedDict[str, tuple[str, float, str]] = OrderedDict()
+        self._context_embeddings: dict[str, _ContextEmbeddings] = defaultdict(_ContextEmbeddings)
+        self._stats: dict[str, dict[str, float]] = defaultdict(
+            lambda: {"exact_hits": 0, "similar_hits": 0, "misses": 0, "llm_latency_s": 0.0, "saved_latency_s": 0.0}
+        )
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        if self.similarity_threshold is None or self._get_embeddings is None:
+            return None
+        if self._embeddings is None:
+            self._embeddings = self._get_embeddings()
+        return self._embeddings
+
+    def _get_entry(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        plan, expires_at, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return plan
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        context = self._context_embeddings.get(entry[2])
+        if context is not None and key in context.keys:
+            idx = context.keys.index(key)
+            del context.keys[idx]
+            del context.embeddings[idx]
+            if len(context.keys) == 0:
+                del self._context_embeddings[entry[2]]
+
+    def _record_hit(self, plan: str, hit_type: str) -> None:
+        stats = self._stats[plan]
+        stats[hit_type] += 1
+        misses = stats["misses"]
+        if misses > 0:
+            stats["saved_latency_s"] += stats["llm_latency_s"] / misses
+
+    async def aget(
+        self,
+        config_version: str,
+        query: str,
+        chat_history: Sequence[BaseMessage],
+    ) -> RouterCacheLookup:
+        """Look up a cached action plan decision, `plan` is None on a miss."""
+        context_key = f"{config_version}:{get_chat_history_fingerprint(chat_history)}"
+        key = hashlib.sha1(f"{context_key}:{normalize_query(query)}".encode("utf-8")).hexdigest()
+        lookup = RouterCacheLookup(key=key, context_key=context_key)
+
+        lookup.plan = self._get_entry(key)
+        if lookup.plan is not None:
+            self._record_hit(lookup.plan, "exact_hits")
+            return lookup
+
+        embeddings = self.embeddings
+        if embeddings is None or self.similarity_threshold is None:
+            return lookup
+        try:
+            lookup.embedding = await embeddings.aembed_query(normalize_query(query))
+        except Exception as e:
+            logger.warning(f"Could not embed query for router cache: {repr(e)}")
+            return lookup
+
+        context = self._context_embeddings.get(context_key)
+        if context is None or len(context.keys) == 0:
+            return lookup
+        matrix = np.asarray(context.embeddings, dtype=np.float32)
+        vector = np.asarray(lookup.embedding, dtype=np.float32)
+        similarities = matrix @ vector / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector) + 1e-10)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            lookup.plan = self._get_entry(context.keys[best])
+            if lookup.plan is not None:
+                self._record_hit(lookup.plan, "similar_hits")
+        return lookup
+
+    def set(
+        self,
+        lookup: RouterCacheLookup,
+        plan: str,
+        latency: float,
+    ) -> None:
+        """Store the action plan decision of the router LLM for a missed lookup."""
+        stats = self._stats[plan]
+        stats["misses"] += 1
+        stats["llm_latency_s"] += latency
+
+        self._remove(lookup.key)
+        self._entries[lookup.key] = (plan, time.monotonic() + self.ttl, lookup.context_key)
+        if lookup.embedding is not None:
+            context = self._context_embeddings[lookup.context_key]
+            context.keys.append(lookup.key)
+            context.embeddings.append(lookup.embedding)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict[str, Any]:
+        """Hit rate and saved latency per action plan."""
+        action_plans = {}
+        for plan, stats in self._stats.items():
+            hits = stats["exact_hits"] + stats["similar_hits"]
+            requests = hits + stats["misses"]
+            action_plans[plan] = {
+                **stats,
+                "hit_rate": hits / requests if requests > 0 else 0.0,
+            }
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "action_plans": action_plans,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._context_embeddings.clear()
+
+
+router_cache = RouterCache(
+    max_size=settings.ROUTER_CACHE_MAX_SIZE,
+    ttl=settings.ROUTER_CACHE_TTL,
+    similarity_threshold=settings.ROUTER_CACHE_SIMILARITY_THRESHOLD,
+    get_embeddings=lambda: get_embedding_model(settings.ROUTER_CACHE_EMBEDDING_MODEL),
+)
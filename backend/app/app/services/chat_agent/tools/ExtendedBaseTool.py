@@ -12,7 +12,8 @@ from langchain.tools import BaseTool
 
 from app.schemas.agent_schema import AgentAndToolsConfig
 from app.schemas.tool_schema import ToolConfig
-from app.services.chat_agent.helpers.llm import get_llm, get_token_length
+from app.services.chat_agent.helpers.llm import get_llm
+from app.services.chat_agent.helpers.token_counter import get_model_name, token_counter
 
 
 class ExtendedBaseTool(BaseTool):
@@ -109,18 +110,28 @@ class ExtendedBaseTool(BaseTool):
         messages: List[BaseMessage],
         discard_fast_llm: bool = False,
         run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+        llm_kwargs: Optional[dict[str, Any]] = None,
     ) -> str:
-        """Generate a response asynchronously with the preferential llm."""
+        """Generate a response asynchronously with the preferential llm, `llm_kwargs` are passed to the llm call."""
         if self.fast_llm_token_limit is None:
             raise ValueError("fast_llm_token_limit must be set in the config, current value `None`")
         llm = (
             self.fast_llm
-            if get_token_length("".join([m.content if isinstance(m.content, str) else "" for m in messages]))
+            if not discard_fast_llm
+            and sum(
+                token_counter.count_batch(
+                    [m.content if isinstance(m.content, str) else "" for m in messages],
+                    get_model_name(self.fast_llm),
+                )
+            )
             < self.fast_llm_token_limit
-            and not discard_fast_llm
             else self.llm
         )
-        llm_response = await llm.agenerate([messages], callbacks=run_manager.get_child() if run_manager else None)
+        llm_response = await llm.agenerate(
+            [messages],
+            callbacks=run_manager.get_child() if run_manager else None,
+            **(llm_kwargs or {}),
+        )
         return llm_response.generations[0][0].text
 
     def _run(
@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 """Example of a chain nested inside a tool."""
 import logging
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 from langchain.agents import AgentExecutor
 from langchain.base_language import BaseLanguageModel
 from langchain.callbacks.manager import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
 from langchain.chains.base import Chain
+from langchain.tools import BaseTool
 
 from app.schemas.agent_schema import ActionPlan, ActionPlans, AgentAndToolsConfig, AgentConfig
 from app.schemas.streaming_schema import StreamingDataTypeEnum
@@ -18,10 +19,11 @@ from app.services.chat_agent.tools.tools import get_tools
 from app.utils.config_loader import load_agent_config_override
 
 
-def get_chain(llm: BaseLanguageModel, config: AgentConfig) -> Chain:
+def get_chain(llm: BaseLanguageModel, config: AgentConfig, tools: Optional[List[BaseTool]] = None) -> Chain:
     """create an agent executor to run a SimpleRouterAgent (similar to
     create_meta_agent)"""
-    tools = get_tools(tools=config.tools, load_nested=False)
+    if tools is None:
+        tools = get_tools(tools=config.tools, load_nested=False)
     agent = SimpleRouterAgent.from_llm_and_tools(
         tools=tools,
         llm=llm,
@@ -45,9 +47,10 @@ class ChainTool(ExtendedBaseTool):
     """Chain Tool to run a nested meta agent as a chain."""
 
     # define the name of your tool, matching the name in the config
-    name = "chain_tool"
-    appendix_title = "Chain Appendix"
+    name: str = "chain_tool"
+    appendix_title: str = "Chain Appendix"
     agent_config: AgentConfig
+    tools: List[BaseTool] = []
 
     @classmethod
     def from_config(
@@ -76,6 +79,7 @@ class ChainTool(ExtendedBaseTool):
         # add all custom prompts from your config, below are the standard ones
         return cls(
             agent_config=agent_config,
+            tools=get_tools(tools=agent_config.tools, load_nested=False),
             llm=llm,
             fast_llm=fast_llm,
             fast_llm_token_limit=fast_llm_token_limit,
@@ -110,7 +114,7 @@ class ChainTool(ExtendedBaseTool):
                     "chain_action", data_type=StreamingDataTypeEnum.ACTION, tool=self.name, step=1
                 )
 
-            chain = get_chain(llm=self.llm, config=self.agent_config)
+            chain = get_chain(llm=self.llm, config=self.agent_config, tools=self.tools)
 
             response = await chain.acall(
                 {
@@ -11,7 +11,8 @@ from langchain.callbacks.manager import AsyncCallbackManagerForToolRun, Callback
 from langchain.schema import HumanMessage, SystemMessage
 
 from app.core.config import settings
-from app.db.vector_db_pdf_ingestion import PDFExtractionPipeline, get_pdf_pipeline
+from app.db.vector_db_pdf_ingestion import get_pdf_vector_search
+from app.db.vector_search import AsyncPGVectorSearch
 from app.schemas.agent_schema import AgentAndToolsConfig
 from app.schemas.streaming_schema import StreamingDataTypeEnum
 from app.schemas.tool_schema import ToolConfig, ToolInputSchema
@@ -28,7 +29,7 @@ class PDFTool(ExtendedBaseTool):
 
     name: str = "pdf_tool"
     appendix_title: str = "PDF Appendix"
-    pdf_pipeline: PDFExtractionPipeline
+    vector_search: AsyncPGVectorSearch
 
     @classmethod
     def from_config(
@@ -88,7 +89,7 @@ class PDFTool(ExtendedBaseTool):
             )
             if config.system_context_refinement
             else None,
-            pdf_pipeline=get_pdf_pipeline(),
+            vector_search=get_pdf_vector_search(),
         )
 
     def _run(
@@ -148,15 +149,8 @@ class PDFTool(ExtendedBaseTool):
         # Use standard query formatting
         query = standard_query_format(ToolInputSchema.parse_raw(query))
         try:
-            logger.info("Filtering relevant documents")
-            db_pdf_docs = self.pdf_pipeline.run(load_index=True)
-
             logger.info("Filtering DB for relevant info...")
-            docs = db_pdf_docs.as_retriever(
-                search_kwargs={
-                    "k": 4,
-                }  # tbd search_kwargs
-            ).get_relevant_documents(query)
+            docs = await self.vector_search.asimilarity_search(query, k=4)  # tbd search_kwargs
             retrieved_docs = "\n".join([doc.page_content for doc in docs])
 
             result = await self._aqa_pdf_chunks(
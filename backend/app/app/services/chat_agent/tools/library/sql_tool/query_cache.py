@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.services.chat_agent.helpers.embedding_models import get_embedding_model
+from app.services.chat_agent.router_agent.router_cache import normalize_query
+from app.services.chat_agent.tools.library.sql_tool.schema_catalog import SchemaCatalog
+
+logger = logging.getLogger(__name__)
+
+# Numbers and quoted values, paraphrases only share a query if they ask for the same values
+_LITERAL_PATTERN = re.compile(r"\d+(?:[.,:/-]\d+)*|'[^']*'|\"[^\"]*\"")
+
+
+def get_question_literals(question: str) -> frozenset[str]:
+    """Numbers and quoted values of a normalized question (e.g. years, ids, names in quotes)."""
+    return frozenset(_LITERAL_PATTERN.findall(question))
+
+
+@dataclass
+class SQLQueryCacheEntry:
+    question: str
+    tables: List[str]
+    table_versions: dict[str, Optional[str]]  # schema catalog version of every table when the query was validated
+    response: str  # LLM response with the SQL query (markdown)
+    query: str  # parsed SQL query
+    result_summary: str
+    literals: frozenset[str]
+    expires_at: float
+    embedding: Optional[np.ndarray] = None  # unit vector
+    hits: int = 0
+
+
+@dataclass
+class SQLQueryCacheLookup:
+    """Result of a SQL query cache lookup, passed back to `set` on a miss to avoid embedding twice."""
+
+    key: str
+    literals: frozenset[str]
+    entry: Optional[SQLQueryCacheEntry] = None
+    score: float = 0.0
+    embedding: Optional[np.ndarray] = None
+
+
+@dataclass
+class _Stats:
+    exact_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    failed_reuses: int = 0
+    min_similar_score: Optional[float] = None
+
+
+class SQLQueryCache:
+    """
+    Cache of validated SQL queries by question, in front of the table selection, generation and validation LLMs.
+
+    The first tier is an exact match on the normalized question (including the chat history). The optional second
+    tier embeds the question and reuses the query of the most similar cached question, if its cosine similarity is
+    above `similarity_threshold` and both questions contain the same numbers and quoted values.
+    An entry is invalidated when the schema catalog version of one of its tables changed (columns added, renamed or
+    removed), expires after `ttl` seconds, and is evicted least recently used beyond `max_size`.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: int,
+        similarity_threshold: Optional[float] = None,
+        get_embeddings: Optional[Callable[[], Embeddings]] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._get_embeddings = get_embeddings
+        self._embeddings: Optional[Embeddings] = None
+        self._entries: OrderedDict[str, SQLQueryCacheEntry] = OrderedDict()
+        self._stats = _Stats()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        if self.similarity_threshold is None or self._get_embeddings is None:
+            return None
+        if self._embeddings is None:
+            self._embeddings = self._get_embeddings()
+        return self._embeddings
+
+    @staticmethod
+    def get_table_versions(
+        schema_catalog: SchemaCatalog,
+        tables: Sequence[str],
+    ) -> dict[str, Optional[str]]:
+        """Catalog version of the tables, unknown tables have no version."""
+        versions = {}
+        for name in tables:
+            table = schema_catalog.get(name)
+            versions[table.name if table is not None else name] = table.version if table is not None else None
+        return versions
+
+    def _is_valid(
+        self,
+        key: str,
+        entry: SQLQueryCacheEntry,
+        schema_catalog: SchemaCatalog,
+    ) -> bool:
+        if entry.expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return False
+        if self.get_table_versions(schema_catalog, list(entry.table_versions)) != entry.table_versions:
+            logger.info(f"Schema of {entry.tables} changed, invalidating cached SQL query")
+            self._entries.pop(key, None)
+            self._stats.invalidations += 1
+            return False
+        return True
+
+    async def aget(
+        self,
+        question: str,
+        schema_catalog: SchemaCatalog,
+    ) -> SQLQueryCacheLookup:
+        """Look up a validated SQL query for the question, `entry` is None on a miss."""
+        normalized_question = normalize_query(question)
+        lookup = SQLQueryCacheLookup(
+            key=hashlib.sha1(normalized_question.encode("utf-8")).hexdigest(),
+            literals=get_question_literals(normalized_question),
+        )
+
+        entry = self._entries.get(lookup.key)
+        if entry is not None and self._is_valid(lookup.key, entry, schema_catalog):
+            self._entries.move_to_end(lookup.key)
+            entry.hits += 1
+            self._stats.exact_hits += 1
+            lookup.entry, lookup.score = entry, 1.0
+            return lookup
+
+        embeddings = self.embeddings
+        if embeddings is not None and self.similarity_threshold is not None:
+            try:
+                vector = np.asarray(await embeddings.aembed_query(normalized_question), dtype=np.float32)
+                lookup.embedding = vector / max(float(np.linalg.norm(vector)), 1e-10)
+            except Exception as e:
+                logger.warning(f"Could not embed question for SQL query cache: {repr(e)}")
+
+        candidates = [
+            (key, entry, entry.embedding)
+            for key, entry in self._entries.items()
+            if entry.embedding is not None and entry.literals == lookup.literals
+        ]
+        if lookup.embedding is not None and len(candidates) > 0:
+            scores = np.stack([embedding for _, _, embedding in candidates]) @ lookup.embedding
+            for i in np.argsort(-scores):
+                if scores[i] < self.similarity_threshold:
+                    break
+                key, candidate, _ = candidates[i]
+                if self._is_valid(key, candidate, schema_catalog):
+                    self._entries.move_to_end(key)
+                    candidate.hits += 1
+                    self._stats.similar_hits += 1
+                    self._stats.min_similar_score = min(self._stats.min_similar_score or 1.0, float(scores[i]))
+                    lookup.entry, lookup.score = candidate, float(scores[i])
+                    return lookup
+
+        self._stats.misses += 1
+        return lookup
+
+    def set(
+        self,
+        lookup: SQLQueryCacheLookup,
+        question: str,
+        tables: List[str],
+        table_versions: dict[str, Optional[str]],
+        response: str,
+        query: str,
+        result_summary: str,
+    ) -> None:
+        """Store the validated SQL query of a missed lookup."""
+        self._entries.pop(lookup.key, None)
+        self._entries[lookup.key] = SQLQueryCacheEntry(
+            question=question,
+            tables=tables,
+            table_versions=table_versions,
+            response=response,
+            query=query,
+            result_summary=result_summary,
+            literals=lookup.literals,
+            expires_at=time.monotonic() + self.ttl,
+            embedding=lookup.embedding,
+        )
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def remove(
+        self,
+        lookup: SQLQueryCacheLookup,
+    ) -> None:
+        """Remove the entry of a hit whose query could not be executed anymore."""
+        if lookup.entry is None:
+            return
+        for key, entry in list(self._entries.items()):
+            if entry is lookup.entry:
+                del self._entries[key]
+        self._stats.failed_reuses += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Hit rate, invalidations and similarity of the reused queries."""
+        hits = self._stats.exact_hits + self._stats.similar_hits
+        requests = hits + self._stats.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "exact_hits": self._stats.exact_hits,
+            "similar_hits": self._stats.similar_hits,
+            "misses": self._stats.misses,
+            "invalidations": self._stats.invalidations,
+            "failed_reuses": self._stats.failed_reuses,
+            "hit_rate": hits / requests if requests > 0 else 0.0,
+            "min_similar_score": self._stats.min_similar_score,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+sql_query_cache = SQLQueryCache(
+    max_size=settings.SQL_QUERY_CACHE_MAX_SIZE,
+    ttl=settings.SQL_QUERY_CACHE_TTL,
+    similarity_threshold=settings.SQL_QUERY_CACHE_SIMILARITY_THRESHOLD,
+    get_embeddings=lambda: get_embedding_model(settings.SQL_QUERY_CACHE_EMBEDDING_MODEL),
+)
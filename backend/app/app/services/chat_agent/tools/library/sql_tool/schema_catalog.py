@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.services.chat_agent.helpers.embedding_models import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+# Characters of a table structure (columns and sample rows) used for its embedding
+MAX_EMBEDDING_TEXT_LENGTH = 2000
+
+
+def normalize_table_name(name: str) -> str:
+    """Normalize a table name for lookups (case, whitespace and quote insensitive)."""
+    return name.strip().strip(".").replace('"', "").replace("`", "").upper()
+
+
+@dataclass
+class CatalogTable:
+    position: int
+    name: str
+    schema_str: str  # table description as used in the SQL prompt
+    embedding_text: str
+    version: str  # changes with the columns of the table
+
+
+@dataclass
+class TableMatch:
+    name: str
+    score: float
+
+
+class SchemaCatalog:
+    """
+    Schema catalog of a database, built once from its `DatabaseInfo`.
+
+    Tables are indexed by normalized "schema.table" name (and by table name if it is unique across schemas), the
+    prompt description of every table is precomputed. With an embedding model, tables can be selected by similarity
+    of their name and structure to the question instead of asking an LLM.
+    """
+
+    def __init__(
+        self,
+        db_info: Any,
+        get_embeddings: Optional[Callable[[], Embeddings]] = None,
+    ) -> None:
+        self.db_info = db_info
+        self._get_embeddings = get_embeddings
+        self._embeddings: Optional[Embeddings] = None
+        self.tables: List[CatalogTable] = []
+        self._index: dict[str, CatalogTable] = {}
+        table_name_counts: dict[str, int] = {}
+        for position, table in enumerate(db_info.tables):
+            catalog_table = CatalogTable(
+                position=position,
+                name=table.name,
+                schema_str="DB.TABLE name: " + table.name + ", Table structure: " + table.structure,
+                embedding_text=f"{table.name}\n{table.structure}"[:MAX_EMBEDDING_TEXT_LENGTH],
+                version=getattr(table, "fingerprint", None) or hashlib.sha1(table.structure.encode()).hexdigest(),
+            )
+            self.tables.append(catalog_table)
+            self._index[normalize_table_name(table.name)] = catalog_table
+            short_name = normalize_table_name(table.name).split(".")[-1]
+            table_name_counts[short_name] = table_name_counts.get(short_name, 0) + 1
+
+        for catalog_table in self.tables:
+            short_name = normalize_table_name(catalog_table.name).split(".")[-1]
+            if table_name_counts[short_name] == 1:
+                self._index.setdefault(short_name, catalog_table)
+
+        self._table_embeddings: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        if self._embeddings is None and self._get_embeddings is not None:
+            self._embeddings = self._get_embeddings()
+        return self._embeddings
+
+    def get(self, name: str) -> Optional[CatalogTable]:
+        return self._index.get(normalize_table_name(name))
+
+    def get_table_schemas(self, names: Sequence[str]) -> str:
+        """Prompt descriptions of the tables, in database order, unknown names are ignored."""
+        tables = {table.position: table for table in (self.get(name) for name in names) if table is not None}
+        return "\n".join(tables[position].schema_str for position in sorted(tables))
+
+    async def aload_embeddings(self) -> None:
+        """Embed the table names and structures, only on first use."""
+        if self._table_embeddings is not None or self.embeddings is None:
+            return
+        async with self._lock:
+            if self._table_embeddings is None:
+                vectors = np.asarray(
+                    await self.embeddings.aembed_documents([table.embedding_text for table in self.tables]),
+                    dtype=np.float32,
+                )
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                self._table_embeddings = vectors / np.maximum(norms, 1e-10)
+
+    async def asearch(
+        self,
+        question: str,
+        top_k: int,
+    ) -> List[TableMatch]:
+        """Get the `top_k` tables most similar to the question, best first."""
+        if self.embeddings is None:
+            raise ValueError("The schema catalog has no embedding model")
+        if len(self.tables) == 0:
+            return []
+        await self.aload_embeddings()
+        assert self._table_embeddings is not None
+
+        vector = np.asarray(await self.embeddings.aembed_query(question), dtype=np.float32)
+        scores = self._table_embeddings @ (vector / max(float(np.linalg.norm(vector)), 1e-10))
+        top_k = min(top_k, len(self.tables))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [TableMatch(name=self.tables[i].name, score=float(scores[i])) for i in best]
+
+
+schema_catalogs: dict[int, SchemaCatalog] = {}
+
+
+def get_schema_catalog(
+    db_info: Any,
+    embedding_model: Optional[str] = None,
+) -> SchemaCatalog:
+    """Get the schema catalog of the database info, built once per `DatabaseInfo` instance."""
+    catalog = schema_catalogs.get(id(db_info))
+    if catalog is None or catalog.db_info is not db_info:
+        catalog = SchemaCatalog(
+            db_info,
+            get_embeddings=lambda: get_embedding_model(embedding_model),
+        )
+        schema_catalogs.clear()
+        schema_catalogs[id(db_info)] = catalog
+    return catalog
@@ -2,21 +2,30 @@
 # mypy: disable-error-code="override"
 from __future__ import annotations
 
+import asyncio
 import logging
 import re
 from typing import Any, List, Optional, Tuple
 
 from langchain.callbacks.manager import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import BaseMessage, HumanMessage, SystemMessage
 
 from app.core.config import settings
 from app.db.session import sql_tool_db
+from app.db.SQLDatabaseExtended import QueryCostExceededError
 from app.schemas.agent_schema import AgentAndToolsConfig
 from app.schemas.streaming_schema import StreamingDataTypeEnum
-from app.schemas.tool_schema import SqlToolConfig, ToolInputSchema
+from app.schemas.tool_schema import SqlToolConfig, TableSelectionType, ToolInputSchema
 from app.services.chat_agent.helpers.llm import get_llm
 from app.services.chat_agent.helpers.query_formatting import standard_query_format
+from app.services.chat_agent.helpers.token_counter import get_model_name, token_counter
 from app.services.chat_agent.tools.ExtendedBaseTool import ExtendedBaseTool
+from app.services.chat_agent.tools.library.sql_tool.query_cache import (
+    SQLQueryCache,
+    SQLQueryCacheLookup,
+    sql_query_cache,
+)
+from app.services.chat_agent.tools.library.sql_tool.schema_catalog import SchemaCatalog, get_schema_catalog
 from app.utils.sql import is_sql_query_safe
 
 logger = logging.getLogger(__name__)
@@ -32,6 +41,15 @@ class SQLTool(ExtendedBaseTool):
     validate_empty_results: bool = False
     validate_with_llm: bool = False
     always_limit_query: bool = False
+    max_validation_rows: int = 10_000
+    max_validation_bytes: int = 100_000
+    table_selection: TableSelectionType = "llm"
+    table_selection_top_k: int = 5
+    table_selection_min_score: float = 0.8
+    table_selection_embedding_model: Optional[str] = None
+    candidate_fan_out: int = 1
+    candidate_max_temperature: float = 1.0
+    candidate_token_budget: Optional[int] = None
 
     @classmethod
     def from_config(
@@ -92,6 +110,15 @@ class SQLTool(ExtendedBaseTool):
             validate_empty_results=config.validate_empty_results,
             validate_with_llm=config.validate_with_llm,
             always_limit_query=config.always_limit_query,
+            max_validation_rows=config.max_validation_rows,
+            max_validation_bytes=config.max_validation_bytes,
+            table_selection=config.table_selection,
+            table_selection_top_k=config.table_selection_top_k,
+            table_selection_min_score=config.table_selection_min_score,
+            table_selection_embedding_model=config.table_selection_embedding_model,
+            candidate_fan_out=config.candidate_fan_out,
+            candidate_max_temperature=config.candidate_max_temperature,
+            candidate_token_budget=config.candidate_token_budget,
         )
 
     @staticmethod
@@ -149,47 +176,38 @@ class SQLTool(ExtendedBaseTool):
         )
         query = standard_query_format(ToolInputSchema.parse_raw(query))
         try:
+            cache_lookup = await self._alookup_cached_query(query)
+            if cache_lookup is not None and cache_lookup.entry is not None:
+                cached_result = await self._areuse_cached_query(
+                    cache_lookup,
+                    run_manager,
+                )
+                if cached_result is not None:
+                    return cached_result
+
             filtered_tables = await self._alist_sql_tables(
                 query,
                 run_manager,
             )
             (
-                schemas,
+                result,
                 response,
-            ) = await self._aquery_with_schemas(
+                is_valid,
+                results_str,
+            ) = await self._agenerate_valid_query(
                 query,
                 filtered_tables,
                 run_manager,
             )
 
-            result: str | None = None
-            retries: int = 0
-            is_valid = False
-
-            if schemas == "":
-                result = "no_data"
-
-            while result is None:
-                (
-                    is_valid,
-                    results_str,
-                    complaints,
-                ) = await self._avalidate_response(
+            if is_valid and cache_lookup is not None:
+                await self._acache_query(
+                    cache_lookup,
                     query,
+                    filtered_tables,
                     response,
-                    run_manager,
+                    results_str,
                 )
-                if is_valid or retries > 3:
-                    result = response
-                else:
-                    response = await self._aimprove_query(
-                        query,
-                        response,
-                        complaints,
-                        schemas,
-                        run_manager,
-                    )
-                    retries += 1
 
             if run_manager is not None:
                 if is_valid:
@@ -221,6 +239,163 @@ class SQLTool(ExtendedBaseTool):
                 return repr(e)
             raise e
 
+    async def _agenerate_valid_query(
+        self,
+        query: str,
+        filtered_tables: List[str],
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Tuple[str, str, bool, Any]:
+        """
+        Generate an SQL query for the question and improve it until it is valid, at most 4 times.
+
+        With `candidate_fan_out` > 1, the first query is the first valid one of concurrently generated candidates.
+
+        Returns:
+            Tuple[str, str, bool, Any]: (result, response, is_valid, results_str), the result is "no_data" if none of
+            the tables was found in the database
+        """
+        validation: Optional[Tuple[bool, Any, Any]] = None
+        if self.candidate_fan_out > 1:
+            (
+                schemas,
+                response,
+                validation,
+            ) = await self._aquery_candidates(
+                query,
+                filtered_tables,
+                run_manager,
+            )
+        else:
+            (
+                schemas,
+                response,
+            ) = await self._aquery_with_schemas(
+                query,
+                filtered_tables,
+                run_manager,
+            )
+
+        result: str | None = None
+        retries: int = 0
+        is_valid = False
+        results_str: Any = []
+
+        if schemas == "":
+            result = "no_data"
+
+        while result is None:
+            (
+                is_valid,
+                results_str,
+                complaints,
+            ) = (
+                validation
+                if validation is not None
+                else await self._avalidate_response(
+                    query,
+                    response,
+                    run_manager,
+                )
+            )
+            validation = None
+            if is_valid or retries > 3:
+                result = response
+            else:
+                response = await self._aimprove_query(
+                    query,
+                    response,
+                    complaints,
+                    schemas,
+                    run_manager,
+                )
+                retries += 1
+        return (
+            result,
+            response,
+            is_valid,
+            results_str,
+        )
+
+    async def _alookup_cached_query(
+        self,
+        query: str,
+    ) -> Optional[SQLQueryCacheLookup]:
+        """Look up a validated SQL query of the same or a similar question, None if the cache is disabled."""
+        schema_catalog = self._get_schema_catalog()
+        if not settings.SQL_QUERY_CACHE_ENABLED or schema_catalog is None:
+            return None
+        lookup = await sql_query_cache.aget(
+            query,
+            schema_catalog,
+        )
+        if lookup.entry is not None:
+            logger.info(f"SQL query from cache (similarity {lookup.score:.3f}): {lookup.entry.query}")
+        return lookup
+
+    async def _areuse_cached_query(
+        self,
+        lookup: SQLQueryCacheLookup,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Optional[str]:
+        """
+        Re-execute the SQL query of a cache hit, skipping table selection, generation and LLM validation.
+
+        Returns None if the query does not return results anymore, the question is then answered without the cache.
+        """
+        assert lookup.entry is not None
+        (
+            is_valid,
+            results_str,
+            complaints,
+        ) = await self._asample_query(lookup.entry.query)
+        if not is_valid:
+            logger.info(f"Cached SQL query is not valid anymore: {complaints}")
+            sql_query_cache.remove(lookup)
+            return None
+
+        if run_manager is None:
+            return lookup.entry.response
+        await run_manager.on_text(
+            "validate_sql_query",
+            data_type=StreamingDataTypeEnum.ACTION,
+            tool=self.name,
+            step=1,
+            success=True,
+        )
+        await run_manager.on_text(
+            lookup.entry.response,
+            data_type=StreamingDataTypeEnum.APPENDIX,
+            tool=self.name,
+            step=1,
+            title=self.appendix_title,
+        )
+        return self._construct_final_response(
+            lookup.entry.response,
+            results_str,
+        )
+
+    async def _acache_query(
+        self,
+        lookup: SQLQueryCacheLookup,
+        question: str,
+        filtered_tables: List[str],
+        response: str,
+        results_str: str,
+    ) -> None:
+        """Store the validated SQL query of the question."""
+        schema_catalog = self._get_schema_catalog()
+        if schema_catalog is None:
+            return
+        sql_query_cache.set(
+            lookup,
+            question=question,
+            tables=filtered_tables,
+            table_versions=SQLQueryCache.get_table_versions(schema_catalog, filtered_tables),
+            response=response,
+            query=await self._parse_query(response),
+            result_summary=results_str,
+        )
+
     @staticmethod
     def _construct_final_response(
         markdown_sql_query: str,
@@ -243,42 +418,9 @@ class SQLTool(ExtendedBaseTool):
         """
         try:
             query = await self._parse_query(response)
-            if not is_sql_query_safe(query):
-                return (
-                    False,
-                    [],
-                    "The SQL query contains forbidden keywords (DML, DDL statements)",
-                )
-            if sql_tool_db is None:
-                raise ValueError("Database is not initialized")
-            results = sql_tool_db.run_no_str(query)
-            if results is None:
-                validation: Tuple[bool, Any, Any] = (
-                    False,
-                    [],
-                    f"The SQL query did not return any results: {results}",
-                )
-            elif self.validate_empty_results and len(results) == 0:
-                validation = (
-                    False,
-                    [],
-                    "The SQL query executed but did not return any result rows.",
-                )
-            else:
-                sample_rows_result = results[0 : self.nb_example_rows]
-                sample_rows = list(
-                    map(
-                        lambda ls: [f"{str(i)[:100]}..." if len(str(i)) > 100 else str(i) for i in ls],
-                        sample_rows_result,
-                    )
-                )
-                sample_rows_str = ";".join([",".join(row) for row in sample_rows]).replace(
-                    "\n",
-                    "",
-                )
-                results_str = (
-                    f"total rows from SQL query: {len(results)}, first {self.nb_example_rows} rows: {sample_rows_str}"
-                )
+            validation = await self._asample_query(query)
+            if validation[0]:
+                results_str = validation[1]
                 if self.validate_with_llm:
                     validation_messages = [
                         SystemMessage(content=self.system_context_validation or ""),
@@ -296,12 +438,6 @@ class SQLTool(ExtendedBaseTool):
                     ]
                     response = await self._agenerate_response(validation_messages)
                     validation = await self._parse_validation(response)
-                else:
-                    validation = (
-                        True,
-                        results_str,
-                        None,
-                    )
             logger.info(f"Validation: {validation} (success={validation[0]})")
             if run_manager is not None:
                 await run_manager.on_text(
@@ -325,6 +461,68 @@ class SQLTool(ExtendedBaseTool):
                 )
             raise e
 
+    async def _asample_query(
+        self,
+        query: str,
+    ) -> Tuple[bool, Any, Any]:
+        """
+        Check that the SQL query is safe and returns results, and summarize its first rows.
+
+        Returns:
+            Tuple[bool, str, str]: (is_valid, results_str, complaints)
+        """
+        if not is_sql_query_safe(query):
+            return (
+                False,
+                [],
+                "The SQL query contains forbidden keywords (DML, DDL statements)",
+            )
+        if sql_tool_db is None:
+            raise ValueError("Database is not initialized")
+        try:
+            sample = await sql_tool_db.asample(
+                query,
+                nb_rows=self.nb_example_rows,
+                max_rows=self.max_validation_rows,
+                max_bytes=self.max_validation_bytes,
+            )
+        except QueryCostExceededError as e:
+            # The explanation of the rejection is sent back to the LLM to improve the query
+            return (
+                False,
+                [],
+                str(e),
+            )
+        if len(sample.columns) == 0:
+            return (
+                False,
+                [],
+                "The SQL query did not return any results.",
+            )
+        if self.validate_empty_results and sample.total_rows == 0:
+            return (
+                False,
+                [],
+                "The SQL query executed but did not return any result rows.",
+            )
+        sample_rows = list(
+            map(
+                lambda ls: [f"{str(i)[:100]}..." if len(str(i)) > 100 else str(i) for i in ls],
+                sample.rows,
+            )
+        )
+        sample_rows_str = ";".join([",".join(row) for row in sample_rows]).replace(
+            "\n",
+            "",
+        )
+        total_rows = f"more than {sample.total_rows}" if sample.truncated else sample.total_rows
+        results_str = f"total rows from SQL query: {total_rows}, first {self.nb_example_rows} rows: {sample_rows_str}"
+        return (
+            True,
+            results_str,
+            None,
+        )
+
     async def _aimprove_query(
         self,
         query: str,
@@ -372,6 +570,11 @@ class SQLTool(ExtendedBaseTool):
                 tool=self.name,
                 step=1,
             )
+        if self.table_selection != "llm":
+            retrieved_tables = await self._aretrieve_sql_tables(query)
+            if retrieved_tables is not None:
+                return retrieved_tables
+
         table_messages = [
             SystemMessage(content=self.system_context_selection if self.system_context_selection else ""),
             HumanMessage(content=self.prompt_selection.format(question=query) if self.prompt_selection else ""),
@@ -384,6 +587,43 @@ class SQLTool(ExtendedBaseTool):
         logger.info(f"Filtered tables: {filtered_tables}")
         return filtered_tables
 
+    def _get_schema_catalog(self) -> Optional[SchemaCatalog]:
+        if sql_tool_db is None or sql_tool_db.db_info is None:
+            return None
+        return get_schema_catalog(
+            sql_tool_db.db_info,
+            self.table_selection_embedding_model,
+        )
+
+    async def _aretrieve_sql_tables(
+        self,
+        query: str,
+    ) -> Optional[List[str]]:
+        """
+        Select the tables by embedding similarity with the question.
+
+        Returns None if the LLM should select the tables: the retrieval failed, or in "hybrid" mode if the best table
+        scores below `table_selection_min_score`.
+        """
+        schema_catalog = self._get_schema_catalog()
+        if schema_catalog is None:
+            return None
+        try:
+            matches = await schema_catalog.asearch(
+                query,
+                top_k=self.table_selection_top_k,
+            )
+        except Exception as e:
+            logger.warning(f"Table retrieval failed, selecting tables with LLM: {repr(e)}")
+            return None
+        is_confident = len(matches) > 0 and matches[0].score >= self.table_selection_min_score
+        if self.table_selection == "hybrid" and not is_confident:
+            logger.info("Table retrieval not confident, selecting tables with LLM")
+            return None
+        filtered_tables = [match.name for match in matches]
+        logger.info(f"Retrieved tables: {filtered_tables}")
+        return filtered_tables
+
     async def _aquery_with_schemas(
         self,
         query: str,
@@ -398,16 +638,138 @@ class SQLTool(ExtendedBaseTool):
                 tool=self.name,
                 step=1,
             )
-        filtered_tables_upper_case = [x.upper() for x in filtered_tables]
-        db_table_infos = sql_tool_db.db_info.tables if sql_tool_db and sql_tool_db.db_info is not None else []
-        table_schemas = "\n".join(
-            [
-                ("DB.TABLE name: " + s.name + ", Table structure: " + s.structure)
-                for s in db_table_infos
-                if s.name.upper() in filtered_tables_upper_case
-            ]
+        table_schemas = self._get_table_schemas(filtered_tables)
+        response = await self._agenerate_response(
+            self._get_question_messages(
+                query,
+                table_schemas,
+            ),
+            discard_fast_llm=True,
+        )
+
+        return (
+            table_schemas,
+            response,
+        )
+
+    async def _aquery_candidates(
+        self,
+        query: str,
+        filtered_tables: List[str],
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Tuple[str, str, Optional[Tuple[bool, Any, Any]]]:
+        """
+        Generate SQL query candidates concurrently and validate each one as soon as it is generated.
+
+        The first valid candidate is returned and the remaining ones are cancelled. If no candidate is valid, the
+        first one (llm default temperature) is returned with its validation, to be improved.
+
+        Returns:
+            Tuple[str, str, Optional[Tuple[bool, Any, Any]]]: (table_schemas, response, validation)
+        """
+        if run_manager is not None:
+            await run_manager.on_text(
+                "schema_sql_db",
+                data_type=StreamingDataTypeEnum.ACTION,
+                tool=self.name,
+                step=1,
+            )
+        table_schemas = self._get_table_schemas(filtered_tables)
+        if table_schemas == "":
+            return (
+                "",
+                "",
+                None,
+            )
+        question_messages = self._get_question_messages(
+            query,
+            table_schemas,
+        )
+
+        async def agenerate_candidate(temperature: Optional[float]) -> Tuple[str, Tuple[bool, Any, Any]]:
+            candidate = await self._agenerate_response(
+                question_messages,
+                discard_fast_llm=True,
+                llm_kwargs={"temperature": temperature} if temperature is not None else None,
+            )
+            try:
+                return candidate, await self._avalidate_response(query, candidate)
+            except Exception as e:
+                return candidate, (False, [], repr(e))
+
+        tasks = [
+            asyncio.create_task(agenerate_candidate(temperature))
+            for temperature in self._get_candidate_temperatures(question_messages)
+        ]
+        try:
+            for next_candidate in asyncio.as_completed(tasks):
+                try:
+                    response, validation = await next_candidate
+                except Exception as e:
+                    logger.warning(f"SQL query candidate failed: {repr(e)}")
+                    continue
+                if validation[0]:
+                    break
+            else:
+                # raises the error of the first candidate if its generation failed
+                response, validation = tasks[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        logger.info(f"Validation of {len(tasks)} candidates: {validation} (success={validation[0]})")
+        if run_manager is not None:
+            await run_manager.on_text(
+                "validate_sql_query",
+                data_type=StreamingDataTypeEnum.ACTION,
+                tool=self.name,
+                step=1,
+                success=validation[0],
+            )
+        return (
+            table_schemas,
+            response,
+            validation,
         )
-        question_messages = [
+
+    def _get_candidate_temperatures(
+        self,
+        question_messages: List[BaseMessage],
+    ) -> List[Optional[float]]:
+        """
+        Temperatures of the SQL query candidates, None for the llm default.
+
+        The first candidate uses the llm default, the others are spread up to `candidate_max_temperature`. With
+        `candidate_token_budget`, the fan-out is reduced so that the prompts of all candidates fit in the budget.
+        The fan-out is also limited to the free workers of the database: cancelling a candidate does not stop its
+        validation query, which keeps its worker until the database returns.
+        """
+        fan_out = self.candidate_fan_out
+        if self.candidate_token_budget is not None:
+            prompt_tokens = sum(
+                token_counter.count_batch(
+                    [m.content if isinstance(m.content, str) else "" for m in question_messages],
+                    get_model_name(self.llm),
+                )
+            )
+            fan_out = max(1, min(fan_out, self.candidate_token_budget // max(prompt_tokens, 1)))
+        if sql_tool_db is not None:
+            fan_out = max(1, min(fan_out, sql_tool_db.free_workers))
+        return [None] + [self.candidate_max_temperature * i / (fan_out - 1) for i in range(1, fan_out)]
+
+    def _get_table_schemas(
+        self,
+        filtered_tables: List[str],
+    ) -> str:
+        schema_catalog = self._get_schema_catalog()
+        return schema_catalog.get_table_schemas(filtered_tables) if schema_catalog is not None else ""
+
+    def _get_question_messages(
+        self,
+        query: str,
+        table_schemas: str,
+    ) -> List[BaseMessage]:
+        return [
             SystemMessage(content=self.system_context),
             HumanMessage(
                 content=self.prompt_message.format(
@@ -416,15 +778,6 @@ class SQLTool(ExtendedBaseTool):
                 )
             ),
         ]
-        response = await self._agenerate_response(
-            question_messages,
-            discard_fast_llm=True,
-        )
-
-        return (
-            table_schemas,
-            response,
-        )
 
     @staticmethod
     async def _parse_validation(
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Redis clients shared by the whole process, one connection pool per client.
+
+The pools block (up to REDIS_POOL_TIMEOUT) instead of opening new connections when they are saturated, and count their
+connections for the saturation metrics of `get_redis_pool_stats`.
+"""
+from typing import Any, Union
+
+import redis.asyncio as aioredis
+from langchain_community.storage import RedisStore
+from redis import BlockingConnectionPool as BlockingConnectionPoolSync
+from redis import Redis as RedisSync
+from redis.asyncio import Redis
+from redis.asyncio.connection import AbstractConnection
+from redis.connection import Connection as ConnectionSync
+
+from app.core.config import settings
+
+
+class CountingBlockingConnectionPoolSync(BlockingConnectionPoolSync):
+    """BlockingConnectionPool counting its created and checked out connections, for the saturation metrics."""
+
+    def reset(self) -> None:
+        self.created_connections = 0
+        self.in_use: set[int] = set()  # ids of the checked out connections
+        super().reset()
+
+    def make_connection(self) -> ConnectionSync:
+        self.created_connections += 1
+        return super().make_connection()
+
+    def get_connection(self, command_name: object, *keys: Any, **options: Any) -> ConnectionSync:
+        connection = super().get_connection(command_name, *keys, **options)
+        self.in_use.add(id(connection))
+        return connection
+
+    def release(self, connection: ConnectionSync) -> None:
+        # also called by get_connection for a connection failing to connect, which was never checked out
+        self.in_use.discard(id(connection))
+        super().release(connection)
+
+
+class CountingBlockingConnectionPool(aioredis.BlockingConnectionPool):
+    """Async BlockingConnectionPool counting its created and checked out connections, for the saturation metrics."""
+
+    def reset(self) -> None:
+        self.created_connections = 0
+        self.in_use: set[int] = set()  # ids of the checked out connections
+        super().reset()
+
+    def make_connection(self) -> AbstractConnection:
+        self.created_connections += 1
+        return super().make_connection()
+
+    async def get_connection(self, command_name: object, *keys: Any, **options: Any) -> AbstractConnection:
+        connection = await super().get_connection(command_name, *keys, **options)
+        self.in_use.add(id(connection))
+        return connection
+
+    async def release(self, connection: AbstractConnection) -> None:
+        # also called by get_connection for a connection failing to connect, which was never checked out
+        self.in_use.discard(id(connection))
+        await super().release(connection)
+
+
+redis_clients: dict[str, Any] = {}
+
+
+def get_redis_store() -> RedisStore:
+    """Returns the shared RedisStore used for embedding caches."""
+    store = redis_clients.get("store")
+    if store is None:
+        store = RedisStore(
+            client=RedisSync(
+                connection_pool=CountingBlockingConnectionPoolSync(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=2,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT,
+                )
+            ),
+            namespace="embedding_caches",
+        )
+        redis_clients["store"] = store
+    return store
+
+
+def get_redis_client_sync() -> RedisSync:
+    """Returns the shared synchronous Redis client."""
+    client = redis_clients.get("sync")
+    if client is None:
+        client = RedisSync(
+            connection_pool=CountingBlockingConnectionPoolSync(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=0,
+                decode_responses=True,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+            )
+        )
+        redis_clients["sync"] = client
+    return client
+
+
+async def get_redis_client() -> Redis:
+    """Returns the shared asynchronous Redis client as a coroutine function which
+    should be awaited.
+
+    All callers share one connection pool per process, which blocks (up to
+    REDIS_POOL_TIMEOUT) instead of opening new connections when it is saturated.
+    """
+    client = redis_clients.get("async")
+    if client is None:
+        client = Redis(
+            connection_pool=CountingBlockingConnectionPool.from_url(
+                f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+                encoding="utf8",
+                decode_responses=True,
+            )
+        )
+        redis_clients["async"] = client
+    return client
+
+
+async def close_redis_clients() -> None:
+    """Close all shared Redis clients and disconnect their pools."""
+    client = redis_clients.pop("async", None)
+    if client is not None:
+        await client.close()
+        await client.connection_pool.disconnect()
+    sync_client = redis_clients.pop("sync", None)
+    if sync_client is not None:
+        sync_client.close()
+        sync_client.connection_pool.disconnect()
+    store = redis_clients.pop("store", None)
+    if store is not None:
+        store.client.close()
+        store.client.connection_pool.disconnect()
+
+
+def _get_pool_stats(
+    pool: Union[CountingBlockingConnectionPoolSync, CountingBlockingConnectionPool],
+) -> dict[str, int]:
+    """Saturation metrics of a counting BlockingConnectionPool (sync or async)."""
+    in_use = len(pool.in_use)
+    return {
+        "max_connections": pool.max_connections,
+        "created_connections": pool.created_connections,
+        "in_use_connections": in_use,
+        "available_connections": pool.created_connections - in_use,
+    }
+
+
+def get_redis_pool_stats() -> dict[str, dict[str, int]]:
+    """Returns saturation metrics for all initialized Redis pools."""
+    stats = {}
+    if "async" in redis_clients:
+        stats["async"] = _get_pool_stats(redis_clients["async"].connection_pool)
+    if "sync" in redis_clients:
+        stats["sync"] = _get_pool_stats(redis_clients["sync"].connection_pool)
+    if "store" in redis_clients:
+        stats["store"] = _get_pool_stats(redis_clients["store"].client.connection_pool)
+    return stats
@@ -1,81 +1,239 @@
 # -*- coding: utf-8 -*-
 import logging
 import re
+from functools import lru_cache
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
-
-def is_sql_query_safe(sql_string: str) -> bool:
-    """
-    Check if the given SQL string contains any DML or DDL statements.
-
-    Only allow SELECT and WITH statements.
-    """
-    # List of forbidden SQL keywords (DML and DDL statements)
-    forbidden_keywords = [
-        "base64",
+# Statements other than SELECT and WITH, rejected in statement position (see `get_sql_query_violation`). Elsewhere,
+# e.g. as column names in `SELECT comment FROM reviews`, they are allowed.
+FORBIDDEN_STATEMENTS = frozenset(
+    [
         "insert",
         "update",
         "delete",
-        "replace",
+        "merge",
+        "upsert",
         "create",
         "alter",
         "drop",
         "truncate",
+        "rename",
         "grant",
         "revoke",
+        "copy",
+        "call",
+        "exec",
+        "execute",
+        "prepare",
+        "deallocate",
+        "do",
+        "set",
+        "reset",
+        "lock",
+        "unlock",
+        "vacuum",
+        "reindex",
+        "cluster",
+        "comment",
+        "refresh",
+        "listen",
+        "notify",
+        "load",
+        "attach",
+        "detach",
+        "pragma",
+        "handler",
+        "shutdown",
+        "kill",
     ]
+)
+
+# Statements that can be nested in parentheses of a SELECT or WITH statement (data-modifying CTEs)
+NESTED_STATEMENTS = frozenset(["insert", "update", "delete", "merge"])
+
+# Clauses that write from a SELECT statement (SELECT INTO), rejected anywhere
+FORBIDDEN_CLAUSES = frozenset(["into"])
+
+# Clauses that lock rows: FOR UPDATE, FOR NO KEY UPDATE, FOR SHARE, FOR KEY SHARE, LOCK IN SHARE MODE
+LOCKING_CLAUSES = frozenset([("for", "update"), ("for", "no"), ("for", "share"), ("for", "key"), ("lock", "in")])
 
-    # List of forbidden patterns
-    forbidden_patterns = [
-        r";",  # Semicolon (to prevent multiple statements)
-        r"--",  # SQL comment
-        r"/\*",  # Start of block comment
-        r"\*/",  # End of block comment
-        r"\\",  # Backslash
-        r"`",  # Backtick
-        r"\|",  # Pipe
-        r"&",  # Ampersand
-        r"\$",  # Dollar sign
-        r"perl",  # Perl keyword
-        r"exec",  # Exec keyword
-        r"socket",  # Socket keyword
-        r"connect",  # Connect keyword
-        r"inet_aton",  # inet_aton function
-        r"sockaddr_in",  # sockaddr_in function
+# Functions with side effects or access to the server (files, network, processes, sessions)
+FORBIDDEN_FUNCTIONS = frozenset(
+    [
+        "perl",
+        "socket",
+        "connect",
+        "inet_aton",
+        "sockaddr_in",
+        "dblink",
+        "dblink_exec",
+        "lo_import",
+        "lo_export",
+        "pg_read_file",
+        "pg_read_binary_file",
+        "pg_ls_dir",
+        "pg_stat_file",
+        "pg_sleep",
+        "pg_terminate_backend",
+        "pg_cancel_backend",
+        "pg_reload_conf",
+        "set_config",
+        "load_file",
+        "xp_cmdshell",
+        "sys_exec",
+        "sys_eval",
     ]
+)
 
-    # Allowed characters (whitelist)
-    allowed_characters = re.compile(r"^[a-zA-Z0-9\s,.*()_=<>!+-/*%'']*$")
+# `replace` is only allowed as the string function, not as statement (REPLACE INTO, CREATE OR REPLACE)
+FUNCTION_ONLY_KEYWORDS = frozenset(["replace"])
 
-    sql_string = sql_string.lower()
+# Obfuscated payloads, rejected anywhere in the statement (also in string literals)
+FORBIDDEN_SUBSTRINGS = ("base64",)
 
-    # Remove comments from the SQL string
-    sql_string = re.sub(
-        r"(--[^\n]*|/\*.*?\*/)",
-        "",
-        sql_string,
-        flags=re.MULTILINE | re.DOTALL,
-    )
-
-    # Ensure the SQL string starts with SELECT or WITH
-    if not re.match(r"^\s*(select|with)\b", sql_string):
-        logger.info(f"SQL query does not start with SELECT or WITH: {sql_string}")
-        return False
+_STATEMENT_START_PATTERN = re.compile(r"(?:\s+|--[^\n]*|/\*.*?\*/)*(select|with)\b", re.DOTALL)
 
-    # Check for any forbidden keywords in the SQL string
-    if any(keyword in sql_string for keyword in forbidden_keywords):
-        logger.info(f"SQL query contains forbidden keywords: {sql_string}")
-        return False
+# Characters allowed outside of string literals: letters, digits, whitespace and `,.*()_=<>!+-/%`
+_ALLOWED_CHARACTERS_PATTERN = re.compile(r"[a-z0-9\s,.*()_=<>!+\-/%']*")
+_WORD_SEPARATORS = str.maketrans({character: " " for character in ",.*()=<>!+-/%'"})
+# Statements without any of these words are safe wherever their words are, `share` is part of all locking clauses
+# without `update`
+_FAST_PATH_FORBIDDEN_WORDS = (
+    FORBIDDEN_FUNCTIONS | FORBIDDEN_CLAUSES | FUNCTION_ONLY_KEYWORDS | NESTED_STATEMENTS | {"share"}
+)
 
-    # Check for any forbidden patterns in the SQL string
-    if any(re.search(pattern, sql_string) for pattern in forbidden_patterns):
-        logger.info(f"SQL query contains forbidden patterns: {sql_string}")
-        return False
+# Statements containing none of these words need no check of the statement positions, all locking clauses contain
+# `update` or `share`
+_POSITIONAL_WORDS = FORBIDDEN_STATEMENTS | {"share"}
+
+# Only the tokens that need a decision are matched: comments, string literals, words, parentheses and commas (for the
+# statement positions) and characters outside of the whitelist. Calls of function-only keywords like `replace(` are
+# matched with their parenthesis.
+_TOKEN_PATTERN = re.compile(
+    r"""
+    --[^\n]*
+    | /\*.*?\*/
+    | /\* | \*/
+    | '(?:[^'\\]|'')*'
+    | replace\s*\(
+    | [a-z_][a-z0-9_]*
+    | [(),]
+    | [^\sa-z0-9_,.*()=<>!+\-/%]
+    """,
+    re.VERBOSE | re.DOTALL,
+)
 
-    # Check for allowed characters only (whitelist)
-    if not allowed_characters.match(sql_string):
-        logger.info(f"SQL query contains forbidden characters: {sql_string}")
+
+def _has_only_allowed_words(
+    sql_string: str,
+    is_with: bool,
+) -> bool:
+    """
+    Fast path for statements without comments and special characters, where no word is forbidden in any position.
+
+    Words of string literals are included, so a forbidden word in a literal sends the statement to the tokenizer.
+    """
+    if "--" in sql_string or "/*" in sql_string or "*/" in sql_string:
+        return False
+    # Without backslashes, an even number of quotes means all string literals are terminated
+    if not _ALLOWED_CHARACTERS_PATTERN.fullmatch(sql_string) or sql_string.count("'") % 2 != 0:
         return False
+    words = set(sql_string.translate(_WORD_SEPARATORS).split())
+    if is_with and not FORBIDDEN_STATEMENTS.isdisjoint(words):
+        return False
+    return _FAST_PATH_FORBIDDEN_WORDS.isdisjoint(words)
+
+
+def _get_statement_position_violation(
+    tokens: List[str],
+    is_with: bool,
+) -> Optional[str]:
+    """Check the words in statement position and the locking clauses, in order of the tokens."""
+    cte_bodies: List[bool] = []  # per open parenthesis, whether it is the body of a CTE
+    subquery_start = False  # right after an opening parenthesis
+    main_statement_start = False  # after the CTEs of a WITH statement, before its SELECT
+    previous = ""
+    for token in tokens:
+        if token.startswith(("--", "/*", "'")):
+            continue
+        if token.endswith("("):
+            cte_bodies.append(is_with and not cte_bodies and previous in ("as", "materialized"))
+            subquery_start = True
+        elif token == ")":
+            if cte_bodies and cte_bodies.pop():
+                main_statement_start = True
+            subquery_start = False
+        elif token == ",":
+            if not cte_bodies:
+                main_statement_start = False  # another CTE
+            subquery_start = False
+        else:
+            if (previous, token) in LOCKING_CLAUSES:
+                return f"contains locking clause: {previous} {token}"
+            if (subquery_start and token in NESTED_STATEMENTS) or (
+                main_statement_start and not cte_bodies and token in FORBIDDEN_STATEMENTS
+            ):
+                return f"contains forbidden statement: {token}"
+            if token == "select" and not cte_bodies:
+                main_statement_start = False
+            subquery_start = False
+        previous = token
+    return None
+
+
+@lru_cache(maxsize=1024)
+def get_sql_query_violation(sql_string: str) -> Optional[str]:
+    """
+    Check a SQL statement with a compiled tokenizer.
+
+    Only one statement is allowed, its type is classified from its first word: SELECT or WITH. Other statements are
+    only rejected in statement position: data-modifying statements at the start of parentheses (CTEs, subqueries), and
+    any statement after the CTEs of a WITH statement, before its SELECT. SELECT INTO, locking clauses and the
+    forbidden functions are rejected anywhere. Words are matched whole outside of string literals, so identifiers like
+    `updated_at` or a column `comment` are allowed. Comments are skipped. Verdicts are cached.
+
+    Returns:
+        Optional[str]: The reason the statement is not safe, None if it is safe.
+    """
+    sql_string = sql_string.lower()
+    if any(substring in sql_string for substring in FORBIDDEN_SUBSTRINGS):
+        return "contains forbidden keywords"
+    start = _STATEMENT_START_PATTERN.match(sql_string)
+    if start is None:
+        return "does not start with SELECT or WITH"
+    is_with = start.group(1) == "with"
+    if _has_only_allowed_words(sql_string, is_with):
+        return None
 
+    tokens = _TOKEN_PATTERN.findall(sql_string)
+    # Each distinct token is checked once, in order of first occurrence
+    for token in dict.fromkeys(tokens):
+        if token in ("/*", "*/"):
+            return "contains an unterminated comment"
+        if token.startswith(("--", "/*")) or (len(token) > 1 and token[0] == "'") or token in ("(", ")", ","):
+            continue
+        if token[0] == "_" or token[0].isalpha():
+            if token in FORBIDDEN_FUNCTIONS:
+                return f"contains forbidden function: {token}"
+            if token in FORBIDDEN_CLAUSES or token in FUNCTION_ONLY_KEYWORDS:
+                return f"contains forbidden keyword: {token}"
+        else:
+            return f"contains forbidden character: {token}"
+    if _POSITIONAL_WORDS.isdisjoint(tokens):
+        return None
+    return _get_statement_position_violation(tokens, is_with)
+
+
+def is_sql_query_safe(sql_string: str) -> bool:
+    """
+    Check if the given SQL string contains any DML or DDL statements.
+
+    Only allow SELECT and WITH statements.
+    """
+    violation = get_sql_query_violation(sql_string)
+    if violation is not None:
+        logger.info(f"SQL query {violation}: {sql_string}")
+        return False
     return True
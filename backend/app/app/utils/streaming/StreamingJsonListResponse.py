@@ -1,11 +1,24 @@
 # -*- coding: utf-8 -*-
+import importlib
 import json
-from typing import Any, AsyncIterable, Iterable, Mapping, Optional
+import logging
+from types import ModuleType
+from typing import Any, AsyncIterable, Callable, Iterable, Mapping, Optional
 
 from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from pydantic_core import PydanticSerializationError
 from starlette.background import BackgroundTask
 from starlette.responses import StreamingResponse
 
+orjson: Optional[ModuleType]
+try:
+    orjson = importlib.import_module("orjson")
+except ImportError:  # pragma: no cover
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
 
 async def async_enumerate(
     async_sequence: AsyncIterable,
@@ -22,10 +35,47 @@ async def async_enumerate(
         idx += 1
 
 
+def encode_json_legacy(item: Any) -> str:
+    """Encode an item via jsonable_encoder, handles any type but traverses the whole model."""
+    return json.dumps(jsonable_encoder(item.dict() if isinstance(item, BaseModel) else item))
+
+
+def encode_json_pydantic(item: Any) -> str:
+    """Encode a pydantic model with its compiled serializer, falls back to jsonable_encoder for unknown types."""
+    if isinstance(item, BaseModel):
+        try:
+            return item.__pydantic_serializer__.to_json(item).decode("utf-8")
+        except PydanticSerializationError:
+            pass
+    return encode_json_legacy(item)
+
+
+def encode_json_orjson(item: Any) -> str:
+    """Encode an item with orjson (optional dependency), unknown types are converted with jsonable_encoder."""
+    if orjson is None:
+        return encode_json_pydantic(item)
+    data = item.model_dump() if isinstance(item, BaseModel) else item
+    try:
+        return orjson.dumps(data, default=jsonable_encoder).decode("utf-8")
+    except TypeError:
+        return encode_json_legacy(item)
+
+
+JSON_ENCODERS: dict[str, Callable[[Any], str]] = {
+    "json": encode_json_legacy,
+    "pydantic": encode_json_pydantic,
+    "orjson": encode_json_orjson,
+}
+
+
 class StreamingJsonListResponse(StreamingResponse):
     """
-    Converts a pydantic model generator into a streaming HTTP Response that streams a
-    JSON list, one element at a time.
+    Converts a pydantic model generator into a streaming HTTP Response that streams
+    newline-delimited JSON, one newline-terminated frame per element.
+
+    The generator may also yield lists of models (e.g. all events queued since the last
+    wakeup), which are coalesced into as few writes as possible, each at most
+    `max_chunk_size` characters.
 
     See https://github.com/tiangolo/fastapi/issues/1978
     """
@@ -42,7 +92,15 @@ class StreamingJsonListResponse(StreamingResponse):
         ] = None,
         media_type: Optional[str] = None,
         background: Optional[BackgroundTask] = None,
+        json_backend: str = "pydantic",
+        max_chunk_size: int = 65536,
     ) -> None:
+        if json_backend not in JSON_ENCODERS:
+            raise ValueError(f"Unknown JSON backend {json_backend}, use one of {list(JSON_ENCODERS)}")
+        if json_backend == "orjson" and orjson is None:
+            logger.warning("orjson is not installed, falling back to the pydantic JSON backend")
+        self.encode = JSON_ENCODERS[json_backend]
+        self.max_chunk_size = max_chunk_size
         if isinstance(
             content_generator,
             AsyncIterable,
@@ -58,27 +116,44 @@ class StreamingJsonListResponse(StreamingResponse):
             background=background,
         )
 
-    @staticmethod
+    def _encode_frames(
+        self,
+        item: Any,
+    ) -> Iterable[str]:
+        """Encode an item (or a list of items) into newline-terminated frames, coalesced up to max_chunk_size."""
+        if not isinstance(item, list):
+            yield self.encode(item) + "\n"
+            return
+
+        chunk: list[str] = []
+        chunk_size = 0
+        for element in item:
+            frame = self.encode(element) + "\n"
+            if chunk and chunk_size + len(frame) > self.max_chunk_size:
+                yield "".join(chunk)
+                chunk = []
+                chunk_size = 0
+            chunk.append(frame)
+            chunk_size += len(frame)
+        if chunk:
+            yield "".join(chunk)
+
     async def _encoded_async_generator(
+        self,
         async_generator: AsyncIterable,
     ) -> AsyncIterable[str]:
-        """Converts an asynchronous pydantic model generator into a streaming JSON
-        list."""
-        async for idx, item in async_enumerate(async_generator):
-            if idx > 0:
-                yield "\n"
-            yield json.dumps(jsonable_encoder(item.dict()))
-
-    @staticmethod
+        """Converts an asynchronous pydantic model generator into a streaming NDJSON
+        response."""
+        async for item in async_generator:
+            for chunk in self._encode_frames(item):
+                yield chunk
+
     async def _encoded_generator(
+        self,
         generator: Iterable,
     ) -> AsyncIterable[str]:
-        """Converts a synchronous pydantic model generator into a streaming JSON
-        list."""
-        for (
-            idx,
-            item,
-        ) in enumerate(generator):
-            if idx > 0:
-                yield "\n"
-            yield json.dumps(jsonable_encoder(item.dict()))
+        """Converts a synchronous pydantic model generator into a streaming NDJSON
+        response."""
+        for item in generator:
+            for chunk in self._encode_frames(item):
+                yield chunk
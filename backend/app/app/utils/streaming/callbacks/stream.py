@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import asyncio
 from datetime import datetime
-from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Union, cast
+from typing import Any, AsyncIterator, Dict, List, Optional, cast
 from uuid import UUID
 
 from langchain.callbacks.base import AsyncCallbackHandler
@@ -14,6 +14,9 @@ from langchain.schema.messages import BaseMessage
 from app.schemas.streaming_schema import StreamingData, StreamingDataTypeEnum, StreamingSignalsEnum
 from app.utils.fastapi_globals import g
 
+# Sentinel queued once the stream is done
+STREAM_END = object()
+
 
 # pylint: disable=too-many-ancestors
 class AsyncIteratorCallbackHandler(AsyncCallbackHandler):
@@ -24,7 +27,7 @@ class AsyncIteratorCallbackHandler(AsyncCallbackHandler):
     asynchronous iteration over received data.
     """
 
-    queue: asyncio.Queue[StreamingData]
+    queue: asyncio.Queue[StreamingData | object]
     done: asyncio.Event
     run_id_cached: dict[str, bool] = {}
 
@@ -44,7 +47,7 @@ class AsyncIteratorCallbackHandler(AsyncCallbackHandler):
         self,
     ) -> None:
         """
-        queue (asyncio.Queue): A queue to hold streaming data until the agent is done.
+        queue (asyncio.Queue): A queue to hold streaming data until the agent is done, terminated by `STREAM_END`.
 
         done (asyncio.Event): An event that signals the completion of data streaming.
         """
@@ -138,7 +141,7 @@ class AsyncIteratorCallbackHandler(AsyncCallbackHandler):
             )
         )
         await asyncio.sleep(1)
-        self.done.set()
+        self.set_done()
 
     async def on_tool_start(
         self,
@@ -236,48 +239,45 @@ class AsyncIteratorCallbackHandler(AsyncCallbackHandler):
             )
         )
         await asyncio.sleep(0.1)
-        self.done.set()
+        self.set_done()
+
+    def set_done(
+        self,
+    ) -> None:
+        """Signal the end of the stream, the sentinel terminates the iterators after all queued data."""
+        if not self.done.is_set():
+            self.done.set()
+            self.queue.put_nowait(STREAM_END)
 
     async def aiter(
         self,
     ) -> AsyncIterator[StreamingData]:
         """Allow streams to be stopped (e.g. on errors or cancelation) via done flag."""
-        while not self.queue.empty() or not self.done.is_set():
-            # Wait for the next token in the queue,
-            # but stop waiting if the done event is set
-            (
-                done,
-                other,
-            ) = await asyncio.wait(
-                [
-                    # NOTE: If you add other tasks here, update the code below,
-                    # which assumes each set has exactly one task each
-                    asyncio.ensure_future(self.queue.get()),
-                    asyncio.ensure_future(self.done.wait()),
-                ],
-                return_when=asyncio.FIRST_COMPLETED,
-            )
-
-            # Cancel the other task
-            while len(other) > 0:
-                other.pop().cancel()
+        async for batch in self.aiter_batches():
+            for token in batch:
+                yield token
 
-            while len(done) > 0:
-                # Extract the value of the first completed task
-                token_or_done = cast(
-                    Union[
-                        StreamingData,
-                        Literal[True],
-                    ],
-                    done.pop().result(),
-                )
+    async def aiter_batches(
+        self,
+    ) -> AsyncIterator[List[StreamingData]]:
+        """
+        Iterate over all data queued since the last wakeup.
 
-                # If the extracted value is the boolean True, the done event was set
-                if token_or_done is True:
+        Waits for the next item in the queue and then drains everything else already queued without waiting, so
+        no tasks are created per token. Stops at the sentinel queued by the done flag.
+        """
+        while True:
+            item = await self.queue.get()
+            batch: List[StreamingData] = []
+            while item is not STREAM_END:
+                batch.append(cast(StreamingData, item))
+                if self.queue.empty():
                     break
-
-                # Otherwise, the extracted value is a token, which we yield
-                yield token_or_done
+                item = self.queue.get_nowait()
+            if batch:
+                yield batch
+            if item is STREAM_END:
+                return
 
     async def on_chat_model_start(
         self,
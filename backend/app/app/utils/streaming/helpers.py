@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
-from typing import Any, AsyncGenerator, Awaitable
+from typing import Any, AsyncGenerator, Awaitable, List
 
 from app.schemas.streaming_schema import StreamingData
 from app.utils.exceptions.common_exceptions import AgentCancelledException
@@ -52,6 +53,26 @@ async def event_generator(
     stream_logger.info("\n")
 
 
+async def event_batch_generator(
+    acallback: AsyncIteratorCallbackHandler,
+    coalesce_interval: float = 0.0,
+) -> AsyncGenerator[List[StreamingData], Any]:
+    """
+    Generate batches of events from the callback handler.
+
+    Each batch holds all events queued since the last wakeup. With a coalesce_interval (in seconds), the generator
+    waits that long after each batch so that more events accumulate into the next write.
+    """
+    logger.info("Streaming response...")
+    async for batch in acallback.aiter_batches():
+        for response in batch:
+            stream_logger.debug(response)
+        yield batch
+        if coalesce_interval > 0:
+            await asyncio.sleep(coalesce_interval)
+    stream_logger.info("\n")
+
+
 async def handle_exceptions(
     awaitable: Awaitable[Any],
     stream_handler: AsyncIteratorCallbackHandler,
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import json
+from typing import Any, Generator
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import sql
+from app.db.SQLDatabaseExtended import SQLDatabaseExtended
+
+STATEMENT = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 25) "
+    "SELECT x, x * 2 AS y FROM c ORDER BY x"
+)
+
+
+@pytest.fixture
+def sql_client() -> Generator[TestClient, None, None]:
+    db = SQLDatabaseExtended.from_uri("sqlite://")
+    api = FastAPI()
+    api.include_router(sql.router, prefix="/sql")
+    with patch("app.api.v1.endpoints.sql.sql_tool_db", new=db):
+        yield TestClient(api)
+    db.close()
+
+
+def test_execute_returns_rows_by_default(sql_client: TestClient):
+    response = sql_client.get("/sql/execute", params={"statement": STATEMENT}).json()
+    assert response["message"] == "Successfully executed SQL query"
+    assert response["meta"] == {}
+    assert response["data"]["rawResult"] == [{"x": x, "y": 2 * x} for x in range(1, 26)]
+
+
+def test_execute_columnar(sql_client: TestClient):
+    response = sql_client.get("/sql/execute", params={"statement": STATEMENT, "format": "columnar"}).json()
+    assert response["data"]["columns"] == ["x", "y"]
+    assert response["data"]["values"] == [list(range(1, 26)), list(range(2, 51, 2))]
+
+
+@pytest.mark.parametrize("result_format", ["rows", "columnar"])
+def test_execute_paginated(sql_client: TestClient, result_format: str):
+    params: dict[str, Any] = {"statement": STATEMENT, "format": result_format, "page_size": 10}
+    pages = []
+    while True:
+        response = sql_client.get("/sql/execute", params=params).json()
+        pages.append(response["data"])
+        if response["meta"]["next_cursor"] is None:
+            break
+        params["cursor"] = response["meta"]["next_cursor"]
+
+    if result_format == "rows":
+        assert [len(page["rawResult"]) for page in pages] == [10, 10, 5]
+        assert [row["x"] for page in pages for row in page["rawResult"]] == list(range(1, 26))
+    else:
+        assert [len(page["values"][0]) for page in pages] == [10, 10, 5]
+        assert [x for page in pages for x in page["values"][0]] == list(range(1, 26))
+
+
+def test_execute_rejects_invalid_cursor(sql_client: TestClient):
+    response = sql_client.get("/sql/execute", params={"statement": STATEMENT, "page_size": 10}).json()
+    cursor = response["meta"]["next_cursor"]
+
+    for statement, invalid_cursor in [(STATEMENT, "not-a-cursor"), ("SELECT 1", cursor)]:
+        response = sql_client.get(
+            "/sql/execute",
+            params={"statement": statement, "page_size": 10, "cursor": invalid_cursor},
+        ).json()
+        assert response["data"] is None
+        assert response["message"] == "ValueError('Invalid cursor')"
+
+
+def test_execute_pagination_stops_at_max_offset(sql_client: TestClient):
+    params: dict[str, Any] = {"statement": STATEMENT, "page_size": 10}
+    with patch("app.api.v1.endpoints.sql.MAX_PAGE_OFFSET", 15):
+        response = sql_client.get("/sql/execute", params=params).json()
+        assert "truncated" not in response["meta"]
+        params["cursor"] = response["meta"]["next_cursor"]
+
+        response = sql_client.get("/sql/execute", params=params).json()
+        assert [row["x"] for row in response["data"]["rawResult"]] == list(range(11, 21))
+        assert response["meta"] == {"next_cursor": None, "truncated": True}
+
+        params["cursor"] = sql.encode_cursor(STATEMENT, 20)
+        response = sql_client.get("/sql/execute", params=params).json()
+        assert response["message"] == "ValueError('Invalid cursor')"
+
+
+def test_execute_ndjson(sql_client: TestClient):
+    response = sql_client.get("/sql/execute", params={"statement": STATEMENT, "format": "ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"columns": ["x", "y"]}
+    assert lines[1:] == [[x, 2 * x] for x in range(1, 26)]
+
+
+def test_execute_ndjson_rejects_pagination(sql_client: TestClient):
+    for params in [{"page_size": 10}, {"cursor": sql.encode_cursor(STATEMENT, 10)}]:
+        response = sql_client.get("/sql/execute", params={"statement": STATEMENT, "format": "ndjson", **params})
+        assert response.status_code == 422
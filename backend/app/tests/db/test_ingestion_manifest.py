@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+from app.db.ingestion_manifest import ManifestEntry, hash_file, plan_ingestion
+
+
+def _write(path: Path, content: str) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return str(path)
+
+
+def _entry(path: str, chunk_ids: list[str]) -> ManifestEntry:
+    stat = os.stat(path)
+    return ManifestEntry(
+        path=path,
+        content_hash=hash_file(path),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        chunk_ids=chunk_ids,
+    )
+
+
+def test_unchanged_files_are_not_read(tmp_path: Path):
+    path = _write(tmp_path / "a.txt", "a")
+    entries = {path: _entry(path, ["1"])}
+
+    with patch("app.db.ingestion_manifest.hash_file") as mock_hash_file:
+        plan = plan_ingestion([path], str(tmp_path), entries)
+
+    mock_hash_file.assert_not_called()
+    assert plan.unchanged == [entries[path]]
+    assert plan.to_ingest == []
+
+
+def test_plan_ingestion(tmp_path: Path):
+    unchanged = _write(tmp_path / "unchanged.txt", "unchanged")
+    changed = _write(tmp_path / "changed.txt", "before")
+    touched = _write(tmp_path / "touched.txt", "touched")
+    renamed = _write(tmp_path / "renamed.txt", "renamed")
+    deleted = _write(tmp_path / "deleted.txt", "deleted")
+    other_folder = _write(tmp_path.parent / f"{tmp_path.name}_other" / "other.txt", "other")
+    entries = {
+        path: _entry(path, [f"{os.path.basename(path)}-{i}" for i in range(2)])
+        for path in [unchanged, changed, touched, renamed, deleted, other_folder]
+    }
+
+    _write(tmp_path / "changed.txt", "after")
+    os.utime(touched, ns=(0, 0))
+    moved = _write(tmp_path / "sub" / "moved.txt", "renamed")
+    os.remove(renamed)
+    os.remove(deleted)
+    new = _write(tmp_path / "new.txt", "new")
+
+    plan = plan_ingestion([unchanged, changed, touched, moved, new], str(tmp_path), entries)
+
+    assert plan.unchanged == [entries[unchanged]]
+    assert [entry.path for entry in plan.new] == [new]
+    assert [(entry.path, entry.chunk_ids) for entry in plan.changed] == [(changed, entries[changed].chunk_ids)]
+    assert [(entry.path, entry.mtime_ns) for entry in plan.refreshed] == [(touched, 0)]
+    assert plan.refreshed[0].chunk_ids == entries[touched].chunk_ids
+    assert [(previous.path, current.path) for previous, current in plan.renamed] == [(renamed, moved)]
+    assert plan.renamed[0][1].chunk_ids == entries[renamed].chunk_ids
+    assert plan.deleted == [entries[deleted]]  # files of other folders are kept
+    assert [entry.path for entry in plan.to_ingest] == [new, changed]
+
+
+def test_bootstrapped_entries_are_refreshed(tmp_path: Path):
+    path = _write(tmp_path / "a.txt", "a")
+    entries = {path: ManifestEntry(path=path, content_hash=None, size=-1, mtime_ns=-1, chunk_ids=["1", "2"])}
+
+    plan = plan_ingestion([path], str(tmp_path), entries)
+
+    assert plan.to_ingest == []
+    assert [(entry.content_hash, entry.chunk_ids) for entry in plan.refreshed] == [(hash_file(path), ["1", "2"])]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+from langchain.document_loaders.base import BaseLoader
+from langchain.schema import Document
+
+from app.db.pdf_parsing import PDFParsingPool
+
+
+class FakeLoader(BaseLoader):
+    """Returns the file name as document, crashes the process or hangs depending on the file name."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def load(self) -> List[Document]:
+        name = Path(self.file_path).name
+        if name.startswith("crash"):
+            os._exit(1)
+        if name.startswith("hang"):
+            time.sleep(60)
+        if name.startswith("error"):
+            raise ValueError("Invalid PDF")
+        if name.startswith("slow"):
+            time.sleep(0.2)
+        return [Document(page_content=name, metadata={"source": self.file_path})]
+
+
+@pytest.mark.parametrize("max_workers", [0, 1, 3])
+def test_results_in_order(max_workers: int):
+    paths = ["slow_0.pdf"] + [f"{i}.pdf" for i in range(1, 20)]
+    pool = PDFParsingPool(FakeLoader, max_workers=max_workers, max_buffered=4)
+
+    parsed_files = list(pool.imap(paths))
+
+    assert [parsed_file.path for parsed_file in parsed_files] == paths
+    assert [parsed_file.documents[0].page_content for parsed_file in parsed_files] == paths
+
+
+def test_failing_files_are_isolated():
+    paths = ["0.pdf", "crash.pdf", "1.pdf", "hang.pdf", "error.pdf", "2.pdf"]
+    pool = PDFParsingPool(FakeLoader, max_workers=2, timeout=1)
+
+    start = time.monotonic()
+    parsed_files = list(pool.imap(paths))
+
+    assert time.monotonic() - start < 10
+    assert [parsed_file.path for parsed_file in parsed_files] == paths
+    errors = {parsed_file.path: parsed_file.error for parsed_file in parsed_files}
+    assert errors["crash.pdf"] == "Worker process exited with code 1"
+    assert errors["hang.pdf"] == "Parsing timed out after 1s"
+    assert errors["error.pdf"] == "ValueError('Invalid PDF')"
+    assert all(errors[path] is None for path in ["0.pdf", "1.pdf", "2.pdf"])
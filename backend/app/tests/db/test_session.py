@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.db import session
+from app.db.session import _get_table_infos_multi_db
+
+
+def _create_tables(db_uri: str, *statements: str) -> None:
+    engine = create_engine(db_uri)
+    with engine.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+    engine.dispose()
+
+
+def test_reflection_is_incremental(tmp_path: Path):
+    db_uri = f"sqlite:///{tmp_path / 'test.db'}"
+    _create_tables(
+        db_uri,
+        "CREATE TABLE artist (artist_id INTEGER, name TEXT)",
+        "CREATE TABLE album (album_id INTEGER, title TEXT)",
+    )
+
+    with (
+        patch.object(settings, "SQL_TOOL_DB_URI", db_uri),
+        patch("app.db.session._reflect_table", wraps=session._reflect_table) as mock_reflect_table,
+    ):
+        db_info = _get_table_infos_multi_db(["main"], max_workers=2)
+        assert [table.name for table in db_info.tables] == ["main.album", "main.artist"]
+        assert all(table.fingerprint is not None for table in db_info.tables)
+        assert "CREATE TABLE" in db_info.tables[0].structure
+        assert mock_reflect_table.call_count == 2
+
+        _create_tables(db_uri, "ALTER TABLE album ADD COLUMN year INTEGER")
+        mock_reflect_table.reset_mock()
+        refreshed_db_info = _get_table_infos_multi_db(["main"], previous=db_info, max_workers=2)
+
+    mock_reflect_table.assert_called_once()
+    assert mock_reflect_table.call_args.args[2] == "album"
+    assert "year" in refreshed_db_info.tables[0].structure
+    assert refreshed_db_info.tables[1] == db_info.tables[1]
+    assert refreshed_db_info.tables[0].fingerprint != db_info.tables[0].fingerprint
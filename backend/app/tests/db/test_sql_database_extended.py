@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import gc
+import json
+import time
+from pathlib import Path
+from typing import Generator
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app.db.SQLDatabaseExtended import QueryCostExceededError, SQLDatabaseExtended, cap_sample_bytes
+
+CHINOOK_DB_PATH = Path(__file__).parents[4] / "Chinook.db"
+
+
+@pytest.fixture
+def sql_db() -> Generator[SQLDatabaseExtended, None, None]:
+    """SQLite database with a blocking `pg_sleep(seconds)` function, like Postgres."""
+    db = SQLDatabaseExtended.from_uri("sqlite://", max_concurrency=2)
+
+    @event.listens_for(db._engine, "connect")
+    def register_pg_sleep(dbapi_connection, _):  # type: ignore
+        dbapi_connection.create_function("pg_sleep", 1, lambda seconds: time.sleep(seconds) or 1)
+
+    yield db
+    db.close()
+
+
+async def _count_ticks(stop: asyncio.Event) -> int:
+    ticks = 0
+    while not stop.is_set():
+        await asyncio.sleep(0.01)
+        ticks += 1
+    return ticks
+
+
+@pytest.mark.asyncio
+async def test_slow_query_does_not_block_event_loop(sql_db: SQLDatabaseExtended):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_count_ticks(stop))
+
+    result = await sql_db.arun_no_str("SELECT pg_sleep(0.5)")
+    stop.set()
+
+    assert result == [(1,)]
+    assert await ticker >= 20
+
+
+@pytest.mark.asyncio
+async def test_aexecute_returns_columns_and_rows(sql_db: SQLDatabaseExtended):
+    columns, rows = await sql_db.aexecute("SELECT 1 AS a, 'x' AS b")
+    assert columns == ["a", "b"]
+    assert [tuple(row) for row in rows] == [(1, "x")]
+
+
+@pytest.mark.asyncio
+async def test_query_timeout(sql_db: SQLDatabaseExtended):
+    with pytest.raises(TimeoutError):
+        await sql_db.arun_no_str("SELECT pg_sleep(1)", timeout=0.1)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap(sql_db: SQLDatabaseExtended):
+    start = time.monotonic()
+    await asyncio.gather(*[sql_db.arun_no_str("SELECT pg_sleep(0.2)") for _ in range(4)])
+    assert time.monotonic() - start >= 0.4
+
+
+@pytest.mark.asyncio
+async def test_abandoned_query_keeps_its_worker(sql_db: SQLDatabaseExtended):
+    task = asyncio.create_task(sql_db.arun_no_str("SELECT pg_sleep(0.3)"))
+    await asyncio.sleep(0.05)
+    assert sql_db.free_workers == 1
+    task.cancel()
+    await asyncio.sleep(0.05)
+    assert sql_db.free_workers == 1  # the query still runs in the database
+    await asyncio.sleep(0.4)
+    assert sql_db.free_workers == 2
+
+
+COUNT_TO_5000 = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 5000) SELECT x FROM c"
+
+
+@pytest.mark.asyncio
+async def test_sample_counts_rows_without_keeping_them(sql_db: SQLDatabaseExtended):
+    sample = await sql_db.asample(COUNT_TO_5000, nb_rows=3, max_rows=10_000)
+    assert sample.columns == ["x"]
+    assert sample.rows == [(1,), (2,), (3,)]
+    assert sample.total_rows == 5000
+    assert not sample.truncated
+
+
+@pytest.mark.asyncio
+async def test_sample_stops_counting_at_row_cap(sql_db: SQLDatabaseExtended):
+    sample = await sql_db.asample(COUNT_TO_5000, nb_rows=3, max_rows=1000)
+    assert sample.total_rows == 1000
+    assert sample.truncated
+
+    sample = await sql_db.asample(COUNT_TO_5000 + " LIMIT 2", nb_rows=3, max_rows=1000)
+    assert sample.rows == [(1,), (2,)]
+    assert sample.total_rows == 2
+
+
+@pytest.mark.asyncio
+async def test_sample_byte_cap(sql_db: SQLDatabaseExtended):
+    wide_rows = (
+        "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 500) "
+        "SELECT x, printf('%.1000c', 'a') FROM c"
+    )
+    sample = await sql_db.asample(wide_rows, nb_rows=3, max_rows=10_000, max_bytes=1500)
+    assert [(x, len(value)) for x, value in sample.rows] == [(1, 1000), (2, 498)]
+    assert sample.total_rows == 500
+
+    assert cap_sample_bytes([("abc", 1), ("de", 2)], max_bytes=3) == ([("abc", 1)], 7)
+
+
+@pytest.mark.asyncio
+async def test_fetch_page(sql_db: SQLDatabaseExtended):
+    page = await sql_db.afetch_page(COUNT_TO_5000, offset=2500, limit=3)
+    assert page.columns == ["x"]
+    assert page.rows == [(2501,), (2502,), (2503,)]
+    assert page.has_more
+
+    page = await sql_db.afetch_page(COUNT_TO_5000, offset=4998, limit=3)
+    assert page.rows == [(4999,), (5000,)]
+    assert not page.has_more
+
+
+@pytest.mark.asyncio
+async def test_stream_batches(sql_db: SQLDatabaseExtended):
+    columns, batches = await sql_db.astream(COUNT_TO_5000, batch_size=2000)
+    assert columns == ["x"]
+    sizes = [len(batch) async for batch in batches]
+    assert sizes == [2000, 2000, 1000]
+
+
+@pytest.mark.asyncio
+async def test_closed_stream_releases_worker(sql_db: SQLDatabaseExtended):
+    sql_db.max_streams = 1
+    _, batches = await sql_db.astream(COUNT_TO_5000, batch_size=10)
+    assert await anext(batches) == [(x,) for x in range(1, 11)]
+    await batches.aclose()
+
+    columns, batches = await asyncio.wait_for(sql_db.astream("SELECT 1 AS a"), timeout=1)
+    assert [batch async for batch in batches] == [[(1,)]]
+
+
+@pytest.mark.asyncio
+async def test_dropped_stream_releases_worker(sql_db: SQLDatabaseExtended):
+    sql_db.max_streams = 1
+    _, batches = await sql_db.astream(COUNT_TO_5000, batch_size=10)
+    del batches  # e.g. the client disconnected before reading
+    gc.collect()
+
+    columns, batches = await asyncio.wait_for(sql_db.astream("SELECT 1 AS a"), timeout=1)
+    assert [batch async for batch in batches] == [[(1,)]]
+
+
+@pytest.mark.asyncio
+async def test_open_stream_does_not_block_queries(sql_db: SQLDatabaseExtended):
+    sql_db.max_concurrency = 1
+    _, batches = await sql_db.astream(COUNT_TO_5000, batch_size=10)
+
+    assert await sql_db.arun_no_str("SELECT 1", timeout=1) == [(1,)]
+    await batches.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stream_timeout(sql_db: SQLDatabaseExtended):
+    sql_db.max_streams = 1
+    _, batches = await sql_db.astream(COUNT_TO_5000, batch_size=10, stream_timeout=0.3)
+    with pytest.raises(TimeoutError):
+        async for _ in batches:
+            await asyncio.sleep(0.1)  # slow consumer
+
+    # the worker was released at the deadline
+    columns, batches = await asyncio.wait_for(sql_db.astream("SELECT 1 AS a"), timeout=1)
+    assert [batch async for batch in batches] == [[(1,)]]
+
+
+@pytest.fixture
+def chinook_db() -> Generator[SQLDatabaseExtended, None, None]:
+    if not CHINOOK_DB_PATH.exists():
+        pytest.skip("Chinook.db not found")
+    db = SQLDatabaseExtended.from_uri(f"sqlite:///file:{CHINOOK_DB_PATH}?mode=ro&uri=true", max_query_cost=100_000)
+    yield db
+    db.close()
+
+
+def test_explain_sqlite_index_lookup(chinook_db: SQLDatabaseExtended):
+    estimate = chinook_db.explain(
+        "SELECT t.Name, a.Title FROM Track t JOIN Album a ON a.AlbumId = t.AlbumId WHERE t.TrackId = 5"
+    )
+    assert estimate.cost == 2
+    assert estimate.rows == 1
+    assert estimate.full_scans == []
+
+
+def test_explain_sqlite_join(chinook_db: SQLDatabaseExtended):
+    estimate = chinook_db.explain("SELECT t.Name FROM Track t JOIN InvoiceLine il ON il.TrackId = t.TrackId")
+    assert estimate.rows == 2240
+    assert estimate.cost == 2 * 2240
+    assert estimate.full_scans == ["InvoiceLine"]
+
+
+@pytest.mark.asyncio
+async def test_cartesian_join_is_rejected(chinook_db: SQLDatabaseExtended):
+    with pytest.raises(QueryCostExceededError) as e:
+        await chinook_db.aexecute("SELECT * FROM Track, InvoiceLine AS il")
+    assert e.value.estimate.rows == 3503 * 2240
+    assert e.value.estimate.full_scans == ["Track", "InvoiceLine"]
+    assert "It reads all rows of the tables Track, InvoiceLine." in str(e.value)
+
+    columns, rows = await chinook_db.aexecute(
+        "SELECT t.Name FROM Track t JOIN InvoiceLine il ON il.TrackId = t.TrackId"
+    )
+    assert columns == ["Name"]
+    assert len(rows) == 2240
+
+
+def test_sqlite_statement_timeout_interrupts_query(sql_db: SQLDatabaseExtended):
+    count_to = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < {}) SELECT COUNT(*) FROM c"
+    start = time.monotonic()
+    with pytest.raises(OperationalError, match="interrupted"):
+        sql_db.execute(count_to.format(100_000_000), timeout=0.1)
+    assert time.monotonic() - start < 2
+
+    # The deadline is removed from the pooled connection
+    time.sleep(0.2)
+    _, rows = sql_db.execute(count_to.format(100_000))
+    assert rows[0][0] == 100_000
+
+
+POSTGRES_PLAN = [
+    {
+        "Plan": {
+            "Node Type": "Nested Loop",
+            "Total Cost": 235_000.5,
+            "Plan Rows": 7_846_720,
+            "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "track", "Total Cost": 80.0, "Plan Rows": 3503},
+                {
+                    "Node Type": "Materialize",
+                    "Total Cost": 50.0,
+                    "Plan Rows": 2240,
+                    "Plans": [
+                        {
+                            "Node Type": "Seq Scan",
+                            "Relation Name": "invoice_line",
+                            "Total Cost": 40.0,
+                            "Plan Rows": 2240,
+                        },
+                    ],
+                },
+            ],
+        }
+    }
+]
+
+
+class PostgresStandIn(SQLDatabaseExtended):
+    """SQLite database answering like Postgres: EXPLAIN returns a fixed JSON plan, statement timeouts are recorded."""
+
+    @property
+    def dialect(self) -> str:
+        return "postgresql"
+
+
+@pytest.fixture
+def postgres_db() -> Generator[tuple[SQLDatabaseExtended, list[str]], None, None]:
+    db = PostgresStandIn.from_uri("sqlite://", max_query_cost=100_000, query_timeout=5)
+    statements: list[str] = []
+
+    @event.listens_for(db._engine, "before_cursor_execute", retval=True)
+    def answer_like_postgres(conn, cursor, statement, parameters, context, executemany):  # type: ignore
+        statements.append(statement)
+        if statement.startswith("EXPLAIN (FORMAT JSON)"):
+            return f"SELECT '{json.dumps(POSTGRES_PLAN)}'", parameters
+        if statement.startswith("SET LOCAL"):
+            return "SELECT 1", parameters
+        return statement, parameters
+
+    yield db, statements
+    db.close()
+
+
+@pytest.mark.asyncio
+async def test_postgres_cost_guard(postgres_db: tuple[SQLDatabaseExtended, list[str]]):
+    db, statements = postgres_db
+    with pytest.raises(QueryCostExceededError) as e:
+        await db.asample("SELECT * FROM track, invoice_line", nb_rows=3, max_rows=100)
+    assert e.value.estimate.cost == 235_000.5
+    assert e.value.estimate.rows == 7_846_720
+    assert sorted(e.value.estimate.full_scans) == ["invoice_line", "track"]
+    assert str(e.value).startswith(
+        "The SQL query is too expensive to run, its estimated cost of 235000 is above the limit of 100000."
+    )
+    assert statements == [
+        "SET LOCAL statement_timeout = 5000",
+        "EXPLAIN (FORMAT JSON) SELECT * FROM track, invoice_line",
+    ]
+
+    db.max_query_cost = 1_000_000
+    sample = await db.asample("SELECT 1 AS a", nb_rows=3, max_rows=100)
+    assert sample.rows == [(1,)]
+    assert statements[-2:] == ["SET LOCAL statement_timeout = 5000", "SELECT 1 AS a"]
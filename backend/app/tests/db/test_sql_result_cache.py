@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import datetime
+from decimal import Decimal
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+
+from app.db.sql_result_cache import (
+    SQLResultCache,
+    canonicalize_sql,
+    decode_result,
+    encode_result,
+    get_referenced_tables,
+)
+from app.db.SQLDatabaseExtended import SQLDatabaseExtended
+from app.schemas.tool_schemas.sql_tool_schema import QuerySample
+
+
+def test_canonicalize_sql():
+    assert canonicalize_sql("SELECT  *\n FROM Album;") == canonicalize_sql("select * from album")
+    assert canonicalize_sql("SELECT * FROM album WHERE title = 'Big  Ones'") == (
+        "select * from album where title = 'Big  Ones'"
+    )
+    assert canonicalize_sql('SELECT "Name" FROM artist') != canonicalize_sql('SELECT "name" FROM artist')
+
+
+def test_get_referenced_tables():
+    assert get_referenced_tables(
+        "SELECT * FROM public.Album a JOIN \"Artist\" ar ON a.artist_id = ar.artist_id WHERE a.title = 'from x'"
+    ) == {"album", "artist"}
+
+
+def test_encode_result():
+    row = (
+        1,
+        "a",
+        None,
+        1.5,
+        Decimal("12.30"),
+        datetime.datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=datetime.timezone.utc),
+        datetime.date(2024, 1, 2),
+        datetime.time(3, 4, 5),
+        datetime.timedelta(days=1, microseconds=1),
+        uuid4(),
+        b"\x00\xff",
+        {"$type": "x", "d": datetime.date(2024, 1, 2)},
+        [1, Decimal("1")],
+    )
+    assert decode_result(encode_result((["a"], [row]))) == (["a"], [row])
+
+    sample = QuerySample(columns=["a"], rows=[(Decimal("1"),)], total_rows=10, truncated=True)
+    assert decode_result(encode_result(sample)) == sample
+
+    with pytest.raises(TypeError):
+        encode_result((["a"], [(object(),)]))
+
+
+@pytest.mark.asyncio
+async def test_lru_is_bounded_by_bytes():
+    cache = SQLResultCache(max_bytes=1000, ttl=60, max_entry_bytes=1000, use_redis=False)
+    for i in range(10):
+        await cache.aset("db", f"SELECT {i} FROM t", (["a"], [("x" * 200,)]))
+
+    assert cache.stats()["bytes"] <= 1000
+    assert cache.stats()["evictions"] > 0
+    assert await cache.aget("db", "SELECT 0 FROM t") is None
+    assert await cache.aget("db", "select 9 from t") == (["a"], [("x" * 200,)])
+
+
+@pytest.mark.asyncio
+async def test_large_results_and_other_namespaces_are_not_cached():
+    cache = SQLResultCache(max_bytes=10_000, ttl=60, max_entry_bytes=100, use_redis=False)
+    await cache.aset("db", "SELECT a FROM t", (["a"], [("x" * 200,)]))
+    assert await cache.aget("db", "SELECT a FROM t") is None
+
+    await cache.aset("db", "SELECT b FROM t", (["b"], [(1,)]))
+    assert await cache.aget("other_db", "SELECT b FROM t") is None
+
+    await cache.aset("db", "SELECT c FROM t", (["c"], [(object(),)]))
+    assert await cache.aget("db", "SELECT c FROM t") is None
+
+
+@pytest.mark.asyncio
+async def test_invalidate_tables():
+    cache = SQLResultCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000, use_redis=False)
+    await cache.aset("db", "SELECT * FROM album", (["a"], [(1,)]))
+    await cache.aset("db", "SELECT * FROM artist", (["a"], [(2,)]))
+
+    await cache.ainvalidate_tables(["Album"])
+    assert await cache.aget("db", "SELECT * FROM album") is None
+    assert await cache.aget("db", "SELECT * FROM artist") is not None
+
+
+@pytest.mark.asyncio
+async def test_database_shares_cache_between_execute_and_run():
+    cache = SQLResultCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000, use_redis=False)
+    sql_db = SQLDatabaseExtended.from_uri("sqlite://", result_cache=cache)
+
+    columns, rows = await sql_db.aexecute("SELECT 1 AS a")
+    assert columns == ["a"]
+
+    with patch.object(SQLDatabaseExtended, "execute") as mock_execute:
+        assert await sql_db.arun_no_str("select 1 as a;") == [(1,)]
+        mock_execute.assert_not_called()
+    assert cache.stats()["local_hits"] == 1
+    sql_db.close()
+
+
+@pytest.mark.asyncio
+async def test_database_only_caches_read_only_statements(tmp_path):
+    cache = SQLResultCache(max_bytes=10_000, ttl=60, max_entry_bytes=10_000, use_redis=False)
+    sql_db = SQLDatabaseExtended.from_uri(f"sqlite:///{tmp_path / 'test.db'}", result_cache=cache)
+
+    assert await sql_db.arun_no_str("CREATE TABLE t (a INTEGER)") is None
+    assert await sql_db.arun_no_str("INSERT INTO t VALUES (1)") is None
+    assert await sql_db.aexecute("INSERT INTO t VALUES (2)") == ([], [])
+    assert await sql_db.arun_no_str("INSERT INTO t VALUES (3) RETURNING a") == [(3,)]
+    assert (await sql_db.asample("INSERT INTO t VALUES (4) RETURNING a", nb_rows=3, max_rows=100)).rows == [(4,)]
+    assert (await sql_db.afetch_page("INSERT INTO t VALUES (5) RETURNING a", offset=0, limit=3)).rows == [(5,)]
+    assert await sql_db.arun_no_str("SELECT a FROM t ORDER BY a") == [(1,), (2,), (3,), (4,), (5,)]
+    assert cache.stats()["entries"] == 1
+    sql_db.close()
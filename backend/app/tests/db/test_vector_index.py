@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from uuid import UUID
+
+import pytest
+
+from app.db.vector_index import (
+    get_create_index_sql,
+    get_distance_expression,
+    get_index_name,
+    get_index_state,
+    get_lists,
+    get_search_settings,
+    needs_rebuild,
+)
+from app.schemas.ingestion_schema import VectorIndexConfig, VectorIndexTypeEnum
+
+COLLECTION_ID = UUID("12345678-1234-5678-1234-567812345678")
+
+
+def test_index_name_fits_postgres_identifiers():
+    assert len(get_index_name(COLLECTION_ID) + "_new") <= 63
+
+
+@pytest.mark.parametrize("nb_rows, lists", [(10, 1), (50_000, 50), (1_000_000, 1000), (4_000_000, 2000)])
+def test_get_lists(nb_rows: int, lists: int):
+    assert get_lists(nb_rows) == lists
+
+
+def test_create_index_sql():
+    hnsw = get_create_index_sql("ix", COLLECTION_ID, 1536, VectorIndexConfig(m=8, ef_construction=32), nb_rows=10)
+    assert hnsw == (
+        "CREATE INDEX CONCURRENTLY ix ON langchain_pg_embedding "
+        "USING hnsw ((embedding::vector(1536)) vector_cosine_ops) WITH (m = 8, ef_construction = 32) "
+        f"WHERE collection_id = '{COLLECTION_ID}';"
+    )
+    ivfflat = get_create_index_sql(
+        "ix", COLLECTION_ID, 1536, VectorIndexConfig(index_type=VectorIndexTypeEnum.IVFFlat), nb_rows=200_000
+    )
+    assert "USING ivfflat ((embedding::vector(1536)) vector_cosine_ops) WITH (lists = 200)" in ivfflat
+
+    # the search expression matches the indexed expression
+    assert get_distance_expression(1536, "$1").startswith("(embedding::vector(1536)) <=> ")
+
+
+def test_search_settings():
+    assert get_search_settings(VectorIndexConfig(ef_search=100)) == "SET LOCAL hnsw.ef_search = 100;"
+    config = VectorIndexConfig(index_type=VectorIndexTypeEnum.IVFFlat, probes=4)
+    assert get_search_settings(config) == "SET LOCAL ivfflat.probes = 4;"
+
+
+def test_needs_rebuild():
+    config = VectorIndexConfig(rebuild_ratio=0.5)
+    state = get_index_state(config, dimensions=1536, nb_rows=1000)
+
+    assert needs_rebuild(None, config, 1536, 1000)
+    assert not needs_rebuild(state, config, 1536, 1400)
+    assert needs_rebuild(state, config, 1536, 1600)  # large ingest
+    assert needs_rebuild(state, config, 1536, 400)  # large deletion
+    assert needs_rebuild(state, config.copy(update={"m": 32}), 1536, 1000)
+    assert needs_rebuild(state, config.copy(update={"index_type": VectorIndexTypeEnum.IVFFlat}), 1536, 1000)
+    assert needs_rebuild(state, config, 3072, 1000)  # other embedding model
+    assert not needs_rebuild(state, config.copy(update={"ef_search": 100}), 1536, 1000)  # query-time parameter
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.db.vector_search import AsyncPGVectorSearch
+from app.schemas.ingestion_schema import VectorIndexConfig
+
+
+class ConstantEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [1.0, 0.0]
+
+
+class FakeConnection:
+    def __init__(self, collection_id: Any, dimensions: int = 2) -> None:
+        self.fetchval = AsyncMock(
+            side_effect=lambda query, *args: collection_id if "langchain_pg_collection" in query else dimensions
+        )
+        self.fetch = AsyncMock(
+            return_value=[{"document": "This is a test document.", "cmetadata": json.dumps({"source": "a.pdf"})}]
+        )
+        self.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        yield
+
+
+class FakePool:
+    def __init__(self, connection: FakeConnection) -> None:
+        self.connection = connection
+        self.close = AsyncMock()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[FakeConnection]:
+        yield self.connection
+
+
+@pytest.mark.asyncio
+async def test_similarity_search():
+    collection_id = uuid4()
+    pool = FakePool(FakeConnection(collection_id))
+    vector_search = AsyncPGVectorSearch(ConstantEmbeddings(), dsn="postgresql://test", collection_name="test")
+
+    with patch("app.db.vector_search.asyncpg.create_pool", AsyncMock(return_value=pool)) as mock_create_pool:
+        for _ in range(2):
+            docs = await vector_search.asimilarity_search("This is a test query.", k=2)
+            assert [(doc.page_content, doc.metadata) for doc in docs] == [
+                ("This is a test document.", {"source": "a.pdf"})
+            ]
+
+    mock_create_pool.assert_awaited_once()
+    pool.connection.fetchval.assert_awaited_once()
+    query, *params = pool.connection.fetch.await_args.args
+    assert "embedding <=> $2::text::vector" in query
+    assert params == [collection_id, "[1.0, 0.0]", 2]
+
+    await vector_search.aclose()
+    pool.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_missing_collection():
+    pool = FakePool(FakeConnection(None))
+    vector_search = AsyncPGVectorSearch(ConstantEmbeddings(), dsn="postgresql://test", collection_name="test")
+
+    with patch("app.db.vector_search.asyncpg.create_pool", AsyncMock(return_value=pool)):
+        assert await vector_search.asimilarity_search("This is a test query.") == []
+        assert await vector_search.asimilarity_search("This is a test query.") == []
+
+    assert pool.connection.fetchval.await_count == 2  # resolved again until the collection is ingested
+    pool.connection.fetch.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_recreated_collection():
+    pool = FakePool(FakeConnection(uuid4()))
+    vector_search = AsyncPGVectorSearch(ConstantEmbeddings(), dsn="postgresql://test", collection_name="test")
+
+    with patch("app.db.vector_search.asyncpg.create_pool", AsyncMock(return_value=pool)):
+        assert len(await vector_search.asimilarity_search("This is a test query.")) == 1
+
+        # the collection is re-created with a new id, the search on the previous id is empty
+        new_collection_id = uuid4()
+        pool.connection.fetchval.side_effect = lambda query, *args: new_collection_id
+        rows = pool.connection.fetch.return_value
+        pool.connection.fetch.side_effect = [[], rows]
+        assert len(await vector_search.asimilarity_search("This is a test query.")) == 1
+
+    assert pool.connection.fetch.await_args.args[1] == new_collection_id
+
+
+@pytest.mark.asyncio
+async def test_similarity_search_with_index():
+    collection_id = uuid4()
+    pool = FakePool(FakeConnection(collection_id, dimensions=2))
+    vector_search = AsyncPGVectorSearch(
+        ConstantEmbeddings(),
+        dsn="postgresql://test",
+        collection_name="test",
+        index_config=VectorIndexConfig(ef_search=80),
+    )
+
+    with patch("app.db.vector_search.asyncpg.create_pool", AsyncMock(return_value=pool)):
+        docs = await vector_search.asimilarity_search("This is a test query.", k=3)
+
+    assert len(docs) == 1
+    pool.connection.execute.assert_awaited_once_with("SET LOCAL hnsw.ef_search = 80;")
+    query, *params = pool.connection.fetch.await_args.args
+    assert f"collection_id = '{collection_id}'" in query
+    assert "(embedding::vector(2)) <=> $1::text::vector(2)" in query
+    assert params == ["[1.0, 0.0]", 3]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from typing import List, Optional, Sequence, Tuple
+
+from langchain.storage import InMemoryByteStore
+
+
+class CountingByteStore(InMemoryByteStore):
+    """In-memory cache counting its round trips, in place of Redis."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.nb_round_trips = 0
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        self.nb_round_trips += 1
+        return super().mget(keys)
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, bytes]]) -> None:
+        self.nb_round_trips += 1
+        super().mset(key_value_pairs)
+
+    async def amget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return self.mget(keys)
+
+    async def amset(self, key_value_pairs: Sequence[Tuple[str, bytes]]) -> None:
+        self.mset(key_value_pairs)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Previous regex based SQL safety validator, reference of the tests and the benchmark of `app.utils.sql`."""
+import re
+
+LEGACY_FORBIDDEN_KEYWORDS = [
+    "base64",
+    "insert",
+    "update",
+    "delete",
+    "replace",
+    "create",
+    "alter",
+    "drop",
+    "truncate",
+    "grant",
+    "revoke",
+]
+LEGACY_FORBIDDEN_PATTERNS = [
+    r";",
+    r"--",
+    r"/\*",
+    r"\*/",
+    r"\\",
+    r"`",
+    r"\|",
+    r"&",
+    r"\$",
+    r"perl",
+    r"exec",
+    r"socket",
+    r"connect",
+    r"inet_aton",
+    r"sockaddr_in",
+]
+
+
+def legacy_is_sql_query_safe(sql_string: str) -> bool:
+    """Previous validator: substring and regex scans over the whole statement, recompiled on every call."""
+    allowed_characters = re.compile(r"^[a-zA-Z0-9\s,.*()_=<>!+-/*%'']*$")
+    sql_string = sql_string.lower()
+    sql_string = re.sub(r"(--[^\n]*|/\*.*?\*/)", "", sql_string, flags=re.MULTILINE | re.DOTALL)
+    if not re.match(r"^\s*(select|with)\b", sql_string):
+        return False
+    if any(keyword in sql_string for keyword in LEGACY_FORBIDDEN_KEYWORDS):
+        return False
+    if any(re.search(pattern, sql_string) for pattern in LEGACY_FORBIDDEN_PATTERNS):
+        return False
+    return bool(allowed_characters.match(sql_string))
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Fake chat model and SQL tool with a simulated database, to test and benchmark SQL query candidates."""
+import asyncio
+import random
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.caches import BaseCache  # noqa: F401 pylint: disable=unused-import
+from langchain_core.callbacks import Callbacks  # noqa: F401 pylint: disable=unused-import
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field, PrivateAttr
+
+from app.schemas.tool_schemas.sql_tool_schema import DatabaseInfo, TableInfo
+from app.services.chat_agent.tools.library.sql_tool.schema_catalog import SchemaCatalog
+from app.services.chat_agent.tools.library.sql_tool.sql_tool import SQLTool
+
+VALID_QUERY = "SELECT name FROM tracks WHERE price > 1"
+INVALID_QUERY = "SELECT name FROM tracks WHERE price > 1000"
+
+SCHEMA_CATALOG = SchemaCatalog(
+    DatabaseInfo(
+        tables=[
+            TableInfo(
+                schema_name="public",
+                table_name="tracks",
+                structure="CREATE TABLE tracks (name, price)",
+            )
+        ]
+    )
+)
+
+
+class FakeSQLChatModel(BaseChatModel):
+    """Fake chat model answering with a valid SQL query with probability `p_valid`, after a lognormal latency."""
+
+    p_valid: float
+    latency_s: float  # median latency
+    latency_sigma: float = 0.3
+    calls: int = 0
+    temperatures: List[Optional[float]] = Field(default_factory=list)  # of every call, None for the llm default
+    _rng: random.Random = PrivateAttr(default_factory=lambda: random.Random(0))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        raise NotImplementedError("FakeSQLChatModel does not support sync")
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        self.temperatures.append(kwargs.get("temperature"))
+        is_valid = self._rng.random() < self.p_valid
+        await asyncio.sleep(self.latency_s * self._rng.lognormvariate(0, self.latency_sigma))
+        message = AIMessage(content=f"```sql {VALID_QUERY if is_valid else INVALID_QUERY}```")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-sql-chat-model"
+
+
+class SimulatedSQLTool(SQLTool):  # pylint: disable=abstract-method
+    """SQL tool with a fixed schema catalog and a simulated database, the invalid query returns no rows."""
+
+    db_latency_s: float = 0.01
+
+    def _get_schema_catalog(self) -> Optional[SchemaCatalog]:
+        return SCHEMA_CATALOG
+
+    async def _asample_query(
+        self,
+        query: str,
+    ) -> Tuple[bool, Any, Any]:
+        await asyncio.sleep(self.db_latency_s)
+        if query.strip() == INVALID_QUERY:
+            return (
+                False,
+                [],
+                "The SQL query executed but did not return any result rows.",
+            )
+        return (
+            True,
+            "total rows from SQL query: 1, first 3 rows: track",
+            None,
+        )
+
+
+# resolve the forward references of the llm fields outside of the app, e.g. in the benchmark script
+SimulatedSQLTool.model_rebuild()
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from typing import List, Sequence
+from typing import List, Optional, Sequence
 
 from pydantic import BaseModel
 from sqlalchemy.engine.result import Row
@@ -7,6 +7,7 @@ from sqlalchemy.sql import column
 from sqlalchemy.sql.sqltypes import String
 
 from app.db.SQLDatabaseExtended import SQLDatabaseExtended
+from app.schemas.tool_schemas.sql_tool_schema import QuerySample
 
 
 class FakeTable(BaseModel):
@@ -22,5 +23,18 @@ class FakeSQLDatabase(SQLDatabaseExtended):
     def __init__(self, db_info: FakeDBInfo):
         self.db_info = db_info
 
-    def run_no_str(self, command: str, fetch: str = "all") -> Sequence | Row | List[Row] | None:
+    def run_no_str(
+        self, command: str, fetch: str = "all", timeout: Optional[float] = None
+    ) -> Sequence | Row | List[Row] | None:
         return ["col1, col2; value1, value2"]
+
+    def sample(
+        self,
+        command: str,
+        nb_rows: int,
+        max_rows: int,
+        max_bytes: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> QuerySample:
+        rows = self.run_no_str(command)
+        return QuerySample(columns=["col1", "col2"], rows=rows[:nb_rows], total_rows=len(rows))
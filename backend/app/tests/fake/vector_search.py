@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+from typing import List
+
+from langchain.schema import Document
+from langchain.vectorstores import VectorStore
+
+from app.db.vector_search import AsyncPGVectorSearch
+
+
+class FakeVectorSearch(AsyncPGVectorSearch):
+    def __init__(self, vector_db: VectorStore):
+        self.vector_db = vector_db
+
+    async def asimilarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return self.vector_db.similarity_search(query, k=k)
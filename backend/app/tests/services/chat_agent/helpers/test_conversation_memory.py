@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from langchain.schema import AIMessage, HumanMessage
+
+from app.services.chat_agent.helpers.conversation_memory import get_conversation_turns, prune_messages
+
+
+def test_get_conversation_turns():
+    messages = get_conversation_turns(
+        [
+            HumanMessage(content="question 1"),
+            AIMessage(content="answer 1"),
+            AIMessage(content="answer 2"),
+            HumanMessage(content="question 3"),
+        ]
+    )
+    assert [(m.type, m.content) for m in messages] == [
+        ("human", "question 1"),
+        ("ai", "answer 1"),
+        ("human", "answer 2"),
+        ("ai", ""),
+    ]
+
+
+def test_prune_messages_keeps_newest():
+    messages = [HumanMessage(content=str(i)) for i in range(5)]
+    assert prune_messages(messages, [5, 5, 5, 5, 5], 12) == messages[3:]
+    assert prune_messages(messages, [5, 5, 5, 5, 5], 100) == messages
+    assert prune_messages(messages, [5, 5, 5, 5, 20], 12) == []
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.chat_agent.helpers.embedding_models import CacheBackedEmbeddingsExtended
+from tests.fake.byte_store import CountingByteStore
+
+
+class LengthEmbeddings(Embeddings):
+    """Embeds a text by its length, records the requests and the max. number of concurrent async requests."""
+
+    def __init__(self) -> None:
+        self.requests: List[List[str]] = []
+        self.running = 0
+        self.max_running = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.requests.append(texts)
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return self.embed_documents(texts)
+
+
+def get_embeddings(
+    underlying_embeddings: LengthEmbeddings,
+    store: CountingByteStore,
+    batch_size: int = 2,
+    max_batch_chars: int = 100,
+    max_concurrency: int = 2,
+) -> CacheBackedEmbeddingsExtended:
+    embeddings = CacheBackedEmbeddingsExtended.from_bytes_store(underlying_embeddings, store, batch_size=batch_size)
+    embeddings.max_batch_chars = max_batch_chars  # type: ignore
+    embeddings.max_concurrency = max_concurrency  # type: ignore
+    return embeddings  # type: ignore
+
+
+def test_embed_documents_batches_missing_texts():
+    underlying_embeddings = LengthEmbeddings()
+    store = CountingByteStore()
+    embeddings = get_embeddings(underlying_embeddings, store, max_batch_chars=5)
+    embeddings.embed_documents(["a"])
+    store.nb_round_trips = 0
+    underlying_embeddings.requests = []
+
+    vectors = embeddings.embed_documents(["bb", "a", "ccc", "bb", "dddd", "ee"])
+
+    assert vectors == [[2.0], [1.0], [3.0], [2.0], [4.0], [2.0]]
+    assert sorted(underlying_embeddings.requests) == [["bb", "ccc"], ["dddd"], ["ee"]]
+    assert store.nb_round_trips == 2
+
+    underlying_embeddings.requests = []
+    assert embeddings.embed_documents(["ee", "bb"]) == [[2.0], [2.0]]
+    assert underlying_embeddings.requests == []
+
+
+@pytest.mark.asyncio
+async def test_aembed_documents_bounds_concurrency():
+    underlying_embeddings = LengthEmbeddings()
+    store = CountingByteStore()
+    embeddings = get_embeddings(underlying_embeddings, store, batch_size=1, max_concurrency=2)
+
+    vectors = await embeddings.aembed_documents(["a", "bb", "a", "ccc", "dddd", "eeeee"])
+
+    assert vectors == [[1.0], [2.0], [1.0], [3.0], [4.0], [5.0]]
+    assert len(underlying_embeddings.requests) == 5
+    assert underlying_embeddings.max_running == 2
+    assert store.nb_round_trips == 2
+    assert await embeddings.aembed_query("bb") == [2.0]
+    assert len(underlying_embeddings.requests) == 5
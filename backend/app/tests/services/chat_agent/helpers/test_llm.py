@@ -3,7 +3,7 @@ from unittest.mock import patch
 
 from app.core.config import settings
 from app.schemas.tool_schema import LLMType
-from app.services.chat_agent.helpers.llm import get_llm, get_token_length
+from app.services.chat_agent.helpers.llm import LLMClientCache, get_llm, get_token_length
 
 def test_get_token_length():
     """Test token length calculation."""
@@ -78,3 +78,23 @@ async def test_llm_generate(model: LLMType):
         response = await llm.ainvoke(messages)
         assert isinstance(response, str)
         assert len(response) > 0
+
+def test_get_llm_reuses_client():
+    """Test that get_llm returns the cached client for the same key."""
+    assert get_llm("gpt-4o") is get_llm("gpt-4o")
+    assert get_llm("gpt-4o", api_key="key-1") is get_llm("gpt-4o", api_key="key-1")
+    assert get_llm("gpt-4o", api_key="key-1") is not get_llm("gpt-4o", api_key="key-2")
+    assert get_llm("gpt-4o", streaming=False) is not get_llm("gpt-4o")
+
+def test_llm_client_cache_evicts_user_keys():
+    """Test that clients for user-supplied keys are evicted least recently used."""
+    cache = LLMClientCache(max_size=2)
+    for key in ["key-1", "key-2", "key-1", "key-3"]:
+        cache.get("gpt-4o", key, True, object)
+    cache.get("gpt-4o", None, True, object)
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+    assert stats["evictions"] == 1
+    assert stats["user_clients"] == 2
+    assert stats["default_clients"] == 1
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from app.services.chat_agent.helpers.run_helper import is_running, run_until_cancelled, stop_run
+from app.utils.exceptions.common_exceptions import AgentCancelledException
+
+
+@pytest.mark.asyncio
+async def test_run_until_cancelled_returns_result():
+    async def run() -> str:
+        return "done"
+
+    assert await run_until_cancelled(run(), "run-1") == "done"
+
+
+@pytest.mark.asyncio
+async def test_stop_run_cancels_in_flight_run():
+    cancelled = asyncio.Event()
+
+    async def run() -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def cancel() -> None:
+        await asyncio.sleep(0.01)
+        assert await is_running("run-2")
+        await stop_run("run-2")
+
+    with pytest.raises(AgentCancelledException):
+        await asyncio.gather(run_until_cancelled(run(), "run-2"), cancel())
+    assert cancelled.is_set()
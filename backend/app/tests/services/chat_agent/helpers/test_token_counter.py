@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.services.chat_agent.helpers.llm import get_llm
+from app.services.chat_agent.helpers.token_counter import TokenCounter, get_encoding, get_model_name
+
+
+@pytest.mark.parametrize(
+    "model,encoding",
+    [
+        ("gpt-4", "cl100k_base"),
+        ("gpt-4o", "o200k_base"),
+        ("claude-3-5-sonnet-latest", "cl100k_base"),
+        ("models/gemini-2.0-flash-exp", "cl100k_base"),
+        ("unknown-model", "cl100k_base"),
+    ],
+)
+def test_get_encoding(model: str, encoding: str):
+    assert get_encoding(model).name == encoding
+    assert get_encoding(model) is get_encoding(model)
+
+
+def test_get_model_name():
+    assert get_model_name(get_llm("gpt-4o")) == "gpt-4o"
+    assert get_model_name(get_llm("gemini-2.0-flash-exp")) == "models/gemini-2.0-flash-exp"
+
+
+def test_count_batch_matches_single_counts():
+    counter = TokenCounter()
+    strings = ["Hello, world!", "You are a helpful assistant.", "Hello, world!", ""]
+    counts = counter.count_batch(strings, "gpt-4")
+    assert counts == [counter.count(s, "gpt-4") for s in strings]
+    assert counts[0] == len(get_encoding("gpt-4").encode("Hello, world!"))
+    assert counts[3] == 0
+
+
+def test_count_memoizes_bounded():
+    counter = TokenCounter(max_cached_strings=2, max_cached_string_length=10)
+    counter.count_batch(["a", "b", "c", "this string is too long to cache"])
+    assert list(key[1] for key in counter._counts) == ["b", "c"]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.schemas.agent_schema import ActionPlan, ActionPlans
+from app.services.chat_agent.router_agent.embedding_router import EmbeddingRouter
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embeds a text by counting a few keywords."""
+
+    keywords = ["image", "draw", "band", "history", "album"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(text.count(keyword)) for keyword in self.keywords]
+
+
+@pytest.fixture
+def action_plans() -> ActionPlans:
+    return ActionPlans(
+        action_plans={
+            "0": ActionPlan(
+                name="",
+                description="Gather band history",
+                actions=[["pdf_tool"]],
+                examples=["Which album did the band release first?"],
+            ),
+            "1": ActionPlan(
+                name="",
+                description="Generate an image",
+                actions=[["image_generation_tool"]],
+                examples=["Draw a picture"],
+            ),
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_confident_prediction(action_plans: ActionPlans):
+    router = EmbeddingRouter(KeywordEmbeddings(), action_plans, confidence_threshold=0.9)
+
+    prediction = await router.aclassify("Can you draw something?")
+    assert prediction.plan == "1"
+    assert prediction.confident
+
+    prediction = await router.aclassify("Tell me the band history")
+    assert prediction.plan == "0"
+    assert prediction.confident
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_falls_back(action_plans: ActionPlans):
+    router = EmbeddingRouter(KeywordEmbeddings(), action_plans, confidence_threshold=0.9)
+
+    prediction = await router.aclassify("Draw the band")
+    assert prediction.plan == "1"
+    assert not prediction.confident
+
+    prediction = await router.aclassify("What is the weather today?")
+    assert not prediction.confident
+    assert router.stats()["fallbacks"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_matches_single(action_plans: ActionPlans):
+    router = EmbeddingRouter(KeywordEmbeddings(), action_plans, confidence_threshold=0.9)
+    queries = ["Draw an image", "The history of the band", "Hello"]
+
+    batch = await router.aclassify_batch(queries)
+    single = [await router.aclassify(query) for query in queries]
+    assert [p.plan for p in batch] == [p.plan for p in single]
+    assert [p.confident for p in batch] == [p.confident for p in single]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from typing import List
+from unittest.mock import patch
+
+import pytest
+from langchain.schema import AIMessage, HumanMessage
+from langchain_core.embeddings import Embeddings
+
+from app.services.chat_agent.router_agent.router_cache import RouterCache
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embeds a text by counting a few keywords."""
+
+    keywords = ["sales", "revenue", "pdf", "report"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(text.count(keyword)) for keyword in self.keywords]
+
+
+@pytest.mark.asyncio
+async def test_exact_hit_is_case_and_whitespace_insensitive():
+    cache = RouterCache(max_size=10, ttl=60)
+    lookup = await cache.aget("v1", "What were the sales?", [])
+    assert lookup.plan is None
+    cache.set(lookup, "0", latency=1.0)
+
+    lookup = await cache.aget("v1", "  what were   the SALES? ", [])
+    assert lookup.plan == "0"
+    stats = cache.stats()["action_plans"]["0"]
+    assert stats["exact_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["saved_latency_s"] == 1.0
+    assert stats["hit_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_chat_history_is_part_of_the_key():
+    cache = RouterCache(max_size=10, ttl=60)
+    lookup = await cache.aget("v1", "And last year?", [])
+    cache.set(lookup, "0", latency=1.0)
+
+    chat_history = [HumanMessage(content="Sales in 2023?"), AIMessage(content="100")]
+    lookup = await cache.aget("v1", "And last year?", chat_history)
+    assert lookup.plan is None
+
+
+@pytest.mark.asyncio
+async def test_config_versions_are_cached_separately():
+    cache = RouterCache(max_size=10, ttl=60, similarity_threshold=0.9, get_embeddings=KeywordEmbeddings)
+    cache.set(await cache.aget("v1", "What were the sales?", []), "0", latency=1.0)
+
+    lookup = await cache.aget("v2", "What were the sales?", [])
+    assert lookup.plan is None
+    cache.set(lookup, "1", latency=1.0)
+
+    # e.g. the meta agent and a nested agent alternate
+    assert (await cache.aget("v1", "What were the sales?", [])).plan == "0"
+    assert (await cache.aget("v2", "What were the sales?", [])).plan == "1"
+    assert (await cache.aget("v2", "What were the sales and the sales?", [])).plan == "1"
+    assert cache.stats()["size"] == 2
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_lru_eviction():
+    cache = RouterCache(max_size=2, ttl=60)
+    with patch("app.services.chat_agent.router_agent.router_cache.time.monotonic", return_value=0.0):
+        for query in ["a", "b"]:
+            cache.set(await cache.aget("v1", query, []), "0", latency=1.0)
+        assert (await cache.aget("v1", "a", [])).plan == "0"
+        cache.set(await cache.aget("v1", "c", []), "1", latency=1.0)
+
+        assert (await cache.aget("v1", "b", [])).plan is None
+        assert (await cache.aget("v1", "a", [])).plan == "0"
+        assert (await cache.aget("v1", "c", [])).plan == "1"
+
+    with patch("app.services.chat_agent.router_agent.router_cache.time.monotonic", return_value=61.0):
+        assert (await cache.aget("v1", "a", [])).plan is None
+
+
+@pytest.mark.asyncio
+async def test_similarity_tier():
+    cache = RouterCache(max_size=10, ttl=60, similarity_threshold=0.9, get_embeddings=KeywordEmbeddings)
+    lookup = await cache.aget("v1", "Show the sales and revenue", [])
+    assert lookup.embedding is not None
+    cache.set(lookup, "0", latency=1.0)
+
+    lookup = await cache.aget("v1", "What is the revenue of sales?", [])
+    assert lookup.plan == "0"
+    assert cache.stats()["action_plans"]["0"]["similar_hits"] == 1
+
+    lookup = await cache.aget("v1", "Summarize the pdf report", [])
+    assert lookup.plan is None
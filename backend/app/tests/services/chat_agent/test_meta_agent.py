@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from unittest.mock import MagicMock, patch
+
+from langchain.base_language import BaseLanguageModel
+
+from app.schemas.agent_schema import AgentConfig
+from app.services.chat_agent.meta_agent import MetaAgentRegistry
+
+
+def test_registry_executors_share_tools(agent_config: AgentConfig, llm: BaseLanguageModel):
+    registry = MetaAgentRegistry(agent_config, get_llm_hook=lambda type, key: llm)
+
+    with patch("app.services.chat_agent.meta_agent.get_tools") as mock_get_tools:
+        executor_1 = registry.create_executor()
+        executor_2 = registry.create_executor()
+
+    mock_get_tools.assert_not_called()
+    assert executor_1.agent is not executor_2.agent
+    # the executors copy the list on validation, the tool instances are shared
+    assert all(tool is shared for tool, shared in zip(executor_1.tools, registry.tools, strict=True))
+    assert all(tool is shared for tool, shared in zip(executor_2.tools, registry.tools, strict=True))
+
+
+def test_registry_executor_isolates_action_plan(agent_config: AgentConfig, llm: BaseLanguageModel):
+    registry = MetaAgentRegistry(agent_config, get_llm_hook=lambda type, key: llm)
+    executor_1 = registry.create_executor()
+    executor_1.agent.action_plan = agent_config.action_plans.action_plans["0"]
+
+    executor_2 = registry.create_executor()
+    assert executor_2.agent.action_plan is None
+
+
+def test_registry_executor_uses_api_key(agent_config: AgentConfig, llm: BaseLanguageModel):
+    get_llm_hook = MagicMock(return_value=llm)
+    registry = MetaAgentRegistry(agent_config, get_llm_hook=get_llm_hook)
+    get_llm_hook.reset_mock()
+
+    registry.create_executor()
+    get_llm_hook.assert_not_called()
+
+    registry.create_executor("user-key")
+    get_llm_hook.assert_called_once_with(agent_config.common.llm, "user-key")
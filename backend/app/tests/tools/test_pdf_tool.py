@@ -7,8 +7,8 @@ from langchain.schema import Document
 
 from app.schemas.agent_schema import AgentConfig
 from app.services.chat_agent.tools.library.pdf_tool.pdf_tool import PDFTool
-from tests.fake.pdf_pipeline import FakePDFExtractionPipeline
 from tests.fake.vector_db import FakeVectorDB
+from tests.fake.vector_search import FakeVectorSearch
 
 
 @pytest.fixture(autouse=True)
@@ -18,15 +18,18 @@ def mock_llm_call(llm: BaseLanguageModel):  # pylint: disable=redefined-outer-na
 
 
 @pytest.fixture
-def pdf_pipeline():
+def vector_search():
     db = FakeVectorDB.from_documents(docs=[Document(page_content="This is a test document.")])
-    pdf_pipeline = FakePDFExtractionPipeline(vector_db=db)
-    return pdf_pipeline
+    vector_search = FakeVectorSearch(vector_db=db)
+    return vector_search
 
 
 @pytest.fixture(autouse=True)
-def fake_get_pdf_pipeline(pdf_pipeline: FakePDFExtractionPipeline):  # pylint: disable=redefined-outer-name
-    with patch("app.services.chat_agent.tools.library.pdf_tool.pdf_tool.get_pdf_pipeline", return_value=pdf_pipeline):
+def fake_get_pdf_vector_search(vector_search: FakeVectorSearch):  # pylint: disable=redefined-outer-name
+    with patch(
+        "app.services.chat_agent.tools.library.pdf_tool.pdf_tool.get_pdf_vector_search",
+        return_value=vector_search,
+    ):
         yield
 
 
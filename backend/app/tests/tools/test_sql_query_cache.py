@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.schemas.tool_schemas.sql_tool_schema import DatabaseInfo, TableInfo
+from app.services.chat_agent.tools.library.sql_tool.query_cache import SQLQueryCache, get_question_literals
+from app.services.chat_agent.tools.library.sql_tool.schema_catalog import SchemaCatalog
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embeds a text by counting a few keywords."""
+
+    keywords = ["artist", "album", "invoice", "customer"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(text.lower().count(keyword)) for keyword in self.keywords]
+
+
+def make_catalog(artist_fingerprint: str = "v1") -> SchemaCatalog:
+    return SchemaCatalog(
+        DatabaseInfo(
+            tables=[
+                TableInfo(schema_name="public", table_name="Artist", structure="a", fingerprint=artist_fingerprint),
+                TableInfo(schema_name="public", table_name="Album", structure="b", fingerprint="v1"),
+            ]
+        )
+    )
+
+
+def make_cache(**kwargs) -> SQLQueryCache:
+    return SQLQueryCache(
+        max_size=kwargs.get("max_size", 10),
+        ttl=kwargs.get("ttl", 3600),
+        similarity_threshold=kwargs.get("similarity_threshold", 0.9),
+        get_embeddings=KeywordEmbeddings,
+    )
+
+
+async def store(cache: SQLQueryCache, catalog: SchemaCatalog, question: str, tables: List[str]) -> None:
+    lookup = await cache.aget(question, catalog)
+    assert lookup.entry is None
+    cache.set(
+        lookup,
+        question=question,
+        tables=tables,
+        table_versions=SQLQueryCache.get_table_versions(catalog, tables),
+        response="```sql SELECT 1```",
+        query="SELECT 1",
+        result_summary="total rows from SQL query: 1",
+    )
+
+
+def test_question_literals():
+    assert get_question_literals("albums of artist 12 released in 2020-01") == {"12", "2020-01"}
+    assert get_question_literals("albums of 'ac/dc'") == {"'ac/dc'"}
+    assert get_question_literals("how many albums?") == frozenset()
+
+
+@pytest.mark.asyncio
+async def test_exact_and_similar_hits():
+    cache, catalog = make_cache(), make_catalog()
+    await store(cache, catalog, "How many albums per artist?", ["public.artist", "public.album"])
+
+    lookup = await cache.aget("  how many ALBUMS per artist? ", catalog)
+    assert lookup.entry is not None and lookup.score == 1.0
+
+    lookup = await cache.aget("Number of albums of each artist", catalog)
+    assert lookup.entry is not None and lookup.entry.query == "SELECT 1"
+
+    lookup = await cache.aget("Which customer has the largest invoice?", catalog)
+    assert lookup.entry is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["similar_hits"], stats["misses"]) == (1, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_different_literals_are_not_reused():
+    cache, catalog = make_cache(), make_catalog()
+    await store(cache, catalog, "Albums of artist 12", ["public.album"])
+
+    assert (await cache.aget("Albums of artist 13", catalog)).entry is None
+    assert (await cache.aget("Which albums has artist 12", catalog)).entry is not None
+
+
+@pytest.mark.asyncio
+async def test_invalidated_when_table_changes():
+    cache = make_cache()
+    await store(cache, make_catalog(), "How many albums per artist?", ["public.artist", "public.album"])
+    await store(cache, make_catalog(), "How many albums?", ["public.album"])
+
+    catalog = make_catalog(artist_fingerprint="v2")
+    assert (await cache.aget("How many albums per artist?", catalog)).entry is None
+    assert (await cache.aget("How many albums?", catalog)).entry is not None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["size"] == 1
+
+
+@pytest.mark.asyncio
+async def test_expiry_and_eviction():
+    catalog = make_catalog()
+    cache = make_cache(ttl=-1)
+    await store(cache, catalog, "How many albums?", ["public.album"])
+    assert (await cache.aget("How many albums?", catalog)).entry is None
+
+    cache = make_cache(max_size=1, similarity_threshold=None)
+    await store(cache, catalog, "How many albums?", ["public.album"])
+    await store(cache, catalog, "How many artists?", ["public.artist"])
+    assert (await cache.aget("How many albums?", catalog)).entry is None
+    assert (await cache.aget("How many artists?", catalog)).entry is not None
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from typing import List
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.schemas.tool_schemas.sql_tool_schema import DatabaseInfo, TableInfo
+from app.services.chat_agent.tools.library.sql_tool.schema_catalog import SchemaCatalog
+
+
+class KeywordEmbeddings(Embeddings):
+    """Embeds a text by counting a few keywords."""
+
+    keywords = ["artist", "album", "invoice", "customer"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(text.lower().count(keyword)) for keyword in self.keywords]
+
+
+@pytest.fixture
+def db_info() -> DatabaseInfo:
+    return DatabaseInfo(
+        tables=[
+            TableInfo(schema_name="public", table_name="Artist", structure="CREATE TABLE artist (artist_id, name)"),
+            TableInfo(schema_name="public", table_name="Album", structure="CREATE TABLE album (album_id, artist_id)"),
+            TableInfo(schema_name="sales", table_name="Invoice", structure="CREATE TABLE invoice (customer_id)"),
+            TableInfo(schema_name="crm", table_name="Invoice", structure="CREATE TABLE invoice (id)"),
+        ]
+    )
+
+
+def test_lookup_by_normalized_name(db_info: DatabaseInfo):
+    catalog = SchemaCatalog(db_info)
+
+    assert catalog.get(" PUBLIC.artist ").name == "public.Artist"
+    assert catalog.get('"public"."Album"').name == "public.Album"
+    assert catalog.get("album").name == "public.Album"
+    assert catalog.get("invoice") is None  # ambiguous without schema
+    assert catalog.get("crm.invoice").name == "crm.Invoice"
+
+
+def test_table_schemas_in_database_order(db_info: DatabaseInfo):
+    catalog = SchemaCatalog(db_info)
+
+    assert catalog.get_table_schemas(["public.album", "public.artist", "unknown", "public.Album"]) == (
+        "DB.TABLE name: public.Artist, Table structure: CREATE TABLE artist (artist_id, name)\n"
+        "DB.TABLE name: public.Album, Table structure: CREATE TABLE album (album_id, artist_id)"
+    )
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_tables(db_info: DatabaseInfo):
+    catalog = SchemaCatalog(db_info, get_embeddings=KeywordEmbeddings)
+
+    matches = await catalog.asearch("Which customer has the largest invoice?", top_k=2)
+    assert [match.name for match in matches][0] == "sales.Invoice"
+    assert len(matches) == 2
+    assert matches[0].score >= matches[1].score
+
+
+@pytest.mark.asyncio
+async def test_search_without_embeddings(db_info: DatabaseInfo):
+    with pytest.raises(ValueError):
+        await SchemaCatalog(db_info).asearch("question", top_k=2)
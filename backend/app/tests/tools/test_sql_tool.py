@@ -4,8 +4,13 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import pytest
 from langchain.base_language import BaseLanguageModel
 
+from app.db.SQLDatabaseExtended import QueryCostExceededError
 from app.schemas.agent_schema import AgentConfig
+from app.schemas.tool_schemas.sql_tool_schema import QueryCostEstimate, QuerySample
+from app.services.chat_agent.tools.library.sql_tool.query_cache import SQLQueryCache
+from app.services.chat_agent.tools.library.sql_tool.schema_catalog import TableMatch
 from app.services.chat_agent.tools.library.sql_tool.sql_tool import SQLTool
+from tests.fake.sql_chat_model import FakeSQLChatModel, SimulatedSQLTool
 from tests.fake.sql_db import FakeDBInfo, FakeSQLDatabase, FakeTable
 
 
@@ -74,3 +79,127 @@ async def test_sql_tool_run(sql_tool: SQLTool, tool_input: str):
     ):
         response = await sql_tool._arun(tool_input)
     assert response == "0"
+
+
+@pytest.mark.asyncio
+async def test_validate_response_with_capped_row_count(sql_tool: SQLTool):
+    sample = QuerySample(columns=["a"], rows=[(1,), (2,), (3,)], total_rows=10_000, truncated=True)
+    with (
+        patch("app.services.chat_agent.tools.library.sql_tool.sql_tool.SQLTool._parse_query", return_value="query"),
+        patch("app.services.chat_agent.tools.library.sql_tool.sql_tool.is_sql_query_safe", return_value=True),
+        patch.object(FakeSQLDatabase, "sample", return_value=sample),
+    ):
+        is_valid, results_str, _ = await sql_tool._avalidate_response("question", "response")
+    assert is_valid
+    assert results_str == "total rows from SQL query: more than 10000, first 3 rows: 1;2;3"
+
+
+@pytest.mark.asyncio
+async def test_validate_response_with_expensive_query(sql_tool: SQLTool):
+    error = QueryCostExceededError("The SQL query is too expensive to run", QueryCostEstimate(cost=1e9))
+    with (
+        patch("app.services.chat_agent.tools.library.sql_tool.sql_tool.SQLTool._parse_query", return_value="query"),
+        patch("app.services.chat_agent.tools.library.sql_tool.sql_tool.is_sql_query_safe", return_value=True),
+        patch.object(FakeSQLDatabase, "asample", side_effect=error),
+    ):
+        is_valid, _, complaints = await sql_tool._avalidate_response("question", "response")
+    assert not is_valid
+    assert complaints == "The SQL query is too expensive to run"
+
+
+@pytest.mark.asyncio
+async def test_list_tables_with_retrieval(sql_tool: SQLTool):
+    sql_tool.table_selection = "hybrid"
+    with patch(
+        "app.services.chat_agent.tools.library.sql_tool.sql_tool.SchemaCatalog.asearch",
+        return_value=[TableMatch(name="fake_table", score=0.95)],
+    ):
+        response = await sql_tool._alist_sql_tables(query="This is a test query.")
+    assert response == ["fake_table"]
+
+    with patch(
+        "app.services.chat_agent.tools.library.sql_tool.sql_tool.SchemaCatalog.asearch",
+        return_value=[TableMatch(name="fake_table", score=0.5)],
+    ):
+        response = await sql_tool._alist_sql_tables(query="This is a test query.")
+    assert response == ["0"]
+
+
+@pytest.mark.asyncio
+async def test_sql_tool_reuses_cached_query(sql_tool: SQLTool, tool_input: str):
+    cache = SQLQueryCache(max_size=10, ttl=3600)
+    with (
+        patch("app.services.chat_agent.tools.library.sql_tool.sql_tool.settings.SQL_QUERY_CACHE_ENABLED", new=True),
+        patch("app.services.chat_agent.tools.library.sql_tool.sql_tool.sql_query_cache", new=cache),
+        patch(
+            "app.services.chat_agent.tools.library.sql_tool.sql_tool.SQLTool._alist_sql_tables",
+            return_value=["fake_table"],
+        ) as list_sql_tables,
+        patch("app.services.chat_agent.tools.library.sql_tool.sql_tool.SQLTool._parse_query", return_value="query"),
+        patch("app.services.chat_agent.tools.library.sql_tool.sql_tool.is_sql_query_safe", return_value=True),
+    ):
+        assert await sql_tool._arun(tool_input) == "0"
+        assert await sql_tool._arun(tool_input) == "0"
+        assert list_sql_tables.call_count == 1
+        assert cache.stats()["exact_hits"] == 1
+
+        # The cached query does not return results anymore, the tool falls back to generating a query
+        samples = [QuerySample(columns=[], rows=[], total_rows=0), QuerySample(columns=["a"], rows=[], total_rows=0)]
+        with patch.object(FakeSQLDatabase, "sample", side_effect=samples):
+            await sql_tool._arun(tool_input)
+        assert list_sql_tables.call_count == 2
+        assert cache.stats()["failed_reuses"] == 1
+
+
+@pytest.fixture
+def count_tokens():
+    with patch(
+        "app.services.chat_agent.tools.ExtendedBaseTool.token_counter.count_batch",
+        side_effect=lambda strings, model: [1] * len(strings),
+    ):
+        yield
+
+
+def make_simulated_sql_tool(p_valid: float, candidate_fan_out: int, **kwargs) -> SimulatedSQLTool:
+    llm = FakeSQLChatModel(p_valid=p_valid, latency_s=0.001)
+    return SimulatedSQLTool(
+        llm=llm,
+        fast_llm=llm,
+        fast_llm_token_limit=0,
+        description="SQL tool",
+        prompt_message="{table_schemas}\n{question}",
+        system_context="Write an SQL query.",
+        prompt_refinement="{previous_answer}\n{complaints}\n{table_schemas}\n{question}",
+        candidate_fan_out=candidate_fan_out,
+        db_latency_s=0,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_sql_candidates_first_valid(count_tokens):  # pylint: disable=unused-argument,redefined-outer-name
+    tool = make_simulated_sql_tool(p_valid=1.0, candidate_fan_out=3)
+    result, response, is_valid, _ = await tool._agenerate_valid_query("question", ["public.tracks"])
+    assert is_valid and result == response
+    assert tool.llm.temperatures == [None, 0.5, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_sql_candidates_none_valid(count_tokens):  # pylint: disable=unused-argument,redefined-outer-name
+    tool = make_simulated_sql_tool(p_valid=0.0, candidate_fan_out=3)
+    _, _, is_valid, _ = await tool._agenerate_valid_query("question", ["public.tracks"])
+    assert not is_valid
+    assert tool.llm.calls == 3 + 4  # candidates, then the improvement rounds
+
+
+def test_sql_candidates_token_budget(count_tokens):  # pylint: disable=unused-argument,redefined-outer-name
+    tool = make_simulated_sql_tool(p_valid=1.0, candidate_fan_out=5, candidate_token_budget=6)
+    assert tool._get_candidate_temperatures(tool._get_question_messages("question", "schemas")) == [None, 0.5, 1.0]
+
+
+def test_sql_candidates_free_workers(count_tokens):  # pylint: disable=unused-argument,redefined-outer-name
+    tool = make_simulated_sql_tool(p_valid=1.0, candidate_fan_out=5)
+    with patch.object(FakeSQLDatabase, "free_workers", new=3):
+        assert tool._get_candidate_temperatures(tool._get_question_messages("question", "schemas")) == [None, 0.5, 1.0]
+    with patch.object(FakeSQLDatabase, "free_workers", new=0):
+        assert tool._get_candidate_temperatures(tool._get_question_messages("question", "schemas")) == [None]
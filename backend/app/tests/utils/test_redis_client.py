@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from typing import Optional
+
+import pytest
+import redis
+import redis.asyncio as aioredis
+
+from app.utils.redis_client import (
+    CountingBlockingConnectionPool,
+    CountingBlockingConnectionPoolSync,
+    _get_pool_stats,
+    close_redis_clients,
+    get_redis_client,
+    get_redis_client_sync,
+    get_redis_pool_stats,
+)
+
+
+class FakeConnection(redis.Connection):
+    """Connection which never talks to Redis."""
+
+    def connect(self) -> None:
+        pass
+
+    def can_read(self, timeout: Optional[float] = 0) -> bool:
+        return False
+
+    def disconnect(self, *args: object) -> None:
+        pass
+
+
+class FakeAsyncConnection(aioredis.Connection):
+    """Connection which never talks to Redis."""
+
+    async def connect(self) -> None:
+        pass
+
+    async def can_read_destructive(self) -> bool:
+        return False
+
+    async def disconnect(self, nowait: bool = False) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_redis_client_is_shared():
+    client = await get_redis_client()
+    assert client is await get_redis_client()
+    assert get_redis_client_sync() is get_redis_client_sync()
+
+    stats = get_redis_pool_stats()
+    assert stats["async"]["created_connections"] == 0
+    assert stats["async"]["in_use_connections"] == 0
+    assert "sync" in stats
+
+    await close_redis_clients()
+    assert get_redis_pool_stats() == {}
+    assert client is not await get_redis_client()
+    await close_redis_clients()
+
+
+def test_pool_stats_count_held_connections():
+    pool = CountingBlockingConnectionPoolSync(max_connections=4, connection_class=FakeConnection)
+    connections = [pool.get_connection("GET") for _ in range(3)]
+    assert _get_pool_stats(pool) == {
+        "max_connections": 4,
+        "created_connections": 3,
+        "in_use_connections": 3,
+        "available_connections": 0,
+    }
+
+    pool.release(connections[0])
+    assert _get_pool_stats(pool)["in_use_connections"] == 2
+    assert _get_pool_stats(pool)["available_connections"] == 1
+
+    # the idle connection is reused
+    connections[0] = pool.get_connection("GET")
+    assert _get_pool_stats(pool)["created_connections"] == 3
+
+
+@pytest.mark.asyncio
+async def test_async_pool_stats_count_held_connections():
+    pool = CountingBlockingConnectionPool(max_connections=4, connection_class=FakeAsyncConnection)
+    connections = [await pool.get_connection("GET") for _ in range(2)]
+    await pool.release(connections[1])
+    assert _get_pool_stats(pool) == {
+        "max_connections": 4,
+        "created_connections": 2,
+        "in_use_connections": 1,
+        "available_connections": 1,
+    }
+
+
+def test_pool_stats_ignore_failed_connections():
+    class FailingConnection(FakeConnection):
+        def connect(self) -> None:
+            raise redis.ConnectionError("Connection refused")
+
+    pool = CountingBlockingConnectionPoolSync(max_connections=4, connection_class=FailingConnection)
+    with pytest.raises(redis.ConnectionError):
+        pool.get_connection("GET")
+    assert _get_pool_stats(pool)["in_use_connections"] == 0
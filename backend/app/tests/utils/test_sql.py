@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.utils.sql import get_sql_query_violation, is_sql_query_safe
+from tests.fake.legacy_sql import legacy_is_sql_query_safe
+
+UNSAFE_QUERIES = [
+    "INSERT INTO users VALUES (1)",
+    "UPDATE users SET name = 'a'",
+    "DELETE FROM users",
+    "DROP TABLE users",
+    "TRUNCATE users",
+    "CREATE TABLE t (id int)",
+    "ALTER TABLE users ADD COLUMN x int",
+    "GRANT ALL ON users TO public",
+    "REVOKE ALL ON users FROM public",
+    "REPLACE INTO users VALUES (1)",
+    "EXEC xp_cmdshell 'dir'",
+    "SELECT 1; DROP TABLE users",
+    "SELECT 1;",
+    "SELECT * FROM users WHERE name = 'a' OR 1=1; DELETE FROM users",
+    "WITH x AS (DELETE FROM users RETURNING *) SELECT * FROM x",
+    "SELECT * INTO backup FROM users",
+    "SELECT * FROM users -- comment\n; DROP TABLE users",
+    "SELECT * FROM users /* unterminated",
+    "SELECT * FROM users */",
+    "SELECT `name` FROM users",
+    "SELECT name FROM users WHERE id = 1 | 2",
+    "SELECT name FROM users WHERE id = 1 & 2",
+    "SELECT $1",
+    "SELECT $$ DROP $$",
+    "SELECT 'a\\' ; DROP TABLE users; --'",
+    "SELECT perl FROM x",
+    "SELECT connect FROM x",
+    "SELECT socket FROM x",
+    "SELECT inet_aton('1.2.3.4')",
+    "SELECT sockaddr_in FROM x",
+    "SELECT from_base64('ZHJvcA==')",
+    "SELECT 'base64'",
+    "SELECT pg_read_file('/etc/passwd')",
+    "SELECT * FROM dblink('host=x', 'DROP TABLE users') AS t(a int)",
+    "SELECT lo_import('/etc/passwd')",
+    "SELECT set_config('search_path', 'x', false)",
+    'SELECT "name" FROM users',
+    "SELECT name::text FROM users",
+    "SELECT 'unterminated",
+    "EXPLAIN ANALYZE DELETE FROM users",
+    "VACUUM users",
+    "COPY users TO '/tmp/x'",
+    "  -- only a comment",
+    "",
+    "(SELECT 1)",
+    "SELECTX 1",
+    "SELECT * FROM users WHERE id IN (SELECT id FROM admins) UNION SELECT replace FROM x",
+    "WITH RECURSIVE x AS (SELECT 1) CREATE OR REPLACE VIEW v AS SELECT * FROM x",
+    "WITH x AS (SELECT 1) DELETE FROM users",
+    "WITH x AS (SELECT 1), y AS NOT MATERIALIZED (SELECT 2) UPDATE users SET name = 'a'",
+    "WITH x AS (SELECT 1) (UPDATE users SET name = 'a')",
+    "SELECT * FROM (DELETE FROM users RETURNING *) AS x",
+    "SELECT * FROM users FOR UPDATE",
+    "SELECT * FROM users FOR NO KEY UPDATE",
+    "SELECT * FROM users FOR SHARE",
+    "SELECT * FROM users LOCK IN SHARE MODE",
+]
+
+SAFE_QUERIES = [
+    "SELECT * FROM users",
+    "select id, name from users where id = 1",
+    "  WITH x AS (SELECT 1 AS a) SELECT a FROM x",
+    "SELECT COUNT(*) FROM users GROUP BY country HAVING COUNT(*) > 10 ORDER BY 1 DESC LIMIT 5",
+    "SELECT name FROM users WHERE id <> 1 AND id != 2 AND price >= 1.5 AND price <= 1e3",
+    "SELECT a.id FROM a JOIN b ON a.id = b.a_id WHERE a.value % 2 = 0",
+    "SELECT name FROM users -- trailing comment",
+    "SELECT name /* inline comment */ FROM users",
+    "SELECT name FROM users WHERE name = 'it''s'",
+    "SELECT comment FROM reviews",
+    "SELECT load, cluster FROM servers",
+    "SELECT refresh FROM t",
+    "SELECT handler, lock, do, call, set FROM jobs",
+    "SELECT MAX(load) AS comment FROM servers GROUP BY cluster",
+    "WITH r AS (SELECT comment FROM reviews) SELECT comment, refresh FROM r",
+    "WITH r(comment) AS MATERIALIZED (SELECT 1), s AS (SELECT 2) SELECT comment FROM r, s",
+]
+
+# Valid statements rejected by the previous substring based validator
+LEGACY_FALSE_POSITIVES = [
+    "SELECT updated_at FROM users",
+    "SELECT created, deleted_flag FROM orders",
+    "SELECT execution_date FROM runs",
+    "SELECT connection_id FROM sessions",
+    "SELECT * FROM users WHERE status LIKE '%update%'",
+    "SELECT REPLACE(name, 'a', 'b') FROM users",
+    "SELECT name FROM users WHERE note = 'a; b'",
+    "SELECT * FROM dropped_items",
+]
+
+
+@pytest.mark.parametrize("query", UNSAFE_QUERIES)
+def test_unsafe_queries_are_rejected(query: str) -> None:
+    assert not is_sql_query_safe(query)
+    assert get_sql_query_violation(query) is not None
+
+
+@pytest.mark.parametrize("query", SAFE_QUERIES + LEGACY_FALSE_POSITIVES)
+def test_safe_queries_are_accepted(query: str) -> None:
+    assert is_sql_query_safe(query)
+
+
+@pytest.mark.parametrize("query", SAFE_QUERIES + LEGACY_FALSE_POSITIVES)
+def test_fast_path_and_tokenizer_agree(query: str) -> None:
+    # A leading comment skips the fast path
+    assert get_sql_query_violation(f"/* tokenize */ {query}") is None
+
+
+@pytest.mark.parametrize("query", UNSAFE_QUERIES + SAFE_QUERIES)
+def test_rejects_everything_the_legacy_validator_rejects(query: str) -> None:
+    if not legacy_is_sql_query_safe(query):
+        assert not is_sql_query_safe(query)
+
+
+@pytest.mark.parametrize("query", LEGACY_FALSE_POSITIVES)
+def test_legacy_false_positives(query: str) -> None:
+    assert not legacy_is_sql_query_safe(query)
+
+
+def test_violation_reason() -> None:
+    assert get_sql_query_violation("SELECT 1; DROP TABLE users") == "contains forbidden character: ;"
+    assert get_sql_query_violation("DROP TABLE users") == "does not start with SELECT or WITH"
+    assert get_sql_query_violation("SELECT * INTO t FROM users") == "contains forbidden keyword: into"
+    assert get_sql_query_violation("WITH x AS (SELECT 1) DELETE FROM t") == "contains forbidden statement: delete"
+    assert get_sql_query_violation("SELECT * FROM t FOR SHARE") == "contains locking clause: for share"
+
+
+def test_verdicts_are_cached() -> None:
+    query = "SELECT id FROM cached_verdicts"
+    get_sql_query_violation(query)
+    hits = get_sql_query_violation.cache_info().hits
+    assert is_sql_query_safe(query)
+    assert get_sql_query_violation.cache_info().hits == hits + 1
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import pytest
+from langchain.schema import AgentFinish
+
+from app.schemas.streaming_schema import StreamingSignalsEnum
+from app.utils.streaming.callbacks.stream import AsyncIteratorCallbackHandler
+
+
+@pytest.mark.asyncio
+async def test_aiter_stops_after_queued_tokens():
+    handler = AsyncIteratorCallbackHandler()
+    for token in ["a", "b", "c"]:
+        await handler.on_llm_new_token(token)
+    await handler.on_agent_finish(AgentFinish(return_values={}, log=""))
+
+    data = [item.data for item in [token async for token in handler.aiter()]]
+    assert data == [StreamingSignalsEnum.START.value, "a", "b", "c", StreamingSignalsEnum.END.value]
+
+
+@pytest.mark.asyncio
+async def test_aiter_batches_drains_queue():
+    handler = AsyncIteratorCallbackHandler()
+    for token in ["a", "b"]:
+        await handler.on_llm_new_token(token)
+
+    batches = handler.aiter_batches()
+    first_batch = await batches.__anext__()
+    assert [item.data for item in first_batch] == [StreamingSignalsEnum.START.value, "a", "b"]
+
+    await handler.on_llm_new_token("c")
+    await handler.on_agent_finish(AgentFinish(return_values={}, log=""))
+    remaining = [batch async for batch in batches]
+    assert [[item.data for item in batch] for batch in remaining] == [["c", StreamingSignalsEnum.END.value]]
+
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.schemas.streaming_schema import StreamingData, StreamingDataTypeEnum
+from app.utils.streaming.StreamingJsonListResponse import (
+    StreamingJsonListResponse,
+    encode_json_legacy,
+    encode_json_pydantic,
+)
+
+
+class Unknown:
+    pass
+
+
+@pytest.mark.parametrize(
+    "metadata",
+    [
+        {},
+        {"run_id": uuid.uuid4(), "time": datetime(2024, 1, 1), "tags": ["a"]},
+        {"unknown": Unknown()},
+    ],
+)
+def test_encode_json_pydantic_matches_legacy(metadata: dict):
+    item = StreamingData(data="token", data_type=StreamingDataTypeEnum.LLM, metadata=metadata)
+    assert json.loads(encode_json_pydantic(item)) == json.loads(encode_json_legacy(item))
+
+
+@pytest.mark.asyncio
+async def test_batches_are_coalesced_into_newline_terminated_frames():
+    async def generator():
+        yield [StreamingData(data=str(i)) for i in range(3)]
+        yield StreamingData(data="3")
+
+    response = StreamingJsonListResponse(generator(), max_chunk_size=100)
+    chunks = [chunk async for chunk in response.body_iterator]
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    assert [json.loads(line)["data"] for line in "".join(chunks).splitlines()] == ["0", "1", "2", "3"]
+    assert len(chunks) < 4
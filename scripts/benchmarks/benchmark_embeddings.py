@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the embedding throughput of the ingestion in chunks per second, against a local fake embedding server.
+
+The fake server implements the OpenAI embeddings endpoint with a fixed latency per request and per text. The
+previous configuration (one text per request, as for Azure deployments) is compared to batched, concurrent requests,
+with a cold and a warm cache.
+
+Usage (from backend/app):
+    PYTHONPATH=. python ../../scripts/benchmarks/benchmark_embeddings.py --chunks 2000 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List
+
+import numpy as np
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain_openai.embeddings import OpenAIEmbeddings
+from pydantic import SecretStr
+
+from app.services.chat_agent.helpers.embedding_models import CacheBackedEmbeddingsExtended
+from tests.fake.byte_store import CountingByteStore
+
+EMBEDDING_DIMENSIONS = 16
+
+
+def fake_embedding(text: str) -> List[float]:
+    """Deterministic embedding of a text."""
+    seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:4], "little")
+    return np.random.default_rng(seed).random(EMBEDDING_DIMENSIONS, dtype=np.float32).tolist()
+
+
+class EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    """Request handler of the fake embedding server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, embedding_server: "FakeEmbeddingServer", *handler_args: Any) -> None:
+        self.embedding_server = embedding_server
+        super().__init__(*handler_args)
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        response = json.dumps(self.embedding_server.embed(body)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *log_args: Any) -> None:
+        pass
+
+
+class FakeEmbeddingServer:
+    """OpenAI compatible embedding server on localhost, in a background thread."""
+
+    def __init__(
+        self,
+        latency_s: float = 0.05,
+        latency_per_text_s: float = 0.0005,
+    ) -> None:
+        self.latency_s = latency_s
+        self.latency_per_text_s = latency_per_text_s
+        self.nb_requests = 0
+        self.nb_texts = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), partial(EmbeddingRequestHandler, self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self) -> "FakeEmbeddingServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.nb_requests = 0
+            self.nb_texts = 0
+
+    def embed(self, body: dict[str, Any]) -> dict[str, Any]:
+        """Answer a request of the OpenAI embeddings endpoint, with the latency of the server."""
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        with self._lock:
+            self.nb_requests += 1
+            self.nb_texts += len(texts)
+        time.sleep(self.latency_s + self.latency_per_text_s * len(texts))
+        data = []
+        for i, text in enumerate(texts):
+            vector = fake_embedding(text if isinstance(text, str) else json.dumps(text))
+            embedding: Any = vector
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+
+def generate_chunks(
+    nb_chunks: int,
+    duplicate_ratio: float,
+) -> List[str]:
+    """Text chunks of which `duplicate_ratio` repeat earlier ones, like headers and footers of PDF pages."""
+    nb_unique = max(1, int(nb_chunks * (1 - duplicate_ratio)))
+    return [f"Chunk {i % nb_unique}: the quarterly report shows revenue growth." for i in range(nb_chunks)]
+
+
+def _iter_batches(
+    chunks: List[str],
+    ingestion_batch_size: int,
+) -> Iterator[List[str]]:
+    for i in range(0, len(chunks), ingestion_batch_size):
+        yield chunks[i : i + ingestion_batch_size]
+
+
+def benchmark_embeddings(
+    server: FakeEmbeddingServer,
+    chunks: List[str],
+    concurrencies: List[int],
+    batch_size: int = 16,
+    ingestion_batch_size: int = 256,
+) -> List[dict[str, Any]]:
+    """
+    Embed the chunks in ingestion batches with the previous configuration and the batched embeddings.
+
+    Returns:
+        List[dict[str, Any]]: Chunks per second, embedding requests and cache round trips by configuration.
+    """
+
+    def get_underlying_embeddings(chunk_size: int) -> OpenAIEmbeddings:
+        return OpenAIEmbeddings(
+            model="text-embedding-ada-002",
+            openai_api_base=server.url,
+            openai_api_key=SecretStr("fake"),
+            chunk_size=chunk_size,
+            check_embedding_ctx_length=False,
+            max_retries=0,
+        )
+
+    async def aembed_batches(embeddings: CacheBackedEmbeddings) -> None:
+        for batch in _iter_batches(chunks, ingestion_batch_size):
+            await embeddings.aembed_documents(batch)
+
+    def run(name: str, embeddings: CacheBackedEmbeddings, store: CountingByteStore, asynchronous: bool) -> None:
+        for cache in ["cold", "warm"]:
+            server.reset()
+            store.nb_round_trips = 0
+            start = time.perf_counter()
+            if asynchronous:
+                asyncio.run(aembed_batches(embeddings))
+            else:
+                for batch in _iter_batches(chunks, ingestion_batch_size):
+                    embeddings.embed_documents(batch)
+            duration = time.perf_counter() - start
+            report.append(
+                {
+                    "embeddings": name,
+                    "cache": cache,
+                    "duration_s": duration,
+                    "chunks_per_s": len(chunks) / duration,
+                    "requests": server.nb_requests,
+                    "embedded_texts": server.nb_texts,
+                    "cache_round_trips": store.nb_round_trips,
+                }
+            )
+
+    report: List[dict[str, Any]] = []
+    store = CountingByteStore()
+    run(
+        "previous (1 text per request)",
+        CacheBackedEmbeddings.from_bytes_store(get_underlying_embeddings(1), store, namespace="previous"),
+        store,
+        asynchronous=False,
+    )
+    for max_concurrency in concurrencies:
+        for asynchronous in [False, True]:
+            store = CountingByteStore()
+            embeddings = CacheBackedEmbeddingsExtended.from_bytes_store(
+                get_underlying_embeddings(batch_size), store, namespace="batched", batch_size=batch_size
+            )
+            embeddings.max_concurrency = max_concurrency  # type: ignore
+            run(
+                f"batched {batch_size}, concurrency {max_concurrency}{', async' if asynchronous else ''}",
+                embeddings,
+                store,
+                asynchronous=asynchronous,
+            )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched embeddings against a fake embedding server")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--latency-per-text", type=float, default=0.0005, help="seconds per text")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with FakeEmbeddingServer(args.latency, args.latency_per_text) as fake_server:
+        print(
+            json.dumps(
+                benchmark_embeddings(
+                    fake_server,
+                    generate_chunks(args.chunks, args.duplicates),
+                    args.concurrency,
+                    batch_size=args.batch_size,
+                ),
+                indent=2,
+            )
+        )
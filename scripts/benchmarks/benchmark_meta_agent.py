@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the per-request construction of the meta agent, with the tools built on every request (previous
+`get_meta_agent`) against executors of the `MetaAgentRegistry` built once at startup.
+
+The agents are only constructed, not run. Tools connecting to a database at construction need their database.
+
+Usage (from backend/app):
+    PYTHONPATH=. python ../../scripts/benchmarks/benchmark_meta_agent.py --requests 50
+"""
+import argparse
+import json
+import time
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+from langchain.agents import AgentExecutor
+
+from app.schemas.agent_schema import AgentConfig
+from app.services.chat_agent.meta_agent import MetaAgentRegistry, create_meta_agent
+from app.utils.config_loader import get_agent_config
+
+
+def _summarize(
+    latencies_s: List[float],
+) -> dict[str, float]:
+    latencies_ms = np.asarray(latencies_s) * 1000
+    return {
+        "mean": float(latencies_ms.mean()),
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p95": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+def _time_requests(
+    create_executor: Callable[[], AgentExecutor],
+    nb_requests: int,
+) -> List[float]:
+    latencies = []
+    for _ in range(nb_requests):
+        start = time.perf_counter()
+        create_executor()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def benchmark_meta_agent(
+    agent_config: AgentConfig,
+    nb_requests: int,
+    api_key: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Construct the meta agent of `nb_requests` requests with both approaches.
+
+    With `api_key`, the requests use their own key, for which the registry builds a new router LLM.
+
+    Returns:
+        dict[str, Any]: Construction latencies per request, registry build time at startup and speedup.
+    """
+
+    def create_per_request() -> AgentExecutor:
+        return create_meta_agent(agent_config.copy(update={"api_key": api_key}))
+
+    per_request = _summarize(_time_requests(create_per_request, nb_requests))
+
+    start = time.perf_counter()
+    registry = MetaAgentRegistry(agent_config)
+    startup_ms = (time.perf_counter() - start) * 1000
+    shared = _summarize(_time_requests(lambda: registry.create_executor(api_key), nb_requests))
+
+    return {
+        "requests": nb_requests,
+        "api_key": "request" if api_key is not None else "default",
+        "per_request_latency_ms": per_request,
+        "registry": {
+            "startup_ms": startup_ms,
+            "latency_ms": shared,
+        },
+        "speedup_p50": per_request["p50"] / shared["p50"] if shared["p50"] > 0 else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the per-request construction of the meta agent")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--api-key", default=None, help="API key of the requests, the configured one if not set")
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark_meta_agent(get_agent_config(), args.requests, api_key=args.api_key), indent=2))
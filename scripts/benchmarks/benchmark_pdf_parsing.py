@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the PDF parsing stage of the ingestion pipeline by number of worker processes, on a generated corpus.
+
+Usage (from backend/app):
+    PYTHONPATH=. python ../../scripts/benchmarks/benchmark_pdf_parsing.py --files 200 --pages 20 --workers 0 1 2 4 8
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, List
+
+import fitz
+
+from app.db.pdf_parsing import PDFParsingPool
+from app.schemas.ingestion_schema import LOADER_DICT, PDFParserEnum
+
+LOREM = (
+    "The quarterly report shows revenue growth across all regions, driven by new customers and higher retention. "
+    "Operating costs remained stable while investments in research increased. "
+)
+
+
+def generate_pdf_corpus(
+    folder: str,
+    nb_files: int,
+    nb_pages: int,
+) -> List[str]:
+    """Write `nb_files` PDFs of `nb_pages` text pages to the folder."""
+    paths = []
+    for i in range(nb_files):
+        document = fitz.open()
+        for page_number in range(nb_pages):
+            page = document.new_page()
+            text = f"Document {i}, page {page_number}\n" + LOREM * 20
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+        path = os.path.join(folder, f"document_{i:05d}.pdf")
+        document.save(path)
+        document.close()
+        paths.append(path)
+    return paths
+
+
+def benchmark_pdf_parsing(
+    paths: List[str],
+    worker_counts: List[int],
+    pdf_parser: PDFParserEnum = PDFParserEnum.PyMuPDF,
+) -> List[dict[str, Any]]:
+    """
+    Parse all files with every number of worker processes, 0 parses in the calling process.
+
+    Returns:
+        List[dict[str, Any]]: Files and pages per second, and the speedup over the first worker count.
+    """
+    report: List[dict[str, Any]] = []
+    for max_workers in worker_counts:
+        pool = PDFParsingPool(LOADER_DICT[pdf_parser.name], max_workers=max_workers)
+        start = time.perf_counter()
+        pages = sum(len(parsed_file.documents) for parsed_file in pool.imap(paths))
+        duration = time.perf_counter() - start
+        report.append(
+            {
+                "workers": max_workers,
+                "duration_s": duration,
+                "files_per_s": len(paths) / duration,
+                "pages_per_s": pages / duration,
+                "speedup": report[0]["duration_s"] / duration if len(report) > 0 else 1.0,
+            }
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF parsing on a generated corpus")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--parser", type=PDFParserEnum, default=PDFParserEnum.PyMuPDF)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus_folder:
+        corpus = generate_pdf_corpus(corpus_folder, args.files, args.pages)
+        print(json.dumps(benchmark_pdf_parsing(corpus, args.workers, args.parser), indent=2))
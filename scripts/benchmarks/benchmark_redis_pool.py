@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Load test of the Redis connections opened by concurrent requests, with the shared connection pool of
+`app.utils.redis_client` against the previous client (and pool) per call.
+
+Every simulated request makes the Redis calls of a chat request (`is_running`, `set_global_tool_context`, `stop_run`
+lookups). The number of clients connected to Redis is sampled while the requests run. Requires a running Redis.
+
+Usage (from backend/app):
+    PYTHONPATH=. python ../../scripts/benchmarks/benchmark_redis_pool.py --concurrency 10 50 100 500 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, List
+
+import redis.asyncio as aioredis
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.utils.redis_client import close_redis_clients, get_redis_client, get_redis_pool_stats
+
+REDIS_CALLS_PER_REQUEST = 3
+SAMPLE_INTERVAL_S = 0.01
+
+
+async def get_redis_client_per_call() -> Redis:
+    """Previous `get_redis_client`: a new client and pool on every call."""
+    return aioredis.from_url(
+        f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
+        max_connections=10,
+        encoding="utf8",
+        decode_responses=True,
+    )
+
+
+async def _connected_clients(monitor: Redis) -> int:
+    info = await monitor.info("clients")
+    return int(info["connected_clients"])
+
+
+async def run_load(
+    get_client: Callable[[], Awaitable[Redis]],
+    concurrency: int,
+    nb_requests: int,
+) -> dict[str, Any]:
+    """
+    Run `nb_requests` simulated requests, `concurrency` at a time, and sample the connected clients meanwhile.
+
+    Returns:
+        dict[str, Any]: Peak connected clients (without the monitoring client), throughput and pool metrics.
+    """
+    monitor = aioredis.from_url(f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}")
+    baseline = await _connected_clients(monitor)
+    clients: List[Redis] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(i: int) -> None:
+        async with semaphore:
+            for _ in range(REDIS_CALLS_PER_REQUEST):
+                client = await get_client()
+                clients.append(client)
+                await client.get(f"benchmark_redis_pool:{i % 100}")
+
+    peak = baseline
+    done = asyncio.Event()
+
+    async def sample() -> None:
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, await _connected_clients(monitor))
+            await asyncio.sleep(SAMPLE_INTERVAL_S)
+
+    sampler = asyncio.create_task(sample())
+    start = time.perf_counter()
+    await asyncio.gather(*[request(i) for i in range(nb_requests)])
+    duration = time.perf_counter() - start
+    done.set()
+    await sampler
+
+    report = {
+        "concurrency": concurrency,
+        "peak_connections": peak - baseline,
+        "requests_per_s": nb_requests / duration,
+        "pool": get_redis_pool_stats().get("async"),
+    }
+    for client in {id(client): client for client in clients}.values():
+        await client.close()
+        await client.connection_pool.disconnect()
+    await close_redis_clients()
+    await monitor.close()
+    return report
+
+
+async def benchmark_redis_pool(
+    concurrency_levels: List[int],
+    nb_requests: int,
+) -> dict[str, List[dict[str, Any]]]:
+    report: dict[str, List[dict[str, Any]]] = {"per_call": [], "shared": []}
+    for concurrency in concurrency_levels:
+        report["per_call"].append(await run_load(get_redis_client_per_call, concurrency, nb_requests))
+        report["shared"].append(await run_load(get_redis_client, concurrency, nb_requests))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the Redis connections of concurrent requests")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100, 500])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(benchmark_redis_pool(args.concurrency, args.requests)), indent=2))
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the embedding router against a labelled set of questions.
+
+Usage (from backend/app):
+    PYTHONPATH=. python ../../scripts/benchmarks/benchmark_router.py app/config/router-labelled-questions.yml
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, List, Tuple
+
+import numpy as np
+import yaml
+
+from app.services.chat_agent.router_agent.embedding_router import EmbeddingRouter, get_embedding_router
+from app.utils.config_loader import get_agent_config
+
+FALLBACK_LABEL = "llm_fallback"
+
+
+def load_labelled_questions(path: str) -> List[Tuple[str, str]]:
+    """Load (question, action plan) pairs from a yaml list of `question` / `action_plan` items."""
+    with open(path, encoding="utf-8") as f:
+        items = yaml.safe_load(f)
+    return [(item["question"], str(item["action_plan"])) for item in items]
+
+
+async def benchmark_router(
+    router: EmbeddingRouter,
+    labelled_questions: List[Tuple[str, str]],
+) -> dict[str, Any]:
+    """
+    Classify the labelled questions one by one and report accuracy, fallback rate, latency and confusion matrices.
+
+    The `confusion_matrix` rows are the labelled action plans, its columns the dispatched action plans plus
+    `llm_fallback` for low confidence predictions. `top_1_confusion_matrix` ignores the confidence threshold.
+
+    Returns:
+        dict[str, Any]: The benchmark report.
+    """
+    start = time.perf_counter()
+    await router.aload()
+    load_latency = time.perf_counter() - start
+
+    labels = router.plans
+    index = {label: i for i, label in enumerate(labels)}
+    confusion = np.zeros((len(labels), len(labels) + 1), dtype=np.int64)
+    top_1_confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    latencies = []
+    for question, label in labelled_questions:
+        start = time.perf_counter()
+        prediction = await router.aclassify(question)
+        latencies.append(time.perf_counter() - start)
+
+        row = index[label]
+        top_1_confusion[row, index[prediction.plan]] += 1
+        confusion[row, index[prediction.plan] if prediction.confident else len(labels)] += 1
+
+    total = len(labelled_questions)
+    dispatched = int(confusion[:, : len(labels)].sum())
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "questions": total,
+        "dispatch_rate": dispatched / total if total > 0 else 0.0,
+        "dispatch_accuracy": float(np.trace(confusion[:, : len(labels)]) / dispatched) if dispatched > 0 else 0.0,
+        "top_1_accuracy": float(np.trace(top_1_confusion) / total) if total > 0 else 0.0,
+        "load_latency_ms": load_latency * 1000,
+        "latency_ms": {
+            "mean": float(latencies_ms.mean()) if total > 0 else 0.0,
+            "p50": float(np.percentile(latencies_ms, 50)) if total > 0 else 0.0,
+            "p95": float(np.percentile(latencies_ms, 95)) if total > 0 else 0.0,
+        },
+        "labels": labels,
+        "confusion_matrix": {
+            label: dict(zip(labels + [FALLBACK_LABEL], confusion[i].tolist())) for i, label in enumerate(labels)
+        },
+        "top_1_confusion_matrix": {
+            label: dict(zip(labels, top_1_confusion[i].tolist())) for i, label in enumerate(labels)
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the embedding router against a labelled set")
+    parser.add_argument("labelled_questions", help="yaml file with `question` and `action_plan` items")
+    args = parser.parse_args()
+
+    embedding_router = get_embedding_router(get_agent_config().action_plans)
+    report = asyncio.run(benchmark_router(embedding_router, load_labelled_questions(args.labelled_questions)))
+    print(json.dumps(report, indent=2))
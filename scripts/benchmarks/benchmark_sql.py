@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the SQL safety validator against the previous regex based validator, by query length.
+
+Usage (from backend/app):
+    PYTHONPATH=. python ../../scripts/benchmarks/benchmark_sql.py --lengths 100 1000 10000 --repeat 200
+"""
+import argparse
+import json
+import time
+from typing import Any, Callable, List
+
+from app.utils.sql import get_sql_query_violation
+from tests.fake.legacy_sql import legacy_is_sql_query_safe
+
+
+def make_query(length: int) -> str:
+    """A safe SELECT statement of about `length` characters."""
+    conditions: List[str] = []
+    query = "SELECT t.id, t.name, COUNT(*) AS total FROM tracks t WHERE t.price > 0.5"
+    i = 0
+    while len(query) + len(" AND ".join(conditions)) < length:
+        conditions.append(f"(t.genre_id = {i} OR t.name LIKE 'song {i}%')")
+        i += 1
+    return " AND ".join([query] + conditions) + " GROUP BY t.id, t.name"
+
+
+def _time_per_call(validate: Callable[[str], Any], queries: List[str]) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        validate(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def benchmark_sql_validation(
+    lengths: List[int],
+    repeat: int,
+) -> List[dict[str, Any]]:
+    """
+    Time both validators for every query length.
+
+    Unique queries are used for the uncached timings (a different LIMIT makes each statement distinct), the cached
+    timing validates the same statement repeatedly. Statements with a comment skip the fast path of the validator
+    and are fully tokenized.
+
+    Returns:
+        List[dict[str, Any]]: Microseconds per call for every query length.
+    """
+    report = []
+    for length in lengths:
+        query = make_query(length)
+        unique_queries = [f"{query} LIMIT {i + 1}" for i in range(repeat)]
+        commented_queries = [f"/* {i} */ {query}" for i in range(repeat)]
+        report.append(
+            {
+                "length": len(query),
+                "legacy_us": _time_per_call(legacy_is_sql_query_safe, unique_queries),
+                "tokenizer_us": _time_per_call(get_sql_query_violation.__wrapped__, unique_queries),
+                "tokenizer_commented_us": _time_per_call(get_sql_query_violation.__wrapped__, commented_queries),
+                "tokenizer_cached_us": _time_per_call(get_sql_query_violation, [query] * repeat),
+            }
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SQL safety validator by query length")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark_sql_validation(args.lengths, args.repeat), indent=2))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark speculative SQL query candidates against the sequential generate, validate and improve loop.
+
+A fake chat model answers with a valid or an invalid SQL query after a random latency and the database validation is
+simulated, so only the orchestration of the SQL tool is measured.
+
+Usage (from backend/app):
+    PYTHONPATH=. python ../../scripts/benchmarks/benchmark_sql_candidates.py --fan-outs 1 3 5 --p-valid 0.5
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, List
+
+import numpy as np
+
+from tests.fake.sql_chat_model import FakeSQLChatModel, SimulatedSQLTool
+
+
+async def benchmark_sql_candidates(
+    fan_outs: List[int],
+    questions: int,
+    p_valid: float,
+    latency_s: float,
+    db_latency_s: float,
+) -> List[dict[str, Any]]:
+    """
+    Answer the same number of questions with every candidate fan-out, a fan-out of 1 is the sequential loop.
+
+    Returns:
+        List[dict[str, Any]]: Latency percentiles, valid rate and LLM calls per question for every fan-out.
+    """
+    report = []
+    for fan_out in fan_outs:
+        llm = FakeSQLChatModel(p_valid=p_valid, latency_s=latency_s)
+        tool = SimulatedSQLTool(
+            llm=llm,
+            fast_llm=llm,
+            fast_llm_token_limit=0,
+            description="SQL tool",
+            prompt_message="{table_schemas}\n{question}",
+            system_context="Write an SQL query.",
+            prompt_refinement="{previous_answer}\n{complaints}\n{table_schemas}\n{question}",
+            candidate_fan_out=fan_out,
+            db_latency_s=db_latency_s,
+        )
+        latencies = []
+        valid = 0
+        for i in range(questions):
+            start = time.perf_counter()
+            (
+                _,
+                _,
+                is_valid,
+                _,
+            ) = await tool._agenerate_valid_query(  # pylint: disable=protected-access
+                f"Question {i}",
+                ["public.tracks"],
+            )
+            latencies.append(time.perf_counter() - start)
+            valid += int(is_valid)
+
+        latencies_ms = np.asarray(latencies) * 1000
+        report.append(
+            {
+                "fan_out": fan_out,
+                "valid_rate": valid / questions,
+                "llm_calls_per_question": llm.calls / questions,
+                "latency_ms": {
+                    "mean": float(latencies_ms.mean()),
+                    "p50": float(np.percentile(latencies_ms, 50)),
+                    "p95": float(np.percentile(latencies_ms, 95)),
+                },
+            }
+        )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark speculative SQL query candidates")
+    parser.add_argument("--fan-outs", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument(
+        "--p-valid",
+        type=float,
+        default=0.5,
+        help="probability that a generated query is valid",
+    )
+    parser.add_argument("--latency", type=float, default=0.5, help="median LLM latency in seconds")
+    parser.add_argument(
+        "--db-latency",
+        type=float,
+        default=0.02,
+        help="validation query latency in seconds",
+    )
+    args = parser.parse_args()
+
+    print(
+        json.dumps(
+            asyncio.run(
+                benchmark_sql_candidates(
+                    args.fan_outs,
+                    args.questions,
+                    args.p_valid,
+                    args.latency,
+                    args.db_latency,
+                )
+            ),
+            indent=2,
+        )
+    )
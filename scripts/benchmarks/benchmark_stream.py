@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the token iterators of `AsyncIteratorCallbackHandler` with many concurrent streams.
+
+Every stream has a producer queueing tokens in bursts, like an LLM streaming over the network, and a consumer reading
+them with the previous iterator (two tasks raced per token), `aiter` or `aiter_batches`. Only the event loop work of
+the streams is measured, there is no network.
+
+Usage (from backend/app):
+    PYTHONPATH=. python ../../scripts/benchmarks/benchmark_stream.py --streams 500 --tokens 200
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, List, Literal, Sequence, Tuple, Union, cast
+
+from app.schemas.streaming_schema import StreamingData
+from app.utils.streaming.callbacks.stream import STREAM_END, AsyncIteratorCallbackHandler
+
+MODES = ("tasks", "aiter", "aiter_batches")
+
+
+async def aiter_with_tasks(
+    handler: AsyncIteratorCallbackHandler,
+) -> AsyncIterator[StreamingData]:
+    """Previous `AsyncIteratorCallbackHandler.aiter`, racing a `queue.get` and a `done.wait` task per token."""
+    while not handler.queue.empty() or not handler.done.is_set():
+        done, other = await asyncio.wait(
+            [
+                asyncio.ensure_future(handler.queue.get()),
+                asyncio.ensure_future(handler.done.wait()),
+            ],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        while len(other) > 0:
+            other.pop().cancel()
+        while len(done) > 0:
+            token_or_done = cast(Union[StreamingData, Literal[True]], done.pop().result())
+            if token_or_done is True:
+                break
+            if token_or_done is not STREAM_END:
+                yield token_or_done
+
+
+async def _produce(
+    handler: AsyncIteratorCallbackHandler,
+    nb_tokens: int,
+    burst: int,
+) -> None:
+    for i in range(nb_tokens):
+        await handler.on_llm_new_token("token")
+        if (i + 1) % burst == 0:
+            await asyncio.sleep(0)
+    handler.set_done()
+
+
+async def _consume(
+    handler: AsyncIteratorCallbackHandler,
+    mode: str,
+) -> Tuple[int, int]:
+    """Read a stream, returns the number of items and of iterations (batches or items) of the consumer."""
+    nb_items = 0
+    nb_iterations = 0
+    if mode == "aiter_batches":
+        async for batch in handler.aiter_batches():
+            nb_items += len(batch)
+            nb_iterations += 1
+    else:
+        async for _ in handler.aiter() if mode == "aiter" else aiter_with_tasks(handler):
+            nb_items += 1
+            nb_iterations += 1
+    return nb_items, nb_iterations
+
+
+async def run_streams(
+    mode: str,
+    nb_streams: int,
+    nb_tokens: int,
+    burst: int,
+) -> dict[str, Any]:
+    """Run `nb_streams` concurrent streams of `nb_tokens` tokens and measure throughput and CPU time."""
+    handlers = [AsyncIteratorCallbackHandler() for _ in range(nb_streams)]
+    start, start_cpu = time.perf_counter(), time.process_time()
+    results = await asyncio.gather(
+        *[_consume(handler, mode) for handler in handlers],
+        *[_produce(handler, nb_tokens, burst) for handler in handlers],
+    )
+    duration, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    consumed = cast(List[Tuple[int, int]], results[:nb_streams])
+    nb_items = sum(items for items, _ in consumed)
+    return {
+        "mode": mode,
+        "streams": nb_streams,
+        "lost_items": nb_streams * (nb_tokens + 1) - nb_items,  # tokens and the start signal of every stream
+        "tokens_per_s": nb_items / duration,
+        "cpu_ms_per_stream": cpu * 1000 / nb_streams,
+        "cpu_us_per_token": cpu * 1e6 / nb_items,
+        "iterations_per_stream": sum(iterations for _, iterations in consumed) / nb_streams,
+    }
+
+
+async def benchmark_stream(
+    nb_streams: int,
+    nb_tokens: int,
+    burst: int,
+    modes: Sequence[str] = MODES,
+) -> List[dict[str, Any]]:
+    return [await run_streams(mode, nb_streams, nb_tokens, burst) for mode in modes]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the streaming iterators with concurrent streams")
+    parser.add_argument("--streams", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per stream")
+    parser.add_argument("--burst", type=int, default=4, help="tokens queued between two yields of the producer")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(benchmark_stream(args.streams, args.tokens, args.burst, args.modes)), indent=2))
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark recall and latency of the ANN index of a PGVector collection against exact search on the same data.
+
+The collection is either an existing one (queries are perturbed copies of its embeddings) or a generated one of
+clustered random vectors. The index of an existing collection is rebuilt with the given parameters. Requires a
+Postgres database with the pgvector extension.
+
+Usage (from backend/app, with PYTHONPATH=.):
+    python ../../scripts/benchmarks/benchmark_vector_index.py --rows 100000 --index-type hnsw --search 10 40 160
+    python ../../scripts/benchmarks/benchmark_vector_index.py --collection pdf_indexing_1 --index-type ivfflat
+"""
+import argparse
+import json
+import time
+from typing import Any, List, Optional, Sequence
+from uuid import UUID
+
+import numpy as np
+import psycopg2
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores.pgvector import PGVector
+
+from app.core.config import settings
+from app.db.vector_index import VectorIndexManager, get_distance_expression, get_index_name, get_search_settings
+from app.schemas.ingestion_schema import VectorIndexConfig, VectorIndexTypeEnum
+
+INSERT_BATCH_SIZE = 1000
+
+
+def generate_vectors(
+    nb_rows: int,
+    dimensions: int,
+    nb_clusters: int = 100,
+    seed: int = 0,
+) -> np.ndarray:
+    """Normalized random vectors around `nb_clusters` centers, like embeddings of documents on a few topics."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(nb_clusters, dimensions))
+    vectors = centers[rng.integers(nb_clusters, size=nb_rows)] + 0.5 * rng.normal(size=(nb_rows, dimensions))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def get_recall(
+    results: Sequence[Sequence[str]],
+    exact_results: Sequence[Sequence[str]],
+) -> float:
+    """Mean fraction of the exact nearest neighbours found."""
+    return float(np.mean([len(set(result) & set(exact)) / len(exact) for result, exact in zip(results, exact_results)]))
+
+
+def _summarize(
+    latencies_s: List[float],
+) -> dict[str, float]:
+    return {
+        "p50_ms": float(np.percentile(latencies_s, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies_s, 95) * 1000),
+        "mean_ms": float(np.mean(latencies_s) * 1000),
+    }
+
+
+def create_collection(
+    dsn: str,
+    collection_name: str,
+    vectors: np.ndarray,
+) -> None:
+    db = PGVector(
+        connection_string=dsn,
+        embedding_function=FakeEmbeddings(size=vectors.shape[1]),
+        collection_name=collection_name,
+        pre_delete_collection=True,
+    )
+    for start in range(0, len(vectors), INSERT_BATCH_SIZE):
+        batch = vectors[start : start + INSERT_BATCH_SIZE]
+        ids = [str(i) for i in range(start, start + len(batch))]
+        db.add_embeddings(texts=ids, embeddings=batch.tolist(), ids=ids)
+
+
+def delete_collection(
+    dsn: str,
+    collection_name: str,
+) -> None:
+    PGVector(
+        connection_string=dsn,
+        embedding_function=FakeEmbeddings(size=1),
+        collection_name=collection_name,
+    ).delete_collection()
+
+
+def _get_collection_id(
+    connection: Any,
+    collection_name: str,
+) -> UUID:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT uuid FROM langchain_pg_collection WHERE name = %s;", (collection_name,))
+        collection_id = UUID(str(cursor.fetchone()[0]))
+    connection.commit()
+    return collection_id
+
+
+def sample_queries(
+    connection: Any,
+    collection_id: UUID,
+    nb_queries: int,
+    seed: int = 0,
+) -> np.ndarray:
+    """Perturbed copies of random embeddings of the collection."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT embedding::text FROM langchain_pg_embedding WHERE collection_id = %s ORDER BY random() LIMIT %s;",
+            (str(collection_id), nb_queries),
+        )
+        vectors = np.array([json.loads(row[0]) for row in cursor.fetchall()])
+    connection.commit()
+    rng = np.random.default_rng(seed)
+    return vectors + 0.1 * rng.normal(size=vectors.shape) * np.abs(vectors).mean()
+
+
+def _search(
+    connection: Any,
+    query: str,
+    vector: np.ndarray,
+    k: int,
+    settings_sql: Optional[str] = None,
+) -> tuple[List[str], float]:
+    with connection.cursor() as cursor:
+        start = time.perf_counter()
+        if settings_sql is not None:
+            cursor.execute(settings_sql)
+        cursor.execute(query, (json.dumps(vector.tolist()), k))
+        ids = [row[0] for row in cursor.fetchall()]
+        duration = time.perf_counter() - start
+    connection.commit()
+    return ids, duration
+
+
+def benchmark_vector_index(
+    dsn: str,
+    collection_name: str,
+    queries: np.ndarray,
+    config: VectorIndexConfig,
+    search_values: List[int],
+    k: int = 4,
+) -> List[dict[str, Any]]:
+    """
+    Search the queries exactly (sequential scan), build the index and search them with every `ef_search` (HNSW) or
+    `probes` (IVFFlat) value.
+
+    Returns:
+        List[dict[str, Any]]: Recall@k and latencies of the exact search and of every search value.
+    """
+    connection = psycopg2.connect(dsn)
+    try:
+        collection_id = _get_collection_id(connection, collection_name)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*), max(vector_dims(embedding)) FROM langchain_pg_embedding WHERE collection_id = %s;",
+                (str(collection_id),),
+            )
+            nb_rows, dimensions = cursor.fetchone()
+        connection.commit()
+
+        exact_query = f"""
+            SELECT custom_id FROM langchain_pg_embedding
+            WHERE collection_id = '{collection_id}'
+            ORDER BY embedding <=> %s::text::vector
+            LIMIT %s;
+        """
+        exact_results, latencies = zip(*(_search(connection, exact_query, vector, k) for vector in queries))
+        report: List[dict[str, Any]] = [
+            {"search": "exact", "rows": nb_rows, "recall": 1.0, **_summarize(list(latencies))}
+        ]
+
+        start = time.perf_counter()
+        VectorIndexManager(connection, collection_name, config.copy(update={"min_rows": 0})).ensure_index(force=True)
+        build_duration = time.perf_counter() - start
+
+        index_query = f"""
+            SELECT custom_id FROM langchain_pg_embedding
+            WHERE collection_id = '{collection_id}'
+            ORDER BY {get_distance_expression(dimensions, "%s")}
+            LIMIT %s;
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN " + index_query, (json.dumps(queries[0].tolist()), k))
+            index_used = get_index_name(collection_id) in "\n".join(row[0] for row in cursor.fetchall())
+        connection.commit()
+
+        parameter = "ef_search" if config.index_type == VectorIndexTypeEnum.HNSW else "probes"
+        for value in search_values:
+            settings_sql = get_search_settings(config.copy(update={parameter: value}))
+            results, latencies = zip(
+                *(_search(connection, index_query, vector, k, settings_sql=settings_sql) for vector in queries)
+            )
+            report.append(
+                {
+                    "search": config.index_type.value,
+                    parameter: value,
+                    "index_used": index_used,
+                    "build_s": build_duration,
+                    "recall": get_recall(results, exact_results),
+                    **_summarize(list(latencies)),
+                }
+            )
+        return report
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark recall and latency of the ANN index of a collection")
+    parser.add_argument(
+        "--dsn",
+        default=(
+            f"postgresql://{settings.DATABASE_USER}:{settings.DATABASE_PASSWORD}@{settings.DATABASE_HOST}:"
+            f"{settings.DATABASE_PORT}/{settings.PDF_TOOL_DATABASE}"
+        ),
+    )
+    parser.add_argument("--collection", default=None, help="existing collection, a random one is generated if None")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--index-type", type=VectorIndexTypeEnum, default=VectorIndexTypeEnum.HNSW)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--search", type=int, nargs="+", default=None, help="ef_search (HNSW) or probes (IVFFlat)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated collection")
+    args = parser.parse_args()
+
+    index_config = VectorIndexConfig(
+        index_type=args.index_type,
+        m=args.m,
+        ef_construction=args.ef_construction,
+        lists=args.lists,
+    )
+    if args.search is None:
+        args.search = [10, 20, 40, 80, 160] if args.index_type == VectorIndexTypeEnum.HNSW else [1, 2, 4, 8, 16, 32]
+
+    benchmark_collection = args.collection or "ann_benchmark"
+    if args.collection is None:
+        create_collection(args.dsn, benchmark_collection, generate_vectors(args.rows, args.dimensions))
+    try:
+        benchmark_connection = psycopg2.connect(args.dsn)
+        benchmark_queries = sample_queries(
+            benchmark_connection, _get_collection_id(benchmark_connection, benchmark_collection), args.queries
+        )
+        benchmark_connection.close()
+        print(
+            json.dumps(
+                benchmark_vector_index(
+                    args.dsn, benchmark_collection, benchmark_queries, index_config, args.search, k=args.k
+                ),
+                indent=2,
+            )
+        )
+    finally:
+        if args.collection is None and not args.keep:
+            delete_collection(args.dsn, benchmark_collection)